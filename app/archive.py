@@ -0,0 +1,56 @@
+"""
+Archive segments: leads moved out of SQLite by app.retention, as gzip JSONL files.
+
+One segment per archived batch (at most RETENTION_BATCH lines), one line per chat:
+
+    {"chat_id": 1, "archived_at": 1760000000.0, "lead": {...LeadState.to_dict()},
+     "events": [{"id", "ts", "kind", "data"}, ...], "handoff": {...} | null}
+
+The archived_leads table maps chat_id -> segment, so restoring one chat reads a single
+small file. Segments are written to a temp name, fsynced and renamed, so a segment that
+is referenced is always complete. Blocking file IO: call from a thread.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def segment_name(now: float, tag: str = "") -> str:
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(now))
+    return f"leads-{stamp}-{int(now * 1000) % 1000:03d}{tag}.jsonl.gz"
+
+
+def write_segment(directory: str, name: str, records: List[Dict[str, Any]]) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+            for r in records:
+                gz.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def iter_segment(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_record(path: str, chat_id: int) -> Optional[Dict[str, Any]]:
+    """The chat's line of a segment (None if the file or the line is missing)."""
+    try:
+        for r in iter_segment(path):
+            if r.get("chat_id") == chat_id:
+                return r
+    except FileNotFoundError:
+        return None
+    return None
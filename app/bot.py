@@ -1,27 +1,35 @@
 from __future__ import annotations
 
-import asyncio
-import os
-import tempfile
-from typing import Dict
-import random
+import html
+import io
+import time
 
 from aiogram import Bot, Dispatcher, F
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums.parse_mode import ParseMode
-from aiogram.types import Message
+from aiogram.types import Message, Update
 
+from app import funnel, listings
 from app.config import settings
-from app.db import load_lead, reset_lead, save_lead
-from app.lead_logic import decide_reply, Q1, FINAL
+from app.db import load_lead, log_event, reset_lead, save_lead
+from app.lead_logic import Q1, stage_of
 from app.llm import llm
+from app.mailbox import MailboxFull, mailboxes
+from app.metrics import registry
 from app.models import LeadState
+from app.nlu import EXTRA_UPDATES, understand
+from app.outbox import outbox
+from app.pacing import pacer
+from app.reminders import reminders
+from app.sender import sender
+from app.tenants import Tenant, tenants
 
-_reminders: Dict[int, asyncio.Task] = {}
-
-
-async def human_delay():
-    await asyncio.sleep(random.randint(10, 15))
+# handler = the aiogram callback; replies are paced and measured by leadbot_reply_seconds
+handler_seconds = registry.histogram("leadbot_handler_seconds", "Update handler latency", ["handler"])
+handler_errors = registry.counter("leadbot_handler_errors_total", "Update handlers that raised", ["handler"])
+_handler_children: dict = {}  # callback name -> (latency child, error child)
 
 
 def is_admin(m: Message) -> bool:
@@ -31,14 +39,54 @@ def is_admin(m: Message) -> bool:
 
 
 def build_bot() -> Bot:
+    session = None
+    if settings.TELEGRAM_API_BASE:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_BASE))
     return Bot(
         token=settings.TELEGRAM_BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
 
+async def _timed(handler, event, data):
+    """Inner middleware: latency + errors per handler callback."""
+    h = data.get("handler")
+    name = h.callback.__name__ if h is not None else "unknown"
+    children = _handler_children.get(name)
+    if children is None:
+        children = _handler_children[name] = (handler_seconds.labels(name), handler_errors.labels(name))
+    t0 = time.perf_counter()
+    try:
+        return await handler(event, data)
+    except Exception:
+        children[1].inc()
+        raise
+    finally:
+        children[0].observe(time.perf_counter() - t0)
+
+
+async def _per_chat(handler, event: Update, data):
+    """Outer update middleware: one chat's updates run one at a time, in arrival order (app.mailbox)."""
+    chat = data.get("event_chat")
+    if chat is None:
+        return await handler(event, data)
+    if event.message is not None or event.business_message is not None:
+        # a newer message makes the LLM call of the reply in progress stale; cancel it now
+        # instead of after it (the update would wait behind it in the mailbox)
+        llm.cancel(chat.id)
+    try:
+        return await mailboxes.call(chat.id, lambda: handler(event, data))
+    except MailboxFull as e:
+        print(f"[mailbox_full] update={event.update_id} {e}")
+        return None
+
+
 def build_dispatcher(bot: Bot) -> Dispatcher:
     dp = Dispatcher()
+    dp.update.outer_middleware(_per_chat)
+    dp.message.middleware(_timed)
+    dp.business_message.middleware(_timed)
 
     # ---------- helpers for Telegram Business replies ----------
 
@@ -54,9 +102,9 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
         """
         bc = _bc_id(m)
         if bc:
-            await bot.send_message(m.chat.id, text, business_connection_id=bc)
+            await sender.send_message(bot, m.chat.id, text, business_connection_id=bc)
         else:
-            await m.answer(text)
+            await sender.call(m.chat.id, lambda: m.answer(text))
 
     async def send_typing_like(m: Message):
         # optional: make it feel more human
@@ -69,6 +117,28 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
         except Exception:
             pass
 
+    async def reply_logged(m: Message, text: str, question, merged: int, since: float, tier: str = "rules"):
+        """reply() + an "out" event (also when sending failed); since: when the client sent the first text answered."""
+        error = None
+        try:
+            await reply(m, text)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            await log_event(
+                m.chat.id,
+                "out",
+                text=text,
+                question=question,
+                merged=merged,
+                tier=tier,
+                ok=error is None,
+                error=error,
+                # from the client's first message in the reply window to our reply, pacing delay included
+                latency=round(time.time() - since, 3),
+            )
+
     async def ensure_lead(m: Message) -> LeadState:
         lead = await load_lead(m.chat.id)
         if lead is None:
@@ -78,13 +148,10 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
                 username=m.from_user.username if m.from_user else None,
                 first_name=m.from_user.first_name if m.from_user else None,
             )
-        # запомним бизнес-коннект, если есть (не ломаемся, если в модели нет поля)
+        # запомним бизнес-коннект, если есть
         bc = _bc_id(m)
         if bc:
-            try:
-                setattr(lead, "business_connection_id", bc)
-            except Exception:
-                pass
+            lead.business_connection_id = bc
         return lead
 
     # ---------- admin/debug commands (normal chat) ----------
@@ -102,7 +169,7 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
             await reply(m, "Нет доступа.")
             return
         try:
-            await bot.send_message(settings.LEADS_CHAT_ID, "✅ Test lead destination (/test_leads)")
+            await sender.send_message(bot, settings.LEADS_CHAT_ID, "✅ Test lead destination (/test_leads)")
             await reply(m, "Ок — смог отправить тестовое сообщение в LEADS_CHAT_ID.")
         except Exception as e:
             await reply(
@@ -114,21 +181,40 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
                 f"Ошибка: {type(e).__name__}: {e}"
             )
 
-    @dp.message(F.text == "/start")
-    async def start(m: Message):
+    async def stats(m: Message):
+        # funnel counters (app.funnel): a fixed set of rows, whatever the number of leads
+        if not is_admin(m):
+            await reply(m, "Нет доступа.")
+            return
+        await reply(m, await funnel.stats_text())
+
+    @dp.message(F.text == "/stats")
+    async def cmd_stats(m: Message):
+        await stats(m)
+
+    async def restart(m: Message):
+        lead = await load_lead(m.chat.id)
         await reset_lead(m.chat.id)
-        _cancel_reminder(m.chat.id)
+        if lead is not None:
+            await funnel.record(stage_of(lead), None)
+        await _cancel_reminder(m.chat.id)
+        pacer.discard(m.chat.id)
         await send_typing_like(m)
-        await human_delay()
-        await reply(m, Q1)
+
+        async def flush(_texts, _first_sent_at):
+            await reply(m, tenants.get(_bc_id(m)).questions.q1)
+
+        # the command is the window's first text: a client message merged into this window
+        # (its flush replaces this one) is an answer to Q1, see the auto-start in _reply_to_texts
+        pacer.submit(m.chat.id, m.text, flush, m.date.timestamp())
+
+    @dp.message(F.text == "/start")
+    async def start(m: Message):
+        await restart(m)
 
     @dp.message(F.text == "/reset")
     async def reset(m: Message):
-        await reset_lead(m.chat.id)
-        _cancel_reminder(m.chat.id)
-        await send_typing_like(m)
-        await human_delay()
-        await reply(m, Q1)
+        await restart(m)
 
     # ---------- NORMAL chat handlers ----------
 
@@ -141,15 +227,16 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
         text = (m.text or "").strip()
 
         if text.lower() in {"start", "старт", "начать"}:
-            await reset_lead(m.chat.id)
-            _cancel_reminder(m.chat.id)
-            await send_typing_like(m)
-            await human_delay()
-            await reply(m, Q1)
+            await restart(m)
             return
 
         await _handle_text_like(m, text, bot)
 
+    @dp.message(F.forward_origin & F.caption)
+    async def handle_forwarded_post(m: Message):
+        # listing posts are usually photos with the text in the caption
+        await _handle_text_like(m, m.caption.strip(), bot)
+
     # ---------- TELEGRAM BUSINESS handlers ----------
     # ВАЖНО: это то, чего у тебя не было. Без этого в Business чатах будет "молчание".
 
@@ -162,22 +249,27 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
 
     @dp.business_message(F.text.in_({"/test_leads", "/test_manager"}))
     async def b_cmd_test_leads(m: Message):
-        # команды в бизнес-чате тоже должны работать
+        # команды в бизнес-чате тоже должны работать; проверяем чат лидов этого подключения
         if not is_admin(m):
             await reply(m, "Нет доступа.")
             return
+        dest = tenants.get(_bc_id(m)).leads_chat_id
         try:
-            await bot.send_message(settings.LEADS_CHAT_ID, "✅ Test lead destination (/test_leads)")
-            await reply(m, "Ок — смог отправить тестовое сообщение в LEADS_CHAT_ID.")
+            await sender.send_message(bot, dest, "✅ Test lead destination (/test_leads)")
+            await reply(m, f"Ок — смог отправить тестовое сообщение в чат лидов ({dest}).")
         except Exception as e:
             await reply(
                 m,
-                "Не смог отправить сообщение в LEADS_CHAT_ID. Проверь:\n"
-                "1) LEADS_CHAT_ID (для группы/канала обычно отрицательный id вида -100...)\n"
+                f"Не смог отправить сообщение в чат лидов ({dest}). Проверь:\n"
+                "1) LEADS_CHAT_ID / leads_chat_id подключения (python -m app.tenants list)\n"
                 "2) бот добавлен в группу/канал и имеет право писать\n\n"
                 f"Ошибка: {type(e).__name__}: {e}"
             )
 
+    @dp.business_message(F.text == "/stats")
+    async def b_cmd_stats(m: Message):
+        await stats(m)
+
     @dp.business_message(F.voice | F.audio | F.video_note)
     async def b_handle_voice(m: Message):
         await _handle_voice_like(m, bot)
@@ -187,6 +279,10 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
         text = (m.text or "").strip()
         await _handle_text_like(m, text, bot)
 
+    @dp.business_message(F.forward_origin & F.caption)
+    async def b_handle_forwarded_post(m: Message):
+        await _handle_text_like(m, m.caption.strip(), bot)
+
     # ---------- shared core logic ----------
 
     async def _handle_voice_like(m: Message, bot: Bot):
@@ -202,93 +298,186 @@ def build_dispatcher(bot: Bot) -> Dispatcher:
             await reply(m, "Не получилось прочитать аудио. Напишите, пожалуйста, текстом 😊")
             return
 
-        tg_file = await bot.get_file(media.file_id)
-        with tempfile.TemporaryDirectory() as td:
-            _, ext = os.path.splitext(tg_file.file_path or "")
-            ext = ext if ext else ".ogg"
-            in_path = os.path.join(td, "in" + ext)
+        too_long = "Голосовое слишком длинное 🙏 Напишите, пожалуйста, текстом или коротким голосовым."
+        if media.file_size and media.file_size > settings.VOICE_MAX_BYTES:
+            await reply(m, too_long)
+            return
 
-            await bot.download_file(tg_file.file_path, in_path)
+        async def load() -> bytes:
+            return await download_capped(bot, media.file_id, settings.VOICE_MAX_BYTES)
 
-            text = llm.transcribe(in_path)
-            if not text:
-                await reply(m, "Не смог распознать. Можете написать текстом?")
-                return
+        try:
+            text = await llm.transcribe(media.file_unique_id, _voice_filename(m), load)
+        except VoiceTooLarge:
+            await reply(m, too_long)
+            return
+        except Exception as e:
+            print(f"[voice_error] chat={m.chat.id} {type(e).__name__}: {e}")
+            text = None
+        if not text:
+            await reply(m, "Не смог распознать. Можете написать текстом?")
+            return
+
+        await _handle_text_like(m, text.strip(), bot, voice=True)
 
-            await _handle_text_like(m, text.strip(), bot)
+    async def _handle_text_like(m: Message, text: str, bot: Bot, voice: bool = False):
+        await log_event(m.chat.id, "in", text=text, message_id=m.message_id, voice=voice, bc=_bc_id(m))
+        await _remember_listing(m, text)
+        await _cancel_reminder(m.chat.id)
 
-    async def _handle_text_like(m: Message, text: str, bot: Bot):
-        _cancel_reminder(m.chat.id)
+        # Don't answer right away: messages typed within the delay window get one reply
+        async def flush(texts, first_sent_at):
+            await _reply_to_texts(m, texts, first_sent_at, bot)
 
+        if pacer.submit(m.chat.id, text, flush, m.date.timestamp()):
+            await send_typing_like(m)
+
+    async def _remember_listing(m: Message, text: str):
+        """Forwarded post / link / address -> listing store, and the lead points at it."""
+        try:
+            listing_id = await listings.ingest_message(text, forwarded=m.forward_origin is not None)
+        except Exception as e:
+            print(f"[listing_error] chat={m.chat.id} {type(e).__name__}: {e}")
+            return
+        if listing_id is None:
+            return
+        lead = await ensure_lead(m)
+        if lead.listing_id != listing_id:
+            lead.listing_id = listing_id
+            await save_lead(lead)
+            await log_event(m.chat.id, "listing", listing_id=listing_id)
+
+    async def _reply_to_texts(m: Message, texts: list[str], first_sent_at: float, bot: Bot):
+        text = "\n".join(texts)
         lead = await ensure_lead(m)
+        stage = stage_of(lead)
+        # the business connection's settings (texts, lead chat, reminders, LLM); defaults otherwise
+        tenant = tenants.get(lead.business_connection_id)
+        questions = tenant.questions
 
         # If already paused/handoffed — stay polite
         if getattr(lead, "paused", False) or getattr(lead, "handoff_sent", False):
-            await reply(m, FINAL)
+            await reply(m, questions.final)
             return
 
         # ✅ AUTO-START from ANY message
         if not getattr(lead, "last_question", None):
             lead.last_question = Q1
-            await save_lead(lead)
-            await send_typing_like(m)
-            await human_delay()
-            await reply(m, Q1)
-            return
+            if len(texts) < 2:
+                await save_lead(lead)
+                await funnel.record(stage, stage_of(lead), lead.created_at)
+                await reply_logged(m, questions.q1, Q1, len(texts), first_sent_at)
+                return
+            # messages after the first one in the same window (or after /start) already answer Q1
+            text = "\n".join(texts[1:])
 
-        reply_text, next_q, do_handoff, _pause_flag = decide_reply(lead, text)
+        # rules first; the LLM only when they are stuck or the client asked about the listing
+        reply_text, next_q, do_handoff, tier = await understand(lead, text, questions, tenant.llm_on)
 
         if do_handoff and not lead.handoff_sent:
-            ok = await send_lead_to_manager(bot, lead)
-            if ok:
-                lead.handoff_sent = True
-                lead.paused = True
-            else:
-                lead.handoff_sent = False
-                lead.paused = False
-                reply_text = (
-                    "Я собрал данные, но не смог отправить менеджеру (техническая ошибка). "
-                    "Пожалуйста, напишите /test_leads.\n\n" + (next_q or Q1)
-                )
+            # the card is delivered by the outbox worker (with retries); handoff_sent = queued
+            await send_lead_to_manager(lead, tenant)
+            lead.handoff_sent = True
+            lead.paused = True
 
         await save_lead(lead)
+        await funnel.record(stage, stage_of(lead), lead.created_at)
 
-        await send_typing_like(m)
-        await human_delay()
-        await reply(m, reply_text)
+        await reply_logged(m, reply_text, next_q, len(texts), first_sent_at, tier)
 
         # Reminder while collecting (для business тоже ок, если lead хранит business_connection_id)
-        if settings.REMINDER_MINUTES and settings.REMINDER_MINUTES > 0 and next_q and not lead.handoff_sent:
-            _reminders[m.chat.id] = asyncio.create_task(
-                remind_if_no_response(bot, lead.chat_id, settings.REMINDER_MINUTES, getattr(lead, "business_connection_id", None))
-            )
+        if tenant.reminder_minutes > 0 and next_q and not lead.handoff_sent:
+            await reminders.schedule(lead.chat_id, tenant.reminder_minutes * 60, lead.business_connection_id)
 
     return dp
 
 
-def _cancel_reminder(chat_id: int) -> None:
-    t = _reminders.pop(chat_id, None)
-    if t and not t.done():
-        t.cancel()
+class VoiceTooLarge(Exception):
+    pass
 
 
-async def remind_if_no_response(bot: Bot, chat_id: int, minutes: int, business_connection_id: str | None = None) -> None:
-    try:
-        await asyncio.sleep(minutes * 60)
-        lead = await load_lead(chat_id)
-        if not lead or lead.handoff_sent or lead.paused:
-            return
-        if lead.last_question:
+class _CappedBuffer(io.BytesIO):
+    """In-memory download target that refuses to grow past limit bytes."""
+
+    def __init__(self, limit: int) -> None:
+        super().__init__()
+        self.limit = limit
+
+    def write(self, b) -> int:
+        if self.tell() + len(b) > self.limit:
+            raise VoiceTooLarge(f"more than {self.limit} bytes")
+        return super().write(b)
+
+
+async def download_capped(bot: Bot, file_id: str, max_bytes: int) -> bytes:
+    """Download a Telegram file into memory, streaming, aborting once it exceeds max_bytes."""
+    tg_file = await bot.get_file(file_id)
+    if tg_file.file_size and tg_file.file_size > max_bytes:
+        raise VoiceTooLarge(f"{tg_file.file_size} bytes")
+    buf = _CappedBuffer(max_bytes)
+    await bot.download_file(tg_file.file_path, destination=buf)
+    return buf.getvalue()
+
+
+def _voice_filename(m: Message) -> str:
+    # the transcription API goes by the extension to detect the format
+    if m.voice:
+        return "voice.ogg"
+    if m.video_note:
+        return "video_note.mp4"
+    return (m.audio and m.audio.file_name) or "audio.mp3"
+
+
+async def _cancel_reminder(chat_id: int) -> None:
+    await reminders.cancel(chat_id)
+
+
+async def start_reminders(bot: Bot, shard: tuple[int, int] | None = None) -> None:
+    """Restore pending reminders from the DB and start the scheduler worker."""
+    await reminders.load(shard)
+
+    async def fire(chat_id: int, business_connection_id: str | None) -> None:
+        # in the chat's mailbox: not in the middle of a reply that may answer the question
+        await mailboxes.call(chat_id, lambda: remind_if_no_response(bot, chat_id, business_connection_id))
+
+    reminders.start(fire)
+
+
+def start_outbox(bot: Bot, shard: tuple[int, int] | None = None) -> None:
+    """Start delivering queued lead cards (cards left from a previous run go out first)."""
+
+    async def send(dest: int, text: str) -> int | None:
+        msg = await sender.send_message(bot, dest, text)
+        return getattr(msg, "message_id", None)
+
+    outbox.start(send, shard)
+
+
+async def remind_if_no_response(bot: Bot, chat_id: int, business_connection_id: str | None = None) -> None:
+    lead = await load_lead(chat_id)
+    if not lead or lead.handoff_sent or lead.paused:
+        return
+    if lead.last_question:
+        # last_question is the built-in text; the client saw its tenant's version of it
+        text = "Напомню 😊 " + tenants.get(business_connection_id).questions.text_for(lead.last_question)
+        try:
             if business_connection_id:
-                await bot.send_message(chat_id, "Напомню 😊 " + lead.last_question, business_connection_id=business_connection_id)
+                await sender.send_message(bot, chat_id, text, business_connection_id=business_connection_id)
             else:
-                await bot.send_message(chat_id, "Напомню 😊 " + lead.last_question)
-    except asyncio.CancelledError:
-        return
+                await sender.send_message(bot, chat_id, text)
+        except Exception as e:
+            await log_event(chat_id, "reminder", question=lead.last_question, ok=False, error=f"{type(e).__name__}: {e}")
+            raise
+        await log_event(chat_id, "reminder", question=lead.last_question, ok=True)
+
+
+_EXTRA_LABELS = {"lease_term": "Срок аренды", "budget_usd": "Бюджет, $", "pets": "Животные", "children": "Дети"}
 
 
-def lead_card_text(lead: LeadState) -> str:
+def lead_card_text(lead: LeadState, tenant_name: str = "") -> str:
     parts = ["🟢 <b>НОВЫЙ ЛИД</b>"]
+    if tenant_name:  # several connections can share one leads chat
+        parts.append(f"🏢 <b>Подключение:</b> {html.escape(tenant_name)}")
 
     if lead.people_count:
         parts.append(f"👥 <b>Кол-во человек:</b> {lead.people_count}")
@@ -300,6 +489,9 @@ def lead_card_text(lead: LeadState) -> str:
         parts.append(f"🕒 <b>Показ (как написал клиент):</b> {lead.showing_text}")
     if getattr(lead, "showing_time", None):
         parts.append(f"🧭 <b>Показ (нормализовано):</b> {lead.showing_time}")
+    for name in EXTRA_UPDATES:  # filled by the LLM tier
+        if lead.extras and lead.extras.get(name) is not None:
+            parts.append(f"▫️ <b>{_EXTRA_LABELS[name]}:</b> {html.escape(str(lead.extras[name]))}")
 
     if lead.username:
         parts.append(f"🔗 <b>Ссылка на клиента:</b> https://t.me/{lead.username}")
@@ -307,10 +499,7 @@ def lead_card_text(lead: LeadState) -> str:
     return "\n".join(parts)
 
 
-async def send_lead_to_manager(bot: Bot, lead: LeadState) -> bool:
-    try:
-        await bot.send_message(settings.LEADS_CHAT_ID, lead_card_text(lead))
-        return True
-    except Exception as e:
-        print(f"[manager_send_error] {type(e).__name__}: {e}")
-        return False
+async def send_lead_to_manager(lead: LeadState, tenant: Tenant | None = None) -> None:
+    """Queue the lead card for the tenant's leads chat; delivery status is in the `handoffs` table."""
+    tenant = tenant or tenants.get(lead.business_connection_id)
+    await outbox.enqueue(lead.chat_id, lead_card_text(lead, tenant.name), tenant.leads_chat_id)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+# Only the fields that change what the model answers go into the key.
+# chat_id / user_id / timestamps would make every lead a cache miss.
+_STATE_FIELDS = (
+    "people_count",
+    "move_in",
+    "employment",
+    "showing_time",
+    "showing_text",
+    "last_question",
+    "handoff_sent",
+    "paused",
+)
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    return _WS_RE.sub(" ", (text or "").lower()).strip()
+
+
+def _digest(obj: Any) -> str:
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def extract_key(schema_version: int, state: Dict[str, Any], user_text: str, listing_text: Optional[str]) -> str:
+    listing_hash = hashlib.sha1(listing_text.encode("utf-8")).hexdigest() if listing_text else None
+    return "x:" + _digest(
+        {
+            "v": schema_version,
+            "state": {k: (state or {}).get(k) for k in _STATE_FIELDS},
+            "listing": listing_hash,
+            "text": normalize_text(user_text),
+        }
+    )
+
+
+def transcribe_key(model: str, file_unique_id: str) -> str:
+    # file_unique_id is the same for every forward/re-send of one Telegram file
+    return f"t:{model}:{file_unique_id}"
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM answers:
+    - in memory: LRU bounded by max_items, every entry expires after ttl seconds
+    - optional SQLite table `llm_cache` so warm entries survive restarts
+    Only successful (non-None) results are stored.
+    """
+
+    def __init__(self, max_items: int, ttl_seconds: int, persist: bool) -> None:
+        self.max_items = max(0, max_items)
+        self.ttl = max(0, ttl_seconds)
+        self.persist = persist
+        # key -> (expires_at, value, latency of the original call)
+        self._mem: "OrderedDict[str, Tuple[float, Any, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _remember(self, key: str, expires_at: float, value: Any, latency: float) -> None:
+        if not self.max_items:
+            return
+        self._mem[key] = (expires_at, value, latency)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        item = self._mem.get(key)
+        if item is not None:
+            expires_at, value, latency = item
+            if expires_at > now:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += latency
+                return value
+            del self._mem[key]
+
+        if self.persist:
+            from app.db import get_db
+
+            db = await get_db()
+            cur = await db.execute(
+                "SELECT value, expires_at, latency FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, now),
+            )
+            row = await cur.fetchone()
+            await cur.close()
+            if row:
+                value = json.loads(row["value"])
+                self._remember(key, row["expires_at"], value, row["latency"])
+                self.hits += 1
+                self.disk_hits += 1
+                self.saved_seconds += row["latency"]
+                return value
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: Any, latency: float) -> None:
+        if value is None or not self.ttl:
+            return
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value, latency)
+
+        if self.persist:
+            from app.db import writer
+
+            async with writer.transaction() as db:
+                await db.execute(
+                    """
+                    INSERT INTO llm_cache(key, value, expires_at, latency)
+                    VALUES(?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        value=excluded.value, expires_at=excluded.expires_at, latency=excluded.latency
+                    """,
+                    (key, json.dumps(value, ensure_ascii=False), expires_at, latency),
+                )
+
+    async def purge_expired(self) -> None:
+        now = time.time()
+        for k in [k for k, (exp, _, _) in self._mem.items() if exp <= now]:
+            del self._mem[k]
+        if self.persist:
+            from app.db import writer
+
+            async with writer.transaction() as db:
+                await db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "entries": len(self._mem),
+        }
+
+
+llm_cache = LLMCache(
+    max_items=settings.LLM_CACHE_SIZE,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    persist=bool(settings.LLM_CACHE_PERSIST),
+)
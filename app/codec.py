@@ -0,0 +1,67 @@
+"""
+Byte encodings of a whole LeadState, for detached copies kept in memory.
+
+The write-behind queue keeps the encoded lead as its read-your-writes value and the
+LeadCache keeps one as the clean snapshot that save_lead compares against, so encoding
+runs on every save and decoding on every load of a not yet flushed lead.
+
+Both codecs write the positional row (LeadState.to_row) prefixed with SCHEMA_VERSION,
+so no field names are stored and a row from an older schema still decodes:
+
+- "marshal": stdlib binary format, the fastest; for this process's own data only
+  (marshal is not meant for untrusted input, and its format may change between Python
+  versions, so don't persist it).
+- "json": compact JSON array, portable and readable; for anything that leaves the process.
+
+Pick with LEAD_CODEC.
+"""
+from __future__ import annotations
+
+import json
+import marshal
+from typing import Dict, Protocol
+
+from app.models import SCHEMA_VERSION, LeadState
+
+
+class LeadCodec(Protocol):
+    name: str
+
+    def dumps(self, lead: LeadState) -> bytes: ...
+
+    def loads(self, data: bytes) -> LeadState: ...
+
+
+class MarshalCodec:
+    name = "marshal"
+
+    def dumps(self, lead: LeadState) -> bytes:
+        return marshal.dumps((SCHEMA_VERSION,) + lead.to_row())
+
+    def loads(self, data: bytes) -> LeadState:
+        row = marshal.loads(data)
+        return LeadState.from_row(row[1:], row[0])
+
+
+class JsonCodec:
+    name = "json"
+
+    def __init__(self) -> None:
+        self._enc = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(self, lead: LeadState) -> bytes:
+        return self._enc.encode((SCHEMA_VERSION,) + lead.to_row()).encode("utf-8")
+
+    def loads(self, data: bytes) -> LeadState:
+        row = json.loads(data)
+        return LeadState.from_row(row[1:], row[0])
+
+
+CODECS: Dict[str, LeadCodec] = {c.name: c for c in (MarshalCodec(), JsonCodec())}
+
+
+def get_codec(name: str) -> LeadCodec:
+    try:
+        return CODECS[name.lower()]
+    except KeyError:
+        raise ValueError(f"unknown LEAD_CODEC {name!r}, expected one of {', '.join(CODECS)}") from None
@@ -9,6 +9,7 @@ class Settings(BaseSettings):
 
     # Telegram
     TELEGRAM_BOT_TOKEN: str
+    TELEGRAM_API_BASE: str | None = None  # e.g. http://127.0.0.1:8081 for tools/fake_telegram.py (default: api.telegram.org)
 
     # Optional admin user id (who can run debug/admin commands).
     # If not set, admin commands are available to everyone.
@@ -20,18 +21,80 @@ class Settings(BaseSettings):
     # Backward compatibility: old env name
     MANAGER_CHAT_ID: int | None = None
 
+    # Transport: polling (default) or webhook served by the bot's own HTTP server
+    RUN_MODE: str = "polling"  # polling | webhook
+    WEBHOOK_BASE_URL: str | None = None  # public https URL, e.g. https://my-bot.onrender.com
+    WEBHOOK_PATH: str = "/tg/webhook"
+    WEBHOOK_SECRET: str | None = None  # checked against X-Telegram-Bot-Api-Secret-Token
+    HTTP_HOST: str = "0.0.0.0"
+    PORT: int = 10000  # health/readiness (and webhook) port; Render sets PORT
+    SHUTDOWN_TIMEOUT_SECONDS: float = 20.0
+    WORKERS: int = 1  # >1: ingress process + N worker processes, updates sharded by chat_id
+    # (each worker gets TG_GLOBAL_PER_SECOND / N and TG_GROUP_PER_MINUTE / N; /metrics shows the ingress process only)
+
+    # Outbound rate limits (Telegram: ~30 msg/s overall, ~1 msg/s per chat, ~20 msg/min per group)
+    TG_GLOBAL_PER_SECOND: float = 30.0
+    TG_CHAT_PER_SECOND: float = 1.0
+    TG_GROUP_PER_MINUTE: float = 20.0
+    TG_SEND_RETRIES: int = 3  # re-queue after RetryAfter (429) this many times
+
+    # Lead cards to LEADS_CHAT_ID: outbox table + background worker
+    HANDOFF_RETRY_BASE_SECONDS: float = 5.0  # first retry after this, doubling up to the max
+    HANDOFF_RETRY_MAX_SECONDS: float = 900.0
+    HANDOFF_MAX_ATTEMPTS: int = 50  # then the card is marked failed
+    HANDOFF_DIGEST_MIN: int = 3  # this many cards due at once -> merge them into digest messages
+    HANDOFF_BATCH: int = 50  # cards taken per pass
+
     # Storage
     SQLITE_PATH: str = "./data/bot.sqlite3"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL + NORMAL: durable across app crashes, one fsync per checkpoint
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    DB_WRITE_BEHIND: int = 1  # 0 = commit on every save (old behaviour)
+    DB_FLUSH_MS: int = 200  # flush pending writes at least this often
+    DB_FLUSH_ROWS: int = 500  # ...or as soon as this many rows are waiting
+    LEAD_CACHE_SIZE: int = 5000  # LeadState objects kept in memory (LRU), 0 disables
+    LEAD_CODEC: str = "marshal"  # in-memory lead snapshots: marshal (fastest) | json
+
+    # Listings (forwarded posts / links / addresses, FTS5-indexed passages)
+    LISTING_MIN_CHARS: int = 80  # forwarded text shorter than this is not treated as a listing
+    LISTING_PASSAGE_CHARS: int = 320  # listing text is indexed in passages of about this size
+    LISTING_CONTEXT_CHARS: int = 1200  # passages sent to the LLM per question, at most this much text
+    LISTING_MATCH_MIN_SCORE: float = 0.5  # free text picks a stored listing only with a bm25 score of at least this
 
     # Behavior
     LLM_MODE: str = "off"  # off | on
+    NLU_STUCK_THRESHOLD: int = 1  # ask the LLM after this many messages in a row the rules didn't understand, 0 = never
+    NLU_ANSWER_QUESTIONS: int = 1  # ask the LLM when the client asks about the listing (price, deposit, pets, ...)
     ENABLE_VOICE: int = 0
+    VOICE_MAX_BYTES: int = 10 * 1024 * 1024  # voice/audio bigger than this is refused, never downloaded whole
+    TRANSCRIBE_CONCURRENCY: int = 2  # downloads + transcriptions at once (bounds audio held in memory)
     REMINDER_MINUTES: int = 15  # 0 disables reminders
+    HUMAN_DELAY_MIN: float = 10.0  # reply delay window, seconds
+    HUMAN_DELAY_MAX: float = 15.0
+    REPLY_DEBOUNCE_SECONDS: float = 3.0  # wait at least this long after the last message of a burst
+    REMINDER_BATCH_SIZE: int = 200  # due reminders taken from the heap at once
+    REMINDER_CONCURRENCY: int = 20  # reminders being sent at the same time
+    # retention: leads untouched this long move to gzip JSONL segments (0 = never), restored when the client writes
+    RETENTION_FINISHED_DAYS: int = 30  # handed off / paused leads
+    RETENTION_STALE_DAYS: int = 90  # any lead
+    RETENTION_BATCH: int = 200  # leads per segment / per delete transaction
+    RETENTION_PAUSE_MS: int = 200  # between batches and vacuum steps
+    ARCHIVE_DIR: str = "./data/archive"
+    MAINTENANCE_HOUR: int = 4  # UTC hour of the daily archive + incremental_vacuum + ANALYZE pass (-1 = off)
+    VACUUM_STEP_PAGES: int = 1000  # pages freed per incremental_vacuum step
+    MAILBOX_MAX_PENDING: int = 100  # queued updates/replies per chat before new ones are dropped
+    TENANTS_RELOAD_SECONDS: float = 30.0  # how often the tenants table is checked for changes (0 = load once)
 
     # OpenAI
     OPENAI_API_KEY: str | None = None
     OPENAI_MODEL: str = "gpt-4.1-mini"
     OPENAI_TRANSCRIBE_MODEL: str = "gpt-4o-mini-transcribe"
+    OPENAI_BASE_URL: str | None = None  # e.g. http://127.0.0.1:8089/v1 for tools/stub_openai.py
+    LLM_MAX_CONCURRENCY: int = 4  # calls in flight for the whole process
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_CACHE_SIZE: int = 2048  # in-memory entries, 0 disables the memory tier
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # 0 disables caching
+    LLM_CACHE_PERSIST: int = 1  # keep entries in SQLite (table llm_cache) across restarts
 
     @model_validator(mode="after")
     def _finalize(self):
@@ -1,23 +1,350 @@
 from __future__ import annotations
+import asyncio
+import contextlib
+import hashlib
+import itertools
 import os
 import json
+import time
 import aiosqlite
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional, Tuple
+from app.archive import read_record
+from app.codec import get_codec
 from app.config import settings
+from app.lead_logic import stage_of
+from app.metrics import registry
 from app.models import LeadState
 
 _DB: Optional[aiosqlite.Connection] = None
 
+# counters for benchmarks / diagnostics
+stats: Dict[str, int] = {
+    "saves": 0, "clean_saves": 0, "commits": 0, "rows": 0, "cache_hits": 0, "cache_misses": 0,
+    "archived": 0, "restored": 0,
+}
+
+# time spent waiting on SQLite itself (cache hits and queued writes don't touch it)
+db_seconds = registry.histogram("leadbot_db_seconds", "Time spent in SQLite calls", ["op"])
+_t_select = db_seconds.labels("select_lead")
+_t_flush = db_seconds.labels("flush")
+_t_commit = db_seconds.labels("commit")
+_t_search = db_seconds.labels("search_listing")
+_t_maintenance = db_seconds.labels("maintenance")
+for _k in stats:
+    registry.counter(f"leadbot_db_{_k}_total", f"app.db {_k.replace('_', ' ')}", fn=lambda k=_k: stats[k])
+
+
 async def get_db() -> aiosqlite.Connection:
     global _DB
     if _DB is None:
         os.makedirs(os.path.dirname(settings.SQLITE_PATH), exist_ok=True)
         _DB = await aiosqlite.connect(settings.SQLITE_PATH)
         _DB.row_factory = aiosqlite.Row
+        # takes effect on a new file only; an existing one is converted by enable_incremental_vacuum
+        await _DB.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL: readers don't block the writer, commits are a WAL append instead of a full fsync
+        await _DB.execute("PRAGMA journal_mode=WAL")
+        await _DB.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        await _DB.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
     return _DB
 
-async def init_db() -> None:
-    db = await get_db()
+
+_MISSING = object()
+
+
+class WriteBehind:
+    """
+    Coalescing writer in front of the single aiosqlite connection.
+
+    put(key, ...) replaces whatever is still pending for the same key, so ten saves of
+    one chat between two flushes cost one row. add(key, ...) is for counters: deltas for
+    the same key are summed, also into a batch that failed and is queued again. Everything
+    pending goes to SQLite in a single transaction every DB_FLUSH_MS, or right away once
+    DB_FLUSH_ROWS keys wait.
+
+    Every other write on the shared connection goes through transaction(): a commit or
+    rollback landing between the awaits of a flush would commit half a batch or drop it.
+    """
+
+    def __init__(self, flush_ms: int, max_rows: int) -> None:
+        self.flush_interval = max(1, flush_ms) / 1000.0
+        self.max_rows = max(1, max_rows)
+        # key -> (sql, params, value for read-your-writes)
+        self._pending: Dict[Hashable, Tuple[str, tuple, Any]] = {}
+        # key -> (sql, params before the delta, delta)
+        self._deltas: Dict[Hashable, Tuple[str, tuple, int]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._deltas)
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def put(self, key: Hashable, sql: str, params: tuple, value: Any = None) -> None:
+        self._ensure_started()
+        self._pending.pop(key, None)
+        self._pending[key] = (sql, params, value)
+        if len(self) >= self.max_rows:
+            self._wake.set()
+
+    def add(self, key: Hashable, sql: str, params: tuple, delta: int) -> None:
+        """Queue sql with params + (delta,); sql must add its last parameter to what is stored."""
+        self._ensure_started()
+        self._merge_delta(key, sql, params, delta)
+        if len(self) >= self.max_rows:
+            self._wake.set()
+
+    def _merge_delta(self, key: Hashable, sql: str, params: tuple, delta: int) -> None:
+        item = self._deltas.get(key)
+        self._deltas[key] = (sql, params, delta + (item[2] if item else 0))
+
+    def peek(self, key: Hashable, default: Any = _MISSING) -> Any:
+        item = self._pending.get(key)
+        return default if item is None else item[2]
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def flush(self) -> None:
+        if not self._pending and not self._deltas:
+            return
+        async with self._get_lock():
+            await self._flush_locked()
+
+    async def _flush_locked(self) -> None:
+        batch, self._pending = self._pending, {}
+        deltas, self._deltas = self._deltas, {}
+        if not batch and not deltas:
+            return
+        grouped: Dict[str, List[tuple]] = {}
+        for sql, params, _ in batch.values():
+            grouped.setdefault(sql, []).append(params)
+        for sql, params, delta in deltas.values():
+            grouped.setdefault(sql, []).append(params + (delta,))
+        db = await get_db()
+        t0 = time.perf_counter()
+        try:
+            for sql, rows in grouped.items():
+                await db.executemany(sql, rows)
+            await db.commit()
+            _t_flush.observe(time.perf_counter() - t0)
+        except BaseException:
+            await db.rollback()
+            # keep newer writes that arrived meanwhile, retry the rest on the next flush
+            for k, v in batch.items():
+                self._pending.setdefault(k, v)
+            # counters: what was added meanwhile comes on top of the failed deltas
+            for k, (sql, params, delta) in deltas.items():
+                self._merge_delta(k, sql, params, delta)
+            raise
+        stats["commits"] += 1
+        stats["rows"] += len(batch) + len(deltas)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        The connection for a direct write, exclusively: what is pending is flushed first and
+        no flush runs until the block ends. Commits on exit, rolls back on an exception.
+        """
+        async with self._get_lock():
+            await self._flush_locked()
+            db = await get_db()
+            try:
+                yield db
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+            stats["commits"] += 1
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[db_flush_error] {type(e).__name__}: {e}")
+
+    async def stop(self) -> None:
+        # let the worker finish its current flush instead of cancelling it mid-transaction
+        if self._task is not None:
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+            self._closing = False
+        await self.flush()
+        self._lock = None
+
+
+writer = WriteBehind(settings.DB_FLUSH_MS, settings.DB_FLUSH_ROWS)
+
+
+# encoded leads: read-your-writes values in the writer, and the input of LeadCache fingerprints
+codec = get_codec(settings.LEAD_CODEC)
+
+
+def _fingerprint(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class LeadCache:
+    """
+    Bounded LRU of live LeadState objects keyed by chat_id.
+
+    Next to every lead we keep a fingerprint of what was last written (128-bit hash of the
+    lead encoded with codec; 49 bytes instead of a tuple of all field values), so save_lead
+    can tell whether anything changed (dirty) and skip the write otherwise.
+    """
+
+    def __init__(self, max_items: int) -> None:
+        self.max_items = max(0, max_items)
+        self._items: "OrderedDict[int, Tuple[LeadState, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, chat_id: int) -> Optional[LeadState]:
+        item = self._items.get(chat_id)
+        if item is None:
+            return None
+        self._items.move_to_end(chat_id)
+        return item[0]
+
+    def put(self, lead: LeadState, encoded: Optional[bytes] = None) -> None:
+        """Remember lead as clean (== what is stored); encoded is codec.dumps(lead) if already at hand."""
+        if not self.max_items:
+            return
+        self._items[lead.chat_id] = (lead, _fingerprint(encoded if encoded is not None else codec.dumps(lead)))
+        self._items.move_to_end(lead.chat_id)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def is_dirty(self, lead: LeadState) -> bool:
+        item = self._items.get(lead.chat_id)
+        if item is None or item[0] is not lead:
+            return True
+        return _fingerprint(codec.dumps(lead)) != item[1]
+
+    def invalidate(self, chat_id: int) -> None:
+        self._items.pop(chat_id, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+lead_cache = LeadCache(settings.LEAD_CACHE_SIZE)
+
+registry.gauge("leadbot_db_pending_writes", "Rows waiting in the write-behind queue", fn=lambda: len(writer))
+registry.gauge("leadbot_lead_cache_size", "LeadState objects in the LRU", fn=lambda: len(lead_cache))
+
+
+async def _write(key: Hashable, sql: str, params: tuple, value: Any = None) -> None:
+    if settings.DB_WRITE_BEHIND:
+        writer.put(key, sql, params, value)
+        return
+    t0 = time.perf_counter()
+    async with writer.transaction() as db:
+        await db.execute(sql, params)
+    _t_commit.observe(time.perf_counter() - t0)
+    stats["rows"] += 1
+
+
+async def close_db() -> None:
+    """Flush everything still pending and close the connection (call on shutdown)."""
+    global _DB
+    await writer.stop()
+    lead_cache.clear()
+    if _DB is not None:
+        await _DB.close()
+        _DB = None
+
+
+# ---------- schema & migrations (PRAGMA user_version) ----------
+
+# leads columns as created by _migrate_2; every column maps 1:1 to a LeadState field.
+# extras (JSON) holds keys this version doesn't know about (LeadState.extras).
+_V2_COLUMNS = (
+    "chat_id", "user_id", "username", "first_name",
+    "people_count", "move_in", "employment", "showing_time", "showing_text",
+    "handoff_sent", "paused", "last_question", "stuck_count",
+    "business_connection_id", "created_at", "updated_at",
+)
+_LEAD_COLUMNS = _V2_COLUMNS + ("listing_id",)  # == models.FIELDS; a new field needs a migration adding its column
+_BOOL_COLUMNS = ("handoff_sent", "paused")
+_MIGRATION_BATCH = 500
+
+_UPSERT_LEAD_SQL = (
+    f"INSERT INTO leads({', '.join(_LEAD_COLUMNS)}, extras) VALUES({', '.join('?' for _ in _LEAD_COLUMNS)}, ?) "
+    f"ON CONFLICT(chat_id) DO UPDATE SET "
+    + ", ".join(f"{c}=excluded.{c}" for c in _LEAD_COLUMNS + ("extras",) if c != "chat_id")
+)
+_SELECT_LEAD_SQL = f"SELECT {', '.join(_LEAD_COLUMNS)}, extras FROM leads WHERE chat_id = ?"
+_BOOL_IDX = tuple(_LEAD_COLUMNS.index(c) for c in _BOOL_COLUMNS)
+
+
+def _lead_to_row(lead: LeadState) -> tuple:
+    row = lead.to_row()
+    return row[:-1] + (json.dumps(row[-1], ensure_ascii=False) if row[-1] else None,)
+
+
+def _row_to_lead(row: Any) -> LeadState:
+    values = list(row)
+    for i in _BOOL_IDX:
+        values[i] = bool(values[i])
+    extras = values[-1]
+    if extras:
+        try:
+            values[-1] = json.loads(extras)
+        except ValueError:
+            values[-1] = {"_raw": extras}
+    return LeadState.from_row(values)
+
+
+def _v1_row(chat_id: int, data: str) -> tuple:
+    """Old JSON blob -> leads row (+ extras)."""
+    try:
+        d = json.loads(data) or {}
+    except ValueError:
+        d = {"_raw": data}
+    d["chat_id"] = chat_id
+    if d.get("user_id") is None:
+        d["user_id"] = chat_id
+    for c in _BOOL_COLUMNS:
+        d[c] = bool(d.get(c))
+    d["stuck_count"] = d.get("stuck_count") or 0
+    d["created_at"] = d.get("created_at") or ""
+    d["updated_at"] = d.get("updated_at") or ""
+    extras = {k: v for k, v in d.items() if k not in _V2_COLUMNS}
+    return tuple(d.get(c) for c in _V2_COLUMNS) + (json.dumps(extras, ensure_ascii=False) if extras else None,)
+
+
+async def _add_column(db: aiosqlite.Connection, table: str, column: str, decl: str) -> None:
+    # ALTER TABLE commits on its own, before user_version is bumped: a migration interrupted
+    # right after it runs again on the next start and must not fail on "duplicate column"
+    cur = await db.execute(f"PRAGMA table_info({table})")
+    cols = {r["name"] for r in await cur.fetchall()}
+    await cur.close()
+    if column not in cols:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+async def _migrate_1(db: aiosqlite.Connection) -> None:
+    # original schema: one JSON blob per lead
     await db.execute(
         """
         CREATE TABLE IF NOT EXISTS leads (
@@ -26,33 +353,819 @@ async def init_db() -> None:
         );
         """
     )
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            latency REAL NOT NULL DEFAULT 0
+        );
+        """
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)")
+
+
+async def _migrate_2(db: aiosqlite.Connection) -> None:
+    """
+    JSON blob -> real columns. Copies in batches of _MIGRATION_BATCH rows (one commit each),
+    so memory stays flat and an interrupted run simply continues on the next start.
+    """
+    cur = await db.execute("PRAGMA table_info(leads)")
+    cols = {r["name"] for r in await cur.fetchall()}
+    await cur.close()
+    if "data" in cols:
+        await db.execute("ALTER TABLE leads RENAME TO leads_v1")
+        await db.commit()
+
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS leads (
+            chat_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            username TEXT,
+            first_name TEXT,
+            people_count INTEGER,
+            move_in TEXT,
+            employment TEXT,
+            showing_time TEXT,
+            showing_text TEXT,
+            handoff_sent INTEGER NOT NULL DEFAULT 0,
+            paused INTEGER NOT NULL DEFAULT 0,
+            last_question TEXT,
+            stuck_count INTEGER NOT NULL DEFAULT 0,
+            business_connection_id TEXT,
+            created_at TEXT NOT NULL DEFAULT '',
+            updated_at TEXT NOT NULL DEFAULT '',
+            extras TEXT
+        );
+        """
+    )
     await db.commit()
 
+    cur = await db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='leads_v1'")
+    has_old = await cur.fetchone()
+    await cur.close()
+    if has_old:
+        # resume point: rows up to MAX(chat_id) were copied by an interrupted run
+        cur = await db.execute("SELECT COALESCE(MAX(chat_id), ?) AS m FROM leads", (-(2**63),))
+        last = (await cur.fetchone())["m"]
+        await cur.close()
+        insert_sql = (
+            f"INSERT OR IGNORE INTO leads({', '.join(_V2_COLUMNS)}, extras) "
+            f"VALUES({', '.join('?' for _ in _V2_COLUMNS)}, ?)"
+        )
+        while True:
+            cur = await db.execute(
+                "SELECT chat_id, data FROM leads_v1 WHERE chat_id > ? ORDER BY chat_id LIMIT ?",
+                (last, _MIGRATION_BATCH),
+            )
+            rows = await cur.fetchall()
+            await cur.close()
+            if not rows:
+                break
+            await db.executemany(insert_sql, [_v1_row(r["chat_id"], r["data"]) for r in rows])
+            await db.commit()
+            last = rows[-1]["chat_id"]
+        await db.execute("DROP TABLE leads_v1")
+
+    # what we actually filter by: stage of the funnel, staleness, tenant
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_leads_stage ON leads(handoff_sent, paused, last_question)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_leads_updated ON leads(updated_at)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_leads_bc ON leads(business_connection_id)")
+
+
+async def _migrate_3(db: aiosqlite.Connection) -> None:
+    # pending reminders survive restarts; the scheduler keeps a heap over due_at
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reminders (
+            chat_id INTEGER PRIMARY KEY,
+            due_at REAL NOT NULL,
+            business_connection_id TEXT
+        );
+        """
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders(due_at)")
+
+
+async def _migrate_4(db: aiosqlite.Connection) -> None:
+    # append-only conversation log; data is a JSON object whose keys depend on kind
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            chat_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            data TEXT
+        );
+        """
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_events_chat ON events(chat_id, ts)")
+
+
+async def _migrate_5(db: aiosqlite.Connection) -> None:
+    # lead-card outbox: one row per lead, status pending -> sent (or failed after too many attempts)
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS handoffs (
+            chat_id INTEGER PRIMARY KEY,
+            card TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_at REAL NOT NULL,
+            created_at REAL NOT NULL,
+            sent_at REAL,
+            message_id INTEGER,
+            last_error TEXT
+        );
+        """
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_handoffs_due ON handoffs(status, next_at)")
+
+
+async def _migrate_6(db: aiosqlite.Connection) -> None:
+    # listing store: one row per distinct listing, its text split into passages in an FTS5 index
+    await _add_column(db, "leads", "listing_id", "INTEGER")
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS listings (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL UNIQUE,
+            source TEXT NOT NULL,
+            url TEXT,
+            address TEXT,
+            text TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        """
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_listings_url ON listings(url)")
+    # rowid = listing_id << PASSAGE_BITS | ord: one listing's passages are a rowid range, which
+    # FTS5 filters on directly. address is repeated on every passage so a lookup by address ranks
+    # the listing's passages; unicode61 folds case and diacritics for Cyrillic and Latin alike.
+    await db.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS listing_passages USING fts5(
+            body, address, tokenize = 'unicode61 remove_diacritics 2'
+        );
+        """
+    )
+
+
+async def _migrate_7(db: aiosqlite.Connection) -> None:
+    # funnel counters: day '*' holds all-time totals and current stage sizes, other rows are
+    # per-day rollups (UTC); app.funnel owns the names. Bumped additively, never recounted.
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS funnel_stats (
+            day TEXT NOT NULL,
+            name TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (day, name)
+        ) WITHOUT ROWID;
+        """
+    )
+    # one pass over existing leads so the counters start from the current funnel
+    from app.lead_logic import Q1, Q2, Q3
+
+    cur = await db.execute(
+        """
+        SELECT CASE WHEN handoff_sent THEN 'handoff' WHEN last_question = ? THEN 'q1'
+                    WHEN last_question = ? THEN 'q2' WHEN last_question = ? THEN 'q3' END AS stage,
+               COUNT(*) AS n
+        FROM leads GROUP BY stage
+        """,
+        (Q1, Q2, Q3),
+    )
+    now = {r["stage"]: r["n"] for r in await cur.fetchall() if r["stage"]}
+    await cur.close()
+    order = ("q1", "q2", "q3", "handoff")
+    rows = [("*", f"leads:{st}", now[st]) for st in order if st in now]
+    # every lead at a stage has passed the ones before it
+    rows += [("*", f"reached:{st}", sum(now.get(s, 0) for s in order[i:])) for i, st in enumerate(order)]
+    await db.executemany(_BUMP_STAT_SQL, [r for r in rows if r[2]])
+
+
+async def _migrate_8(db: aiosqlite.Connection) -> None:
+    # leads moved to archive segments by app.retention: chat_id -> segment file (in ARCHIVE_DIR)
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archived_leads (
+            chat_id INTEGER PRIMARY KEY,
+            segment TEXT NOT NULL,
+            archived_at REAL NOT NULL
+        );
+        """
+    )
+    # pages freed by archiving go back to the file system in small steps (PRAGMA incremental_vacuum);
+    # an existing file needs one full VACUUM to switch over, done by the maintenance window
+    # (enable_incremental_vacuum), not here: it would block startup on a big file
+
+
+async def _migrate_9(db: aiosqlite.Connection) -> None:
+    # tenants: per business connection settings (app.tenants); NULL columns fall back to the
+    # process-wide settings. handoffs.dest: the chat a card goes to (NULL: LEADS_CHAT_ID).
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tenants (
+            business_connection_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL DEFAULT '',
+            leads_chat_id INTEGER,
+            reminder_minutes INTEGER,
+            llm_mode TEXT,
+            q1 TEXT,
+            q2 TEXT,
+            q3 TEXT,
+            final TEXT,
+            updated_at REAL NOT NULL
+        );
+        """
+    )
+    await _add_column(db, "handoffs", "dest", "INTEGER")
+
+
+_MIGRATIONS = [_migrate_1, _migrate_2, _migrate_3, _migrate_4, _migrate_5, _migrate_6, _migrate_7, _migrate_8, _migrate_9]
+
+
+async def init_db() -> None:
+    db = await get_db()
+    cur = await db.execute("PRAGMA user_version")
+    version = (await cur.fetchone())[0]
+    await cur.close()
+    for target, migrate in enumerate(_MIGRATIONS, start=1):
+        if version >= target:
+            continue
+        await migrate(db)
+        await db.execute(f"PRAGMA user_version={target}")
+        await db.commit()
+        version = target
+
 async def load_lead(chat_id: int) -> Optional[LeadState]:
+    lead = lead_cache.get(chat_id)
+    if lead is not None:
+        stats["cache_hits"] += 1
+        return lead
+    stats["cache_misses"] += 1
+
+    pending = writer.peek(("leads", chat_id))
+    if pending is not _MISSING:
+        # not flushed yet: None means a pending delete
+        if pending is None:
+            return None
+        lead = codec.loads(pending)
+        lead_cache.put(lead, pending)
+        return lead
+
     db = await get_db()
-    cur = await db.execute("SELECT data FROM leads WHERE chat_id = ?", (chat_id,))
+    t0 = time.perf_counter()
+    cur = await db.execute(_SELECT_LEAD_SQL, (chat_id,))
     row = await cur.fetchone()
     await cur.close()
+    _t_select.observe(time.perf_counter() - t0)
     if not row:
-        return None
-    data = json.loads(row["data"])
-    return LeadState.from_dict(data)
+        return await _restore_archived(chat_id)
+    lead = _row_to_lead(row)
+    lead_cache.put(lead)
+    return lead
 
 async def save_lead(lead: LeadState) -> None:
-    db = await get_db()
+    stats["saves"] += 1
+    if not lead_cache.is_dirty(lead):
+        stats["clean_saves"] += 1
+        return
     lead.touch()
-    data = json.dumps(lead.to_dict(), ensure_ascii=False)
-    await db.execute(
+    encoded = codec.dumps(lead)
+    lead_cache.put(lead, encoded)
+    # extras were read with the row, so keys written by a newer version are written back unchanged
+    await _write(("leads", lead.chat_id), _UPSERT_LEAD_SQL, _lead_to_row(lead), encoded)
+
+async def reset_lead(chat_id: int) -> None:
+    lead_cache.invalidate(chat_id)
+    await _write(("leads", chat_id), "DELETE FROM leads WHERE chat_id = ?", (chat_id,), None)
+
+
+# ---------- retention / archive ----------
+
+async def archive_candidates(
+    finished_before: str, stale_before: str, limit: int, shard: Optional[Tuple[int, int]] = None
+) -> List[LeadState]:
+    """
+    Oldest leads due for the archive: handed off or paused and not updated since
+    finished_before, or not updated at all since stale_before (ISO times like updated_at;
+    "" disables either rule). Leads with a pending reminder or without updated_at are kept.
+    """
+    await writer.flush()
+    db = await get_db()
+    cond, params = _shard_sql(shard)
+    cur = await db.execute(
+        f"SELECT {', '.join(_LEAD_COLUMNS)}, extras FROM leads "
+        f"WHERE updated_at > '' AND ((updated_at < ? AND (handoff_sent OR paused)) OR updated_at < ?)"
+        f" AND chat_id NOT IN (SELECT chat_id FROM reminders){cond} ORDER BY updated_at LIMIT ?",
+        (finished_before, stale_before, *params, limit),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    return [_row_to_lead(r) for r in rows]
+
+async def chat_history(chat_ids: List[int]) -> Tuple[Dict[int, List[Dict[str, Any]]], Dict[int, Dict[str, Any]]]:
+    """(chat_id -> events in order, chat_id -> handoffs row) for archiving."""
+    db = await get_db()
+    events: Dict[int, List[Dict[str, Any]]] = {c: [] for c in chat_ids}
+    handoffs: Dict[int, Dict[str, Any]] = {}
+    marks = ", ".join("?" for _ in chat_ids)
+    cur = await db.execute(f"SELECT id, ts, chat_id, kind, data FROM events WHERE chat_id IN ({marks}) ORDER BY id", tuple(chat_ids))
+    for r in await cur.fetchall():
+        events[r["chat_id"]].append(
+            {"id": r["id"], "ts": r["ts"], "kind": r["kind"], "data": json.loads(r["data"]) if r["data"] else {}}
+        )
+    await cur.close()
+    cur = await db.execute(f"SELECT * FROM handoffs WHERE chat_id IN ({marks})", tuple(chat_ids))
+    for r in await cur.fetchall():
+        handoffs[r["chat_id"]] = dict(r)
+    await cur.close()
+    return events, handoffs
+
+async def delete_archived(items: List[Tuple[int, str, int]], segment: str) -> List[int]:
+    """
+    One transaction: delete leads written to segment, with their events (up to the last
+    archived id) and handoff row, and point archived_leads at segment. items are
+    (chat_id, updated_at, last event id, funnel stage); a lead updated since it was read
+    stays. The all-time leads:<stage> counters drop the archived leads (restore adds them back).
+    Returns the chat_ids actually archived. Pending saves are flushed first (under the
+    writer lock), so the updated_at check sees them.
+    """
+    now = time.time()
+    done: List[int] = []
+    left: Dict[str, int] = {}
+    t0 = time.perf_counter()
+    async with writer.transaction() as db:
+        for chat_id, updated_at, last_event, stage in items:
+            cur = await db.execute("DELETE FROM leads WHERE chat_id = ? AND updated_at = ?", (chat_id, updated_at))
+            deleted = cur.rowcount
+            await cur.close()
+            if not deleted:
+                continue
+            await db.execute("DELETE FROM events WHERE chat_id = ? AND id <= ?", (chat_id, last_event))
+            await db.execute("DELETE FROM handoffs WHERE chat_id = ?", (chat_id,))
+            await db.execute(
+                "INSERT OR REPLACE INTO archived_leads(chat_id, segment, archived_at) VALUES(?, ?, ?)", (chat_id, segment, now)
+            )
+            done.append(chat_id)
+            if stage is not None:
+                left[f"leads:{stage}"] = left.get(f"leads:{stage}", 0) - 1
+        await db.executemany(_BUMP_STAT_SQL, [("*", name, delta) for name, delta in left.items()])
+    _t_maintenance.observe(time.perf_counter() - t0)
+    stats["archived"] += len(done)
+    for chat_id in done:
+        lead_cache.invalidate(chat_id)
+    return done
+
+async def _restore_archived(chat_id: int) -> Optional[LeadState]:
+    """A client of an archived lead wrote again: put the lead, its events and handoff row back."""
+    db = await get_db()
+    cur = await db.execute("SELECT segment FROM archived_leads WHERE chat_id = ?", (chat_id,))
+    row = await cur.fetchone()
+    await cur.close()
+    if not row:
+        return None
+    segment = row[0]
+    record = await asyncio.to_thread(read_record, os.path.join(settings.ARCHIVE_DIR, segment), chat_id)
+
+    lead = None
+    async with writer.transaction() as db:
+        # claim the row first: two loads of the same chat may both have got this far
+        cur = await db.execute("DELETE FROM archived_leads WHERE chat_id = ? AND segment = ?", (chat_id, segment))
+        claimed = cur.rowcount == 1
+        await cur.close()
+        if claimed and record is not None:
+            lead = LeadState.from_dict(record["lead"])
+            # new ids, in the original order: the archived ids may belong to newer events by now
+            events = sorted(record.get("events") or (), key=lambda e: (e["ts"], e["id"]))
+            await db.execute(_UPSERT_LEAD_SQL, _lead_to_row(lead))
+            await db.executemany(
+                "INSERT INTO events(ts, chat_id, kind, data) VALUES(?, ?, ?, ?)",
+                [
+                    (e["ts"], chat_id, e["kind"], json.dumps(e["data"], ensure_ascii=False) if e["data"] else None)
+                    for e in events
+                ],
+            )
+            h = record.get("handoff")
+            if h:
+                await db.execute(
+                    f"INSERT OR IGNORE INTO handoffs({', '.join(h)}) VALUES({', '.join('?' for _ in h)})",
+                    tuple(h.values()),
+                )
+            stage = stage_of(lead)
+            if stage is not None:
+                await db.execute(_BUMP_STAT_SQL, ("*", f"leads:{stage}", 1))
+    if not claimed:
+        # the other load restored it meanwhile
+        return await load_lead(chat_id)
+    if lead is None:
+        print(f"[archive] chat={chat_id}: not found in segment {segment}, starting over")
+        return None
+    stats["restored"] += 1
+    lead_cache.put(lead)
+    return lead
+
+async def enable_incremental_vacuum() -> bool:
+    """
+    Switch a file created before auto_vacuum=INCREMENTAL over: one full VACUUM (rewrites the
+    file, needs as much free disk again). Returns True if it ran. Run it off-peak.
+    """
+    db = await get_db()
+    cur = await db.execute("PRAGMA auto_vacuum")
+    mode = (await cur.fetchone())[0]
+    await cur.close()
+    if mode == 2:
+        return False
+    t0 = time.perf_counter()
+    async with writer.transaction() as db:
+        await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await db.commit()
+        await db.execute("VACUUM")
+    _t_maintenance.observe(time.perf_counter() - t0)
+    return True
+
+async def incremental_vacuum(pages: int) -> int:
+    """Return up to pages free pages to the file system; the number still free afterwards."""
+    t0 = time.perf_counter()
+    async with writer.transaction() as db:
+        cur = await db.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+        await cur.fetchall()  # every step frees one page
+        await cur.close()
+    cur = await db.execute("PRAGMA freelist_count")
+    free = (await cur.fetchone())[0]
+    await cur.close()
+    _t_maintenance.observe(time.perf_counter() - t0)
+    return free
+
+async def analyze() -> None:
+    """Refresh planner statistics (sampled, so it stays short on a big file) and truncate the WAL."""
+    t0 = time.perf_counter()
+    async with writer.transaction() as db:
+        await db.execute("PRAGMA analysis_limit=1000")
+        await db.execute("ANALYZE")
+    await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    _t_maintenance.observe(time.perf_counter() - t0)
+
+
+# ---------- funnel stats ----------
+
+_BUMP_STAT_SQL = (
+    "INSERT INTO funnel_stats(day, name, value) VALUES(?, ?, ?) "
+    "ON CONFLICT(day, name) DO UPDATE SET value = value + excluded.value"
+)
+
+
+async def bump_stats(day: str, deltas: Dict[str, int]) -> None:
+    """Add deltas to the day's counters; increments still queued for the same row are merged into one write."""
+    for name, delta in deltas.items():
+        if settings.DB_WRITE_BEHIND:
+            writer.add(("funnel_stats", day, name), _BUMP_STAT_SQL, (day, name), delta)
+        else:
+            await _write(("funnel_stats", day, name), _BUMP_STAT_SQL, (day, name, delta))
+
+
+async def read_stats(days: List[str]) -> Dict[str, Dict[str, int]]:
+    """day -> {name: value} for the given days (primary-key lookups, independent of table sizes)."""
+    await writer.flush()
+    db = await get_db()
+    out: Dict[str, Dict[str, int]] = {d: {} for d in days}
+    cur = await db.execute(
+        f"SELECT day, name, value FROM funnel_stats WHERE day IN ({', '.join('?' for _ in days)})", tuple(days)
+    )
+    for r in await cur.fetchall():
+        out[r["day"]][r["name"]] = r["value"]
+    await cur.close()
+    return out
+
+
+# ---------- reminders ----------
+
+async def save_reminder(chat_id: int, due_at: float, business_connection_id: Optional[str]) -> None:
+    await _write(
+        ("reminders", chat_id),
         """
-        INSERT INTO leads(chat_id, data)
-        VALUES(?, ?)
-        ON CONFLICT(chat_id) DO UPDATE SET data=excluded.data
+        INSERT INTO reminders(chat_id, due_at, business_connection_id)
+        VALUES(?, ?, ?)
+        ON CONFLICT(chat_id) DO UPDATE SET due_at=excluded.due_at, business_connection_id=excluded.business_connection_id
         """,
-        (lead.chat_id, data),
+        (chat_id, due_at, business_connection_id),
     )
-    await db.commit()
 
-async def reset_lead(chat_id: int) -> None:
+async def delete_reminder(chat_id: int) -> None:
+    await _write(("reminders", chat_id), "DELETE FROM reminders WHERE chat_id = ?", (chat_id,))
+
+async def iter_reminders(batch: int = 1000) -> AsyncIterator[Tuple[int, float, Optional[str]]]:
+    """All pending reminders ordered by due_at, fetched in chunks."""
+    await writer.flush()
     db = await get_db()
-    await db.execute("DELETE FROM leads WHERE chat_id = ?", (chat_id,))
-    await db.commit()
+    cur = await db.execute("SELECT chat_id, due_at, business_connection_id FROM reminders ORDER BY due_at")
+    try:
+        while True:
+            rows = await cur.fetchmany(batch)
+            if not rows:
+                break
+            for r in rows:
+                yield r["chat_id"], r["due_at"], r["business_connection_id"]
+    finally:
+        await cur.close()
+
+
+# ---------- handoff outbox ----------
+
+def _shard_sql(shard: Optional[Tuple[int, int]]) -> Tuple[str, tuple]:
+    if shard is None:
+        return "", ()
+    # SQLite's % keeps the sign of chat_id; normalize to python's chat_id % workers
+    return " AND ((chat_id % ?) + ?) % ? = ?", (shard[1], shard[1], shard[1], shard[0])
+
+async def enqueue_handoff(chat_id: int, card: str, dest: Optional[int] = None) -> None:
+    """
+    Queue a lead card (replaces an older card of the same lead, e.g. after /reset).
+    dest: the chat to send it to (the tenant's leads chat); None means LEADS_CHAT_ID.
+    """
+    now = time.time()
+    await _write(
+        ("handoffs", chat_id),
+        """
+        INSERT INTO handoffs(chat_id, card, status, attempts, next_at, created_at, sent_at, message_id, last_error, dest)
+        VALUES(?, ?, 'pending', 0, ?, ?, NULL, NULL, NULL, ?)
+        ON CONFLICT(chat_id) DO UPDATE SET card=excluded.card, status='pending', attempts=0,
+            next_at=excluded.next_at, created_at=excluded.created_at, sent_at=NULL, message_id=NULL, last_error=NULL,
+            dest=excluded.dest
+        """,
+        (chat_id, card, now, now, dest),
+    )
+
+async def due_handoffs(now: float, limit: int, shard: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    """Pending cards whose next attempt is due, oldest first."""
+    await writer.flush()
+    db = await get_db()
+    cond, params = _shard_sql(shard)
+    cur = await db.execute(
+        f"SELECT chat_id, card, attempts, created_at, dest FROM handoffs "
+        f"WHERE status = 'pending' AND next_at <= ?{cond} ORDER BY created_at LIMIT ?",
+        (now, *params, limit),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    return [dict(r) for r in rows]
+
+async def next_handoff_at(shard: Optional[Tuple[int, int]] = None) -> Optional[float]:
+    db = await get_db()
+    cond, params = _shard_sql(shard)
+    cur = await db.execute(f"SELECT MIN(next_at) FROM handoffs WHERE status = 'pending'{cond}", params)
+    row = await cur.fetchone()
+    await cur.close()
+    return row[0]
+
+async def count_handoffs(status: str = "pending", shard: Optional[Tuple[int, int]] = None) -> int:
+    db = await get_db()
+    cond, params = _shard_sql(shard)
+    cur = await db.execute(f"SELECT COUNT(*) FROM handoffs WHERE status = ?{cond}", (status, *params))
+    row = await cur.fetchone()
+    await cur.close()
+    return row[0]
+
+async def mark_handoffs_sent(chat_ids: List[int], message_id: Optional[int]) -> None:
+    # committed right away: a lost "sent" mark means the card goes out twice
+    now = time.time()
+    async with writer.transaction() as db:
+        await db.executemany(
+            "UPDATE handoffs SET status = 'sent', attempts = attempts + 1, sent_at = ?, message_id = ?, last_error = NULL "
+            "WHERE chat_id = ?",
+            [(now, message_id, c) for c in chat_ids],
+        )
+
+async def mark_handoffs_retry(rows: List[Tuple[int, Optional[float], str]]) -> None:
+    """rows: (chat_id, next_at or None to give up, error)."""
+    async with writer.transaction() as db:
+        await db.executemany(
+            "UPDATE handoffs SET attempts = attempts + 1, last_error = ?, "
+            "status = CASE WHEN ? IS NULL THEN 'failed' ELSE 'pending' END, next_at = COALESCE(?, next_at) "
+            "WHERE chat_id = ?",
+            [(err, next_at, next_at, c) for c, next_at, err in rows],
+        )
+
+async def handoff_status(chat_id: int) -> Optional[Dict[str, Any]]:
+    await writer.flush()
+    db = await get_db()
+    cur = await db.execute(
+        "SELECT status, attempts, created_at, sent_at, message_id, last_error FROM handoffs WHERE chat_id = ?",
+        (chat_id,),
+    )
+    row = await cur.fetchone()
+    await cur.close()
+    return dict(row) if row else None
+
+
+# ---------- tenants ----------
+
+TENANT_COLUMNS = ("name", "leads_chat_id", "reminder_minutes", "llm_mode", "q1", "q2", "q3", "final")
+
+
+async def load_tenants() -> List[Dict[str, Any]]:
+    db = await get_db()
+    cur = await db.execute(f"SELECT business_connection_id, {', '.join(TENANT_COLUMNS)} FROM tenants")
+    rows = await cur.fetchall()
+    await cur.close()
+    return [dict(r) for r in rows]
+
+async def tenants_version() -> Tuple[int, Optional[float]]:
+    """(row count, latest updated_at): changes whenever a tenant is added, edited or removed."""
+    db = await get_db()
+    cur = await db.execute("SELECT COUNT(*), MAX(updated_at) FROM tenants")
+    row = await cur.fetchone()
+    await cur.close()
+    return row[0], row[1]
+
+async def upsert_tenant(business_connection_id: str, **fields: Any) -> None:
+    """Create the tenant or change the given columns (a None value resets it to the default)."""
+    unknown = set(fields) - set(TENANT_COLUMNS)
+    if unknown:
+        raise ValueError(f"unknown tenant fields: {', '.join(sorted(unknown))}")
+    cols = list(fields)
+    updates = "".join(f"{c}=excluded.{c}, " for c in cols)
+    async with writer.transaction() as db:
+        await db.execute(
+            f"INSERT INTO tenants(business_connection_id, {''.join(c + ', ' for c in cols)}updated_at) "
+            f"VALUES(?, {''.join('?, ' for _ in cols)}?) "
+            f"ON CONFLICT(business_connection_id) DO UPDATE SET {updates}updated_at=excluded.updated_at",
+            (business_connection_id, *(fields[c] if c != "name" else fields[c] or "" for c in cols), time.time()),
+        )
+
+async def delete_tenant(business_connection_id: str) -> bool:
+    async with writer.transaction() as db:
+        cur = await db.execute("DELETE FROM tenants WHERE business_connection_id = ?", (business_connection_id,))
+    return cur.rowcount > 0
+
+
+# ---------- listings ----------
+
+PASSAGE_BITS = 10
+MAX_PASSAGES = 1 << PASSAGE_BITS  # per listing; the rest of a longer text is not indexed
+
+
+def _passage_range(listing_id: int) -> Tuple[int, int]:
+    lo = listing_id << PASSAGE_BITS
+    return lo, lo + MAX_PASSAGES - 1
+
+
+async def add_listing(
+    digest: str, source: str, text: str, passages: List[str], url: Optional[str] = None, address: Optional[str] = None
+) -> int:
+    """Store a listing and index its passages; a listing with the same digest is stored once. Returns its id."""
+    async with writer.transaction() as db:
+        cur = await db.execute("SELECT id FROM listings WHERE hash = ?", (digest,))
+        row = await cur.fetchone()
+        await cur.close()
+        if row:
+            return row[0]
+        cur = await db.execute(
+            "INSERT INTO listings(hash, source, url, address, text, created_at) VALUES(?, ?, ?, ?, ?, ?)",
+            (digest, source, url, address, text, time.time()),
+        )
+        listing_id = cur.lastrowid
+        await cur.close()
+        base = listing_id << PASSAGE_BITS
+        await db.executemany(
+            "INSERT INTO listing_passages(rowid, body, address) VALUES(?, ?, ?)",
+            [(base + i, p, address or "") for i, p in enumerate(passages[:MAX_PASSAGES])],
+        )
+    return listing_id
+
+async def get_listing(listing_id: int) -> Optional[Dict[str, Any]]:
+    db = await get_db()
+    cur = await db.execute("SELECT id, source, url, address, text, created_at FROM listings WHERE id = ?", (listing_id,))
+    row = await cur.fetchone()
+    await cur.close()
+    return dict(row) if row else None
+
+async def find_listing_by_url(url: str) -> Optional[int]:
+    db = await get_db()
+    cur = await db.execute("SELECT id FROM listings WHERE url = ? ORDER BY id DESC LIMIT 1", (url,))
+    row = await cur.fetchone()
+    await cur.close()
+    return row[0] if row else None
+
+async def search_passages(
+    match: str, listing_id: Optional[int] = None, limit: int = 5
+) -> List[Tuple[int, int, str, float]]:
+    """FTS5 query -> (listing_id, ord, body, rank), best first; address hits weigh more than body hits."""
+    db = await get_db()
+    cond, params = ("", ()) if listing_id is None else (" AND rowid BETWEEN ? AND ?", _passage_range(listing_id))
+    t0 = time.perf_counter()
+    cur = await db.execute(
+        "SELECT rowid, body, bm25(listing_passages, 1.0, 4.0) AS rank FROM listing_passages "
+        f"WHERE listing_passages MATCH ?{cond} ORDER BY rank LIMIT ?",
+        (match, *params, limit),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    _t_search.observe(time.perf_counter() - t0)
+    return [(r[0] >> PASSAGE_BITS, r[0] & (MAX_PASSAGES - 1), r[1], r[2]) for r in rows]
+
+async def get_passages(listing_id: int, first: int = MAX_PASSAGES) -> List[Tuple[int, str]]:
+    """(ord, body) of one listing's first passages, in text order."""
+    db = await get_db()
+    lo, hi = _passage_range(listing_id)
+    cur = await db.execute(
+        "SELECT rowid, body FROM listing_passages WHERE rowid BETWEEN ? AND ? ORDER BY rowid",
+        (lo, min(hi, lo + first - 1)),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    return [(r[0] - lo, r[1]) for r in rows]
+
+
+# ---------- events (append-only) ----------
+
+_EVENT_SQL = "INSERT INTO events(ts, chat_id, kind, data) VALUES(?, ?, ?, ?)"
+_event_seq = itertools.count()
+
+
+async def log_event(chat_id: int, kind: str, **data: Any) -> None:
+    """
+    Append one event. Goes through the write-behind queue under a key of its own, so
+    events are never coalesced and land in the same batched transaction as lead saves.
+    """
+    await _write(
+        ("events", next(_event_seq)),
+        _EVENT_SQL,
+        (time.time(), chat_id, kind, json.dumps(data, ensure_ascii=False) if data else None),
+    )
+
+async def iter_events(
+    since: Optional[float] = None, until: Optional[float] = None, batch: int = 1000
+) -> AsyncIterator[Dict[str, Any]]:
+    """Events with since <= ts < until in insertion order, fetched in chunks."""
+    await writer.flush()
+    db = await get_db()
+    last = 0
+    lo = float("-inf") if since is None else since
+    hi = float("inf") if until is None else until
+    while True:
+        cur = await db.execute(
+            "SELECT id, ts, chat_id, kind, data FROM events WHERE id > ? AND ts >= ? AND ts < ? ORDER BY id LIMIT ?",
+            (last, lo, hi, batch),
+        )
+        rows = await cur.fetchall()
+        await cur.close()
+        if not rows:
+            return
+        for r in rows:
+            yield {
+                "id": r["id"],
+                "ts": r["ts"],
+                "chat_id": r["chat_id"],
+                "kind": r["kind"],
+                "data": json.loads(r["data"]) if r["data"] else {},
+            }
+        last = rows[-1]["id"]
+
+
+# ---------- bulk access (offline jobs) ----------
+
+async def iter_lead_rows(
+    columns: Tuple[str, ...],
+    after: Optional[int] = None,
+    batch: int = 1000,
+    where: str = "",
+    params: tuple = (),
+) -> AsyncIterator[List[Any]]:
+    """
+    Leads in chat_id order, one chunk of rows at a time (keyset pagination: no cursor stays
+    open between chunks, so the caller can write in between). `where` is an extra SQL
+    condition with `params` for its placeholders.
+    """
+    await writer.flush()
+    db = await get_db()
+    last = -(2**63) if after is None else after
+    cond = f" AND ({where})" if where else ""
+    sql = f"SELECT {', '.join(columns)} FROM leads WHERE chat_id > ?{cond} ORDER BY chat_id LIMIT ?"
+    while True:
+        cur = await db.execute(sql, (last, *params, batch))
+        rows = await cur.fetchall()
+        await cur.close()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]["chat_id"]
+
+async def update_lead_columns(columns: Tuple[str, ...], rows: List[tuple]) -> None:
+    """UPDATE columns of many leads in one transaction; each row is (*values, chat_id)."""
+    if not rows:
+        return
+    async with writer.transaction() as db:
+        await db.executemany(
+            f"UPDATE leads SET {', '.join(f'{c} = ?' for c in columns)} WHERE chat_id = ?",
+            rows,
+        )
+    stats["rows"] += len(rows)
+    for r in rows:
+        lead_cache.invalidate(r[-1])
@@ -0,0 +1,137 @@
+"""
+Stream events or leads out of SQLite as JSONL or CSV (optionally gzip).
+
+    python -m app.export events --since 2026-05-01 --until 2026-06-01 -o may.jsonl.gz
+    python -m app.export leads --since 2026-05-01 --format csv -o leads.csv
+    python -m app.export events --since 1714521600 | jq .kind       # stdout, unix time
+
+Rows are fetched in chunks and written one by one, so memory stays flat whatever the
+range. --since is inclusive, --until exclusive; both take an ISO date/datetime (UTC)
+or a unix timestamp. Leads are filtered by updated_at; their extras (fields the LLM
+tier found, keys from newer versions) come as a JSON object, in CSV too. gzip is
+picked by --gzip or an output name ending in .gz.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, TextIO
+
+from app.db import _LEAD_COLUMNS, close_db, init_db, iter_events, iter_lead_rows
+
+EVENT_COLUMNS = ("id", "ts", "time", "chat_id", "kind", "data")
+LEAD_COLUMNS = _LEAD_COLUMNS + ("extras",)
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _extras(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return {"_raw": raw}
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+async def event_records(since: Optional[float], until: Optional[float]) -> AsyncIterator[Dict[str, Any]]:
+    async for e in iter_events(since, until):
+        yield {"id": e["id"], "ts": e["ts"], "time": _iso(e["ts"]), "chat_id": e["chat_id"], "kind": e["kind"], "data": e["data"]}
+
+
+async def lead_records(since: Optional[float], until: Optional[float]) -> AsyncIterator[Dict[str, Any]]:
+    # updated_at is stored as "YYYY-MM-DDTHH:MM:SSZ", so string comparison is time order
+    conds, params = [], []
+    if since is not None:
+        conds.append("updated_at >= ?")
+        params.append(_iso(since))
+    if until is not None:
+        conds.append("updated_at < ?")
+        params.append(_iso(until))
+    async for rows in iter_lead_rows(LEAD_COLUMNS, where=" AND ".join(conds), params=tuple(params)):
+        for r in rows:
+            yield {**{c: r[c] for c in _LEAD_COLUMNS}, "extras": _extras(r["extras"])}
+
+
+def _open(path: str, compress: bool) -> TextIO:
+    if path == "-":
+        if compress:
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb"), encoding="utf-8")
+        return sys.stdout
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+async def export(what: str, fmt: str, out: TextIO, since: Optional[float], until: Optional[float]) -> int:
+    records = event_records(since, until) if what == "events" else lead_records(since, until)
+    columns = EVENT_COLUMNS if what == "events" else LEAD_COLUMNS
+    writer = csv.writer(out) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(columns)
+    n = 0
+    async for rec in records:
+        if writer is not None:
+            writer.writerow(
+                [json.dumps(rec[c], ensure_ascii=False) if isinstance(rec[c], dict) else rec[c] for c in columns]
+            )
+        else:
+            out.write(json.dumps(rec, ensure_ascii=False))
+            out.write("\n")
+        n += 1
+    return n
+
+
+async def _main(args: argparse.Namespace) -> int:
+    await init_db()
+    compress = args.gzip or args.output.endswith(".gz")
+    out = _open(args.output, compress)
+    try:
+        return await export(args.what, args.format, out, parse_time(args.since), parse_time(args.until))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        await close_db()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Export events or leads as JSONL/CSV")
+    ap.add_argument("what", choices=("events", "leads"))
+    ap.add_argument("--since", help="inclusive; ISO date/datetime (UTC) or unix time")
+    ap.add_argument("--until", help="exclusive; ISO date/datetime (UTC) or unix time")
+    ap.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    ap.add_argument("-o", "--output", default="-", help="file name, '-' for stdout")
+    ap.add_argument("--gzip", action="store_true")
+    args = ap.parse_args()
+    try:
+        n = asyncio.run(_main(args))
+    except BrokenPipeError:  # `... | head`: stop quietly, no traceback at interpreter exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+    print(f"[export] {n} {args.what}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
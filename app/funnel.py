@@ -0,0 +1,144 @@
+"""
+Funnel statistics kept up to date as leads move between stages, so /stats never scans leads.
+
+Stages (lead_logic.STAGES): q1 -> q2 -> q3 -> handoff. Every time a reply moves a lead,
+record(before, after, created_at) bumps a handful of counters in the funnel_stats table:
+
+- leads:<stage>  (all-time row only) leads sitting at the stage right now; leads moved to
+  the archive (app.retention) are taken off and put back when restored
+- reached:<stage> leads that got to the stage (a skipped stage counts as passed)
+- sec_sum:<stage>, le:<stage>:<bound>  time from the first message to the stage, as a
+  histogram over TIME_BUCKETS (per bucket, not cumulative)
+
+Each counter is written for the all-time row ('*') and for the UTC day it happened; a
+restart (/start, /reset) only takes the lead off its stage. Increments go through the
+write-behind queue and are additive in SQL, so worker processes can share the table.
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.db import bump_stats, read_stats
+from app.lead_logic import STAGES
+from app.metrics import registry
+
+TIME_BUCKETS = (60, 300, 900, 3600, 4 * 3600, 86400, 3 * 86400, 7 * 86400)
+ALL_TIME = "*"
+_RANK = {s: i for i, s in enumerate(STAGES)}
+_LABELS = {"q1": "Q1 (кол-во, заезд)", "q2": "Q2 (работа)", "q3": "Q3 (показ)", "handoff": "Передано"}
+
+funnel_reached = registry.counter("leadbot_funnel_reached_total", "Leads that reached a funnel stage", ["stage"])
+funnel_seconds = registry.histogram(
+    "leadbot_funnel_stage_seconds", "Time from a lead's first message to a funnel stage", ["stage"], buckets=TIME_BUCKETS
+)
+
+
+def day_of(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+def _age(created_at: str, now: float) -> Optional[float]:
+    if not created_at:
+        return None
+    try:
+        return max(0.0, now - datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return None
+
+
+def _bucket(seconds: float) -> str:
+    for b in TIME_BUCKETS:
+        if seconds <= b:
+            return str(b)
+    return "inf"
+
+
+async def record(before: Optional[str], after: Optional[str], created_at: str = "", now: Optional[float] = None) -> None:
+    """A lead moved from stage before to stage after (None: not in the funnel)."""
+    if before == after:
+        return
+    now = time.time() if now is None else now
+    moved: Dict[str, int] = {}
+    if before is not None:
+        moved[f"leads:{before}"] = -1
+    if after is not None:
+        moved[f"leads:{after}"] = 1
+
+    daily: Dict[str, int] = {}
+    if after is not None and (before is None or _RANK[after] > _RANK[before]):
+        age = _age(created_at, now)
+        first = 0 if before is None else _RANK[before] + 1
+        for stage in STAGES[first : _RANK[after] + 1]:
+            daily[f"reached:{stage}"] = 1
+            funnel_reached.labels(stage).inc()
+            if stage != "q1" and age is not None:
+                daily[f"sec_sum:{stage}"] = round(age)
+                daily[f"le:{stage}:{_bucket(age)}"] = 1
+                funnel_seconds.labels(stage).observe(age)
+
+    await bump_stats(ALL_TIME, {**moved, **daily})
+    if daily:
+        await bump_stats(day_of(now), daily)
+
+
+def median_seconds(counters: Dict[str, int], stage: str) -> Optional[float]:
+    """Median time to stage from its histogram, interpolated inside the bucket (None: no data)."""
+    counts = [counters.get(f"le:{stage}:{b}", 0) for b in TIME_BUCKETS] + [counters.get(f"le:{stage}:inf", 0)]
+    total = sum(counts)
+    if not total:
+        return None
+    half = total / 2
+    seen = 0
+    lower = 0.0
+    for bound, n in zip(TIME_BUCKETS + (None,), counts):
+        if n and seen + n >= half:
+            if bound is None:
+                return float(TIME_BUCKETS[-1])
+            return lower + (bound - lower) * (half - seen) / n
+        seen += n
+        lower = float(bound) if bound is not None else lower
+    return None
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{max(1, round(seconds / 60))} мин"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} ч"
+    return f"{seconds / 86400:.1f} дн"
+
+
+def _sum_days(rows: Dict[str, Dict[str, int]], days: List[str]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for d in days:
+        for k, v in rows.get(d, {}).items():
+            out[k] = out.get(k, 0) + v
+    return out
+
+
+async def stats_text(now: Optional[float] = None) -> str:
+    """The /stats answer: stage sizes now, stages reached today / 7 days / all time, time to handoff."""
+    now = time.time() if now is None else now
+    week = [day_of(now - i * 86400) for i in range(7)]
+    rows = await read_stats([ALL_TIME] + week)
+    total = rows[ALL_TIME]
+    columns = (("сегодня", rows[week[0]]), ("7 дней", _sum_days(rows, week)), ("всего", total))
+
+    lines = ["Сейчас: " + " · ".join(f"{s.upper()} {total.get(f'leads:{s}', 0)}" for s in STAGES[:-1])]
+    lines.append("")
+    lines.append(f"{'':<19}" + "".join(f"{name:>9}" for name, _ in columns))
+    for s in STAGES:
+        lines.append(f"{_LABELS[s]:<19}" + "".join(f"{c.get(f'reached:{s}', 0):>9}" for _, c in columns))
+    lines.append("")
+    for name, c in (("7 дней", columns[1][1]), ("всего", total)):
+        n = c.get("reached:handoff", 0)
+        med = median_seconds(c, "handoff")
+        timed = sum(c.get(f"le:handoff:{b}", 0) for b in TIME_BUCKETS + ("inf",))
+        if med is None or not timed:
+            lines.append(f"До передачи ({name}): нет данных")
+            continue
+        mean = c.get("sec_sum:handoff", 0) / timed
+        lines.append(f"До передачи ({name}): медиана ≈ {_duration(med)}, среднее {_duration(mean)} (n={n})")
+    return "📊 Воронка\n<pre>" + "\n".join(lines) + "</pre>"
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from typing import NamedTuple, Optional, Tuple
 
 from app.models import LeadState
-from app.utils import extract_move_in, extract_people_count, extract_showing_time
+from app.utils import extract_all
 
 Q1 = "Здравствуйте! Подскажите, пожалуйста, сколько вас человек и когда планируете заселение?"
 Q2 = "Спасибо! Кем вы работаете ?"
@@ -11,6 +11,37 @@ Q3 = "В какое время удобно подъехать на показ 
 FINAL = "Понял. Менеджер уже получил ваш запрос и свяжется с вами."
 
 
+class Questions(NamedTuple):
+    """Texts a client sees (per tenant). lead.last_question always keeps the built-in Q1/Q2/Q3:
+    it is the step key that extraction and the funnel go by, whatever text was sent."""
+
+    q1: str = Q1
+    q2: str = Q2
+    q3: str = Q3
+    final: str = FINAL
+
+    def text_for(self, question: Optional[str]) -> Optional[str]:
+        """Client-facing text of a built-in question (anything else is returned as is)."""
+        return {Q1: self.q1, Q2: self.q2, Q3: self.q3, FINAL: self.final}.get(question, question)
+
+
+DEFAULT_QUESTIONS = Questions()
+
+
+# funnel stages in order: the question a lead is at, then handed off to the manager
+STAGES = ("q1", "q2", "q3", "handoff")
+_STAGE_BY_QUESTION = {Q1: "q1", Q2: "q2", Q3: "q3"}
+
+
+def stage_of(lead: Optional[LeadState]) -> Optional[str]:
+    """Funnel stage of a lead (None: not started)."""
+    if lead is None:
+        return None
+    if lead.handoff_sent:
+        return "handoff"
+    return _STAGE_BY_QUESTION.get(lead.last_question)
+
+
 def _clean_text(t: str) -> str:
     return (t or "").strip()
 
@@ -20,11 +51,12 @@ def apply_extraction(lead: LeadState, text: str) -> None:
     if not t:
         return
 
-    pc = extract_people_count(t)
+    ex = extract_all(t)  # one pass for all three fields
+    pc = ex.people_count
     if pc and not getattr(lead, "people_count", None):
         lead.people_count = pc
 
-    mv = extract_move_in(t)
+    mv = ex.move_in
     if mv and not getattr(lead, "move_in", None):
         lead.move_in = mv
 
@@ -39,28 +71,31 @@ def apply_extraction(lead: LeadState, text: str) -> None:
         if not getattr(lead, "showing_text", None):
             lead.showing_text = t[:200]
         if not getattr(lead, "showing_time", None):
-            st = extract_showing_time(t)
+            st = ex.showing_time
             if st:
                 lead.showing_time = st
 
 
-def next_question(lead: LeadState) -> Tuple[str, Optional[str], bool]:
+def next_question(lead: LeadState, questions: Questions = DEFAULT_QUESTIONS) -> Tuple[str, Optional[str], bool]:
+    """(reply text from questions, built-in question to store in last_question, handoff)."""
     if getattr(lead, "handoff_sent", False):
-        return (FINAL, None, False)
+        return (questions.final, None, False)
 
     if not getattr(lead, "people_count", None) or not getattr(lead, "move_in", None):
-        return (Q1, Q1, False)
+        return (questions.q1, Q1, False)
 
     if not getattr(lead, "employment", None):
-        return (Q2, Q2, False)
+        return (questions.q2, Q2, False)
 
     if not getattr(lead, "showing_time", None) and not getattr(lead, "showing_text", None):
-        return (Q3, Q3, False)
+        return (questions.q3, Q3, False)
 
-    return (FINAL, None, True)
+    return (questions.final, None, True)
 
 
-def decide_reply(lead: LeadState, user_text: str) -> Tuple[str, Optional[str], bool, bool]:
+def decide_reply(
+    lead: LeadState, user_text: str, questions: Questions = DEFAULT_QUESTIONS
+) -> Tuple[str, Optional[str], bool, bool]:
     before = (
         getattr(lead, "people_count", None),
         getattr(lead, "move_in", None),
@@ -88,7 +123,7 @@ def decide_reply(lead: LeadState, user_text: str) -> Tuple[str, Optional[str], b
         stuck += 1
     setattr(lead, "stuck_count", stuck)
 
-    reply, next_q, do_handoff = next_question(lead)
+    reply, next_q, do_handoff = next_question(lead, questions)
 
     if not progressed and getattr(lead, "last_question", None) and not getattr(lead, "handoff_sent", False) and stuck >= 2:
         reply = "Не совсем понял. " + reply
@@ -0,0 +1,252 @@
+"""
+Listing store: forwarded posts, links and addresses, indexed for lookup and Q&A context.
+
+Every listing text is split into passages of about LISTING_PASSAGE_CHARS (line and sentence
+boundaries kept) and indexed in the `listing_passages` FTS5 table. A client's question is
+turned into a prefix query over its content words, so only the passages that talk about
+deposit / pets / price go into the LLM prompt instead of the first 1500 characters of the post.
+
+    python -m app.listings add post.txt --url https://…      # ingest a listing by hand
+    python -m app.listings search "депозит и животные" [--listing 12]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import re
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.db import add_listing, close_db, find_listing_by_url, get_passages, init_db, search_passages
+
+_URL_RE = re.compile(r"https?://[^\s<>()\"']+", re.IGNORECASE)
+# spellings of one street suffix: an address written either way finds the same listing
+_STREET_SUFFIXES = (
+    ("st", "street"), ("ave", "avenue"), ("rd", "road"), ("blvd", "boulevard"), ("pl", "place"), ("dr", "drive"),
+    ("ln", "lane"), ("ct", "court"), ("pkwy", "parkway"), ("ter", "terrace"), ("sq", "square"), ("way",),
+)
+_SUFFIX_SPELLINGS = {s: names for names in _STREET_SUFFIXES for s in names}
+# house number, street name, suffix: "245 Main Street", "31-15 Ditmars Blvd", "2710 ocean ave".
+# A spelled-out suffix needs a capitalized (or numbered) street name, so that
+# "2 people from the same place" is not an address; an abbreviated one takes any case.
+_ADDRESS_RE = re.compile(
+    r"\b\d{1,6}(?:-\d{1,4})?\s+(?:"
+    r"(?:[A-Z0-9][\w.'-]*\s+){1,4}?(?i:%s)"
+    r"|(?:[A-Za-z0-9][\w.'-]*\s+){1,4}?(?i:%s)"
+    r")\b\.?"
+    % (
+        "|".join(sorted(_SUFFIX_SPELLINGS, key=len, reverse=True)),
+        "|".join(names[0] for names in _STREET_SUFFIXES if len(names) > 1),
+    )
+)
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+
+# question glue that matches every listing and says nothing about which passage is relevant
+_STOPWORDS = frozenset(
+    """
+    а в во вы где да для до его если есть еще ещё же за и из или им как какая какие какой ли мне можно мы на не
+    нет но ну о об от по подскажите пожалуйста при про с со так там то тут у уже что чтобы это я здравствуйте
+    a an and are can do does for from have how i in is it me of on or the there this to what when where which
+    with you your hi hello please
+    """.split()
+)
+_PREFIX_CHARS = 5  # "собака"/"собаки"/"собаками" -> собак*: poor man's stemming for RU and EN
+_MAX_TERMS = 12
+
+
+def listing_digest(text: str) -> str:
+    """Same post forwarded by different clients (or twice) -> same digest."""
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def split_passages(text: str, size: int = 0) -> List[str]:
+    """Consecutive lines packed into passages of about size characters; long lines split at sentences."""
+    size = max(80, size or settings.LISTING_PASSAGE_CHARS)
+    pieces: List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) <= size:
+            pieces.append(line)
+            continue
+        for sentence in _SENTENCE_RE.split(line):
+            while len(sentence) > size:
+                cut = sentence.rfind(" ", 0, size)
+                cut = cut if cut > size // 2 else size
+                pieces.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+
+    passages: List[str] = []
+    current: List[str] = []
+    length = 0
+    for p in pieces:
+        if current and length + 1 + len(p) > size:
+            passages.append("\n".join(current))
+            current, length = [], 0
+        current.append(p)
+        length += len(p) + (1 if length else 0)
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+def match_query(text: str, every: bool = False) -> Optional[str]:
+    """FTS5 query for free text: OR (every=True: AND) of content-word prefixes (None when nothing is left)."""
+    terms: List[str] = []
+    for w in _WORD_RE.findall(text.lower()):
+        if w in _STOPWORDS or len(w) < 2 or (len(w) < 3 and not w.isdigit()):
+            continue
+        t = f'"{w[:_PREFIX_CHARS]}"*'
+        if t not in terms:
+            terms.append(t)
+        if len(terms) >= _MAX_TERMS:
+            break
+    return (" AND " if every else " OR ").join(terms) if terms else None
+
+
+def address_query(address: str) -> Optional[str]:
+    """FTS5 query that needs every token of an address: house number, street name and suffix (either spelling)."""
+    words = _WORD_RE.findall(address.lower())
+    if len(words) < 2:
+        return None
+    *street, suffix = words
+    terms = [f'"{w}"' for w in street]
+    terms.append("(" + " OR ".join(f'"{s}"' for s in _SUFFIX_SPELLINGS.get(suffix, (suffix,))) + ")")
+    return " AND ".join(terms)
+
+
+def find_url(text: str) -> Optional[str]:
+    m = _URL_RE.search(text)
+    return m.group(0).rstrip(".,;:!?") if m else None
+
+
+def find_address(text: str) -> Optional[str]:
+    m = _ADDRESS_RE.search(text)
+    return " ".join(m.group(0).split()) if m else None
+
+
+async def ingest(text: str, source: str, url: Optional[str] = None, address: Optional[str] = None) -> int:
+    text = text.strip()
+    if address is None:
+        address = find_address(text)
+    return await add_listing(listing_digest(text), source, text, split_passages(text), url=url, address=address)
+
+
+async def resolve(ref: str) -> Optional[int]:
+    """
+    listing_ref (link, address or any text) -> id of the best matching stored listing, or None.
+    An address matches only a listing with the same house number and street; other text
+    needs all its content words in one passage and a bm25 score of at least
+    LISTING_MATCH_MIN_SCORE, so a word every listing has ("pets?") picks none of them.
+    """
+    url = find_url(ref)
+    if url:
+        listing_id = await find_listing_by_url(url)
+        if listing_id is not None:
+            return listing_id
+    address = find_address(ref)
+    if address:
+        match = address_query(address)
+        hits = await search_passages(match, limit=1) if match else []
+        return hits[0][0] if hits else None
+    match = match_query(ref, every=True)
+    if match is None:
+        return None
+    hits = await search_passages(match, limit=1)
+    # bm25() is negative, better matches are lower
+    return hits[0][0] if hits and -hits[0][3] >= settings.LISTING_MATCH_MIN_SCORE else None
+
+
+async def ingest_message(text: str, forwarded: bool) -> Optional[int]:
+    """
+    Listing id for a client message that is (or points at) a listing, else None.
+    Forwarded posts of LISTING_MIN_CHARS or more are stored as listings; a link or an
+    address resolves to a stored listing first and is stored on its own otherwise.
+    """
+    if forwarded and len(text) >= settings.LISTING_MIN_CHARS:
+        return await ingest(text, "forward", url=find_url(text))
+    url = find_url(text)
+    if url:
+        listing_id = await find_listing_by_url(url)
+        return listing_id if listing_id is not None else await ingest(text, "link", url=url)
+    address = find_address(text)
+    if address:
+        listing_id = await resolve(address)
+        return listing_id if listing_id is not None else await ingest(text, "address", address=address)
+    return None
+
+
+async def context(listing_id: int, question: str, max_chars: int = 0) -> List[str]:
+    """
+    Passages of the listing that answer question, in text order, at most max_chars in total.
+    The first passage (headline: price, address, size) always goes first; when nothing
+    matches, the listing is cut after max_chars like before.
+    """
+    max_chars = max_chars or settings.LISTING_CONTEXT_CHARS
+    match = match_query(question)
+    hits = await search_passages(match, listing_id, limit=8) if match else []
+    head = await get_passages(listing_id, first=1 if hits else max(1, max_chars // 80))
+    chosen: List[Tuple[int, str]] = []
+    seen = set()
+    total = 0
+    for ord_, body in head + [(h[1], h[2]) for h in hits]:
+        if ord_ in seen or body in seen:  # reposted ads repeat whole blocks
+            continue
+        if chosen and total + len(body) > max_chars:
+            if hits:
+                continue  # a shorter, lower-ranked passage may still fit
+            break
+        chosen.append((ord_, body))
+        seen.update((ord_, body))
+        total += len(body)
+    chosen.sort()
+    return [body[:max_chars] for _, body in chosen]
+
+
+async def lookup(question: str, listing_id: Optional[int] = None) -> Tuple[Optional[int], List[str]]:
+    """(listing id, passages for question); without listing_id the question itself picks the listing."""
+    if listing_id is None:
+        listing_id = await resolve(question)
+        if listing_id is None:
+            return None, []
+    return listing_id, await context(listing_id, question)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await init_db()
+    try:
+        if args.cmd == "add":
+            with open(args.file, encoding="utf-8") as f:
+                text = f.read()
+            listing_id = await ingest(text, "admin", url=args.url or find_url(text), address=args.address)
+            print(f"listing {listing_id}: {len(split_passages(text))} passages")
+        else:
+            listing_id, passages = await lookup(args.question, args.listing)
+            print(f"listing {listing_id}")
+            for p in passages:
+                print("---")
+                print(p)
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Listing store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    add = sub.add_parser("add", help="ingest a listing text file")
+    add.add_argument("file")
+    add.add_argument("--url")
+    add.add_argument("--address")
+    search = sub.add_parser("search", help="passages a question would send to the LLM")
+    search.add_argument("question")
+    search.add_argument("--listing", type=int)
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
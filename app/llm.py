@@ -1,21 +1,96 @@
 from __future__ import annotations
+import asyncio
 import json
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.cache import extract_key, llm_cache, transcribe_key
 from app.config import settings
+from app.metrics import registry
+
+# includes the wait for a concurrency slot; superseded calls are not observed
+llm_seconds = registry.histogram("leadbot_llm_seconds", "LLM call latency", ["kind"])
+llm_calls = registry.counter("leadbot_llm_calls_total", "LLM calls by outcome", ["kind", "outcome"])
+
+# Bump whenever the schema / system prompt in extract() changes: it is part of the cache key.
+SCHEMA_VERSION = 3
 
 class LLMClient:
+    """
+    Async OpenAI client:
+    - at most LLM_MAX_CONCURRENCY calls in flight for the whole process
+    - every call is bounded by LLM_TIMEOUT_SECONDS
+    - a newer call for the same chat cancels the previous one (its result is stale anyway)
+    """
+
     def __init__(self) -> None:
-        self.enabled = (settings.LLM_MODE.lower() == "on" and bool(settings.OPENAI_API_KEY))
+        # a key is configured; whether a chat uses the LLM is its tenant's LLM mode (app.tenants)
+        self.available = bool(settings.OPENAI_API_KEY)
+        self.enabled = settings.LLM_MODE.lower() == "on" and self.available
         self._client = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self._transcribe_sem: Optional[asyncio.Semaphore] = None
+        self._transcribing: Dict[str, asyncio.Future] = {}
 
     def _get_client(self):
         if self._client is None:
-            from openai import OpenAI
-            self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL or None,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                max_retries=0,
+            )
         return self._client
 
-    def extract(self, state: Dict[str, Any], user_text: str, listing_text: Optional[str]) -> Optional[Dict[str, Any]]:
-        if not self.enabled:
+    def _get_sem(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+        return self._sem
+
+    def cancel(self, chat_id: int) -> None:
+        t = self._inflight.pop(chat_id, None)
+        if t and not t.done():
+            t.cancel()
+
+    async def _call(self, kind: str, chat_id: Optional[int], factory: Callable[[], Awaitable[Any]]) -> Any:
+        async def guarded():
+            async with self._get_sem():
+                return await asyncio.wait_for(factory(), timeout=settings.LLM_TIMEOUT_SECONDS)
+
+        task = asyncio.ensure_future(guarded())
+        if chat_id is not None:
+            self.cancel(chat_id)
+            self._inflight[chat_id] = task
+        t0 = time.perf_counter()
+        try:
+            result = await task
+            llm_seconds.labels(kind).observe(time.perf_counter() - t0)
+            llm_calls.labels(kind, "ok").inc()
+            return result
+        except asyncio.CancelledError:
+            # superseded by a newer message from the same chat -> just drop the result
+            if task.cancelled() and chat_id is not None and self._inflight.get(chat_id) is not task:
+                llm_calls.labels(kind, "superseded").inc()
+                return None
+            raise
+        except Exception as e:
+            llm_seconds.labels(kind).observe(time.perf_counter() - t0)
+            llm_calls.labels(kind, "timeout" if isinstance(e, asyncio.TimeoutError) else "error").inc()
+            return None
+        finally:
+            if chat_id is not None and self._inflight.get(chat_id) is task:
+                self._inflight.pop(chat_id, None)
+
+    async def extract(
+        self,
+        state: Dict[str, Any],
+        user_text: str,
+        listing_passages: Optional[List[str]],
+        chat_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """listing_passages: the parts of the listing relevant to user_text (app.listings.context)."""
+        if not self.available:
             return None
 
         schema = {
@@ -27,6 +102,7 @@ class LLMClient:
                     "properties": {
                         "listing_ref": {"type": ["string", "null"]},
                         "people_count": {"type": ["integer", "null"]},
+                        "move_in": {"type": ["string", "null"]},
                         "employment": {"type": ["string", "null"]},
                         "lease_term": {"type": ["string", "null"]},
                         "budget_usd": {"type": ["integer", "null"]},
@@ -47,20 +123,29 @@ class LLMClient:
         system = (
             "You are a Telegram assistant for US rentals (USD only). "
             "Handle first touch. Ask minimal qualifying questions. "
-            "Answer listing questions ONLY from listing text. If not specified, say it's not specified and will be clarified. "
+            "Answer listing questions ONLY from listing_passages (the parts of the listing that match the question). "
+            "If not specified there, say it's not specified and will be clarified. "
             "Be concise, friendly, in Russian."
         )
 
+        listing_text = "\n\n".join(listing_passages) if listing_passages else None
+        key = extract_key(SCHEMA_VERSION, state, user_text[:1500], listing_text)
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            llm_calls.labels("extract", "cache_hit").inc()
+            return cached
+
         context = {
             "state": state,
-            "listing_text": (listing_text[:1500] if listing_text else None),
+            "listing_passages": listing_passages or None,
             "user_text": user_text[:1500],
             "constraints": {"usd_only": True},
         }
 
         client = self._get_client()
-        try:
-            resp = client.responses.create(
+
+        async def call():
+            resp = await client.responses.create(
                 model=settings.OPENAI_MODEL,
                 input=[
                     {"role": "system", "content": system},
@@ -70,21 +155,62 @@ class LLMClient:
                 text={"format": {"type": "json_schema", "name": "leadbot", "schema": schema}},
             )
             return json.loads(resp.output_text)
-        except Exception:
-            return None
 
-    def transcribe(self, audio_path: str) -> Optional[str]:
+        t0 = time.monotonic()
+        result = await self._call("extract", chat_id, call)
+        await llm_cache.put(key, result, time.monotonic() - t0)
+        return result
+
+    def _get_transcribe_sem(self) -> asyncio.Semaphore:
+        if self._transcribe_sem is None:
+            self._transcribe_sem = asyncio.Semaphore(max(1, settings.TRANSCRIBE_CONCURRENCY))
+        return self._transcribe_sem
+
+    async def transcribe(
+        self, file_unique_id: str, filename: str, load: Callable[[], Awaitable[bytes]]
+    ) -> Optional[str]:
+        """
+        Transcript of one Telegram file. load() fetches the audio and is only called on a cache
+        miss, inside the TRANSCRIBE_CONCURRENCY slot; the same file requested again while it is
+        being transcribed waits for that result instead of starting a second download.
+        Exceptions from load() (too large, download failed) are raised to the caller.
+        """
+        # not superseded per chat: every voice note carries its own content
         if not bool(settings.OPENAI_API_KEY):
             return None
+        key = transcribe_key(settings.OPENAI_TRANSCRIBE_MODEL, file_unique_id)
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            llm_calls.labels("transcribe", "cache_hit").inc()
+            return cached
+
+        task = self._transcribing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._transcribe(key, filename, load))
+            self._transcribing[key] = task
+            task.add_done_callback(lambda _t: self._transcribing.pop(key, None))
+        else:
+            llm_calls.labels("transcribe", "joined").inc()
+        # shield: one waiter being cancelled must not cancel the others' transcription
+        return await asyncio.shield(task)
+
+    async def _transcribe(self, key: str, filename: str, load: Callable[[], Awaitable[bytes]]) -> Optional[str]:
         client = self._get_client()
-        try:
-            with open(audio_path, "rb") as f:
-                tr = client.audio.transcriptions.create(
+        async with self._get_transcribe_sem():
+            audio = await load()
+
+            async def call():
+                tr = await client.audio.transcriptions.create(
                     model=settings.OPENAI_TRANSCRIBE_MODEL,
-                    file=f,
+                    file=(filename, audio),
                 )
-            return getattr(tr, "text", None) or None
-        except Exception:
-            return None
+                return getattr(tr, "text", None) or None
+
+            t0 = time.monotonic()
+            result = await self._call("transcribe", None, call)
+        await llm_cache.put(key, result, time.monotonic() - t0)
+        return result
 
 llm = LLMClient()
+
+registry.gauge("leadbot_llm_inflight", "LLM calls tracked per chat right now", fn=lambda: len(llm._inflight))
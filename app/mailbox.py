@@ -0,0 +1,121 @@
+"""
+Per-chat mailboxes: everything that touches one chat's lead runs one job at a time, in order.
+
+aiogram runs updates concurrently, and reply flushes and reminders fire from timers, so two
+jobs of one chat could both load the lead, await (LLM, send, DB) and save, and the second
+save drops what the first one extracted. Jobs posted here for the same chat_id run strictly
+one after another in posting order; different chats still run in parallel.
+
+A mailbox exists only while it has work: the drain task exits and the mailbox is removed as
+soon as its queue is empty, so memory follows the number of busy chats, not all chats seen.
+MAILBOX_MAX_PENDING bounds one chat's queue (a flood from one client is dropped, newest first).
+Each job runs as a task of its own: a job that gets cancelled (say its LLM call went stale)
+fails just its own future, and the chat's next jobs still run.
+
+A job must not call() its own chat's mailbox: it would wait for itself.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.config import settings
+from app.metrics import registry
+
+Job = Callable[[], Awaitable[Any]]
+
+mailbox_wait = registry.histogram("leadbot_mailbox_wait_seconds", "Time a job waited behind earlier jobs of its chat")
+
+
+class MailboxFull(Exception):
+    pass
+
+
+class _Mailbox:
+    __slots__ = ("jobs", "task")
+
+    def __init__(self) -> None:
+        self.jobs: Deque[Tuple[Job, asyncio.Future, float]] = deque()
+        self.task: Optional[asyncio.Task] = None
+
+
+class ChatMailboxes:
+    def __init__(self, max_pending: int) -> None:
+        self.max_pending = max(1, max_pending)
+        self._boxes: Dict[int, _Mailbox] = {}
+        self.processed = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._boxes
+
+    @property
+    def queued(self) -> int:
+        return sum(len(b.jobs) for b in self._boxes.values())
+
+    def post(self, chat_id: int, job: Job) -> asyncio.Future:
+        """Queue job for chat_id; the future resolves with its result (or exception)."""
+        loop = asyncio.get_running_loop()
+        box = self._boxes.get(chat_id)
+        if box is None:
+            box = self._boxes[chat_id] = _Mailbox()
+        if len(box.jobs) >= self.max_pending:
+            self.dropped += 1
+            raise MailboxFull(f"chat {chat_id}: {len(box.jobs)} jobs pending")
+        fut = loop.create_future()
+        box.jobs.append((job, fut, time.perf_counter()))
+        if box.task is None:
+            box.task = loop.create_task(self._drain(chat_id, box))
+        return fut
+
+    async def call(self, chat_id: int, job: Job) -> Any:
+        # shield: a cancelled caller leaves the job in line (its result is just not awaited)
+        return await asyncio.shield(self.post(chat_id, job))
+
+    async def _drain(self, chat_id: int, box: _Mailbox) -> None:
+        try:
+            while box.jobs:
+                job, fut, queued_at = box.jobs.popleft()
+                if fut.cancelled():
+                    continue
+                mailbox_wait.observe(time.perf_counter() - queued_at)
+                run = asyncio.ensure_future(job())
+                try:
+                    await asyncio.wait((run,))
+                except asyncio.CancelledError:
+                    # the drain itself is cancelled: the loop is going down
+                    run.cancel()
+                    fut.cancel()
+                    raise
+                if run.cancelled():
+                    fut.cancel()
+                elif run.exception() is not None:
+                    if not fut.done():
+                        fut.set_exception(run.exception())
+                elif not fut.done():
+                    fut.set_result(run.result())
+                self.processed += 1
+        finally:
+            # reclaim: nothing is queued (or the loop is going down)
+            for _, fut, _ in box.jobs:
+                fut.cancel()
+            if self._boxes.get(chat_id) is box:
+                del self._boxes[chat_id]
+
+    async def drain(self) -> None:
+        """Shutdown: wait until every queued job has run."""
+        while self._boxes:
+            await asyncio.gather(*[b.task for b in list(self._boxes.values()) if b.task], return_exceptions=True)
+
+
+mailboxes = ChatMailboxes(settings.MAILBOX_MAX_PENDING)
+
+registry.gauge("leadbot_mailboxes", "Chats with queued or running work", fn=lambda: len(mailboxes))
+registry.gauge("leadbot_mailbox_queued", "Jobs waiting in chat mailboxes", fn=lambda: mailboxes.queued)
+registry.counter("leadbot_mailbox_jobs_total", "Jobs run through chat mailboxes", fn=lambda: mailboxes.processed)
+registry.counter("leadbot_mailbox_dropped_total", "Jobs refused because the chat's mailbox was full", fn=lambda: mailboxes.dropped)
@@ -0,0 +1,186 @@
+"""
+In-process metrics: counters, gauges and histograms, rendered in Prometheus text format.
+
+Recording is a few integer/float updates on preallocated objects: label values are resolved
+once with .labels(...) (keep the child around on hot paths), histograms keep one count per
+bucket and find it with bisect. Gauges and counters that another object already tracks can
+take fn= and are read only when /metrics is scraped.
+"""
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# seconds; covers a cache hit (~µs) up to an LLM call hitting its timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+    def dec(self, n: float = 1.0) -> None:
+        self.value -= n
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable[[], float]] = None) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.fn = fn
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.label_names and fn is None:
+            self._default = self._new()
+            self._children[()] = self._default
+
+    def _new(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name}: expected labels {self.label_names}, got {values}")
+            child = self._children[values] = self._new()
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if self.fn is not None:
+            lines.append(f"{self.name} {_fmt(self.fn())}")
+            return lines
+        for values, child in self._children.items():
+            lines.extend(self._render_child(_label_str(self.label_names, values), values, child))
+        return lines
+
+    def _render_child(self, labels: str, values: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{labels} {_fmt(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new(self) -> _Value:
+        return _Value()
+
+    def inc(self, n: float = 1.0) -> None:
+        self._default.value += n
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new(self) -> _Value:
+        return _Value()
+
+    def inc(self, n: float = 1.0) -> None:
+        self._default.value += n
+
+    def dec(self, n: float = 1.0) -> None:
+        self._default.value -= n
+
+    def set(self, v: float) -> None:
+        self._default.value = v
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _new(self) -> _HistogramValue:
+        return _HistogramValue(self.bounds)
+
+    def observe(self, v: float) -> None:
+        self._default.observe(v)
+
+    def _render_child(self, labels: str, values: Tuple[str, ...], child: _HistogramValue) -> List[str]:
+        out = []
+        acc = 0
+        for bound, n in zip(self.bounds + (math.inf,), child.counts):
+            acc += n
+            le = _label_str(self.label_names, values, f'le="{_fmt(bound)}"')
+            out.append(f"{self.name}_bucket{le} {acc}")
+        out.append(f"{self.name}_sum{labels} {_fmt(child.sum)}")
+        out.append(f"{self.name}_count{labels} {child.count}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} registered twice")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable[[], float]] = None) -> Counter:
+        return self._add(Counter(name, help, labels, fn))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._add(Gauge(name, help, labels, fn))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            try:
+                lines.extend(m.render())
+            except Exception as e:  # a broken fn= must not take the whole scrape down
+                lines.append(f"# {m.name} unavailable: {type(e).__name__}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -1,11 +1,28 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict, fields
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, Optional
+from operator import attrgetter
+from typing import Any, Dict, Optional, Sequence, Tuple
 
+# Stored/encoded field order. Append new fields at the end and bump SCHEMA_VERSION;
+# SCHEMAS keeps every earlier layout so rows encoded by an older version still decode.
+SCHEMAS: Dict[int, Tuple[str, ...]] = {
+    1: (
+        "chat_id", "user_id", "username", "first_name",
+        "people_count", "move_in", "employment", "showing_time", "showing_text",
+        "handoff_sent", "paused", "last_question", "stuck_count",
+        "business_connection_id", "created_at", "updated_at",
+    ),
+}
+SCHEMAS[2] = SCHEMAS[1] + ("listing_id",)
+SCHEMA_VERSION = max(SCHEMAS)
+FIELDS = SCHEMAS[SCHEMA_VERSION]
+_FIELD_SET = frozenset(FIELDS)
+_get_fields = attrgetter(*FIELDS)
 
-@dataclass
+
+@dataclass(slots=True)
 class LeadState:
     chat_id: int
     user_id: int
@@ -26,20 +43,55 @@ class LeadState:
 
     stuck_count: int = 0
 
+    # Telegram Business chat: replies/reminders must go through this connection
+    business_connection_id: Optional[str] = None
+
     created_at: str = ""
     updated_at: str = ""
 
+    # listings.id of the listing the client asked about (forwarded post, link or address)
+    listing_id: Optional[int] = None
+
+    # keys without a field (written by a newer version, or ad-hoc data; JSON-compatible values),
+    # saved and read back as-is. None until needed: most leads never have any.
+    # The class is slotted, so lead.foo = ... for an unknown name raises instead of being lost on save.
+    extras: Optional[Dict[str, Any]] = None
+
     def touch(self) -> None:
         now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
         if not self.created_at:
             self.created_at = now
         self.updated_at = now
 
+    def to_row(self) -> tuple:
+        """Field values in FIELDS order, then extras (None when empty)."""
+        return _get_fields(self) + (self.extras or None,)
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any], version: int = SCHEMA_VERSION) -> "LeadState":
+        if version == SCHEMA_VERSION:
+            return cls(*row)
+        names = SCHEMAS.get(version)
+        if names is None:
+            raise ValueError(f"unknown LeadState schema version {version}")
+        d = dict(zip(names, row))
+        if row[len(names)]:
+            d.update(row[len(names)])
+        return cls.from_dict(d)
+
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        """Flat dict: every field plus the extras keys."""
+        d = dict(zip(FIELDS, _get_fields(self)))
+        if self.extras:
+            d.update(self.extras)
+        return d
 
-    @staticmethod
-    def from_dict(d: Dict[str, Any]) -> "LeadState":
-        allowed = {f.name for f in fields(LeadState)}
-        cleaned = {k: v for k, v in (d or {}).items() if k in allowed}
-        return LeadState(**cleaned)
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "LeadState":
+        """Known keys become fields, everything else goes to extras; missing fields take defaults."""
+        d = d or {}
+        if d.keys() <= _FIELD_SET:
+            return cls(**d)
+        lead = cls(**{k: v for k, v in d.items() if k in _FIELD_SET})
+        lead.extras = {k: v for k, v in d.items() if k not in _FIELD_SET}
+        return lead
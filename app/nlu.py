@@ -0,0 +1,180 @@
+"""
+Tiered understanding of client messages: rules first, the LLM only when they are not enough.
+
+Tier 1 is decide_reply (regex/keyword extraction, microseconds). The message goes on to
+tier 2, LLMClient.extract, only when
+- the rules made no progress NLU_STUCK_THRESHOLD times in a row (lead.stuck_count), or
+- the client asked something the flow doesn't answer (a question about the listing:
+  price, deposit, pets, ...), and NLU_ANSWER_QUESTIONS is on.
+LLM updates are merged into the lead without overwriting what the rules already found;
+the next question still comes from next_question, so the flow stays the same whichever
+tier understood the message. When the LLM is off (for the whole process or for the chat's
+tenant), times out or fails, the rules' reply goes out unchanged.
+
+leadbot_nlu_* metrics report how often each tier decided the reply, why the LLM was
+asked and what it brought, plus latency per tier.
+"""
+from __future__ import annotations
+
+import re
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from app import listings
+from app.config import settings
+from app.lead_logic import DEFAULT_QUESTIONS, Questions, decide_reply, next_question
+from app.llm import llm
+from app.metrics import registry
+from app.models import LeadState
+
+nlu_replies = registry.counter("leadbot_nlu_replies_total", "Replies by the tier that decided them", ["tier"])
+nlu_escalations = registry.counter("leadbot_nlu_escalations_total", "Messages passed on to the LLM tier", ["reason"])
+nlu_llm = registry.counter("leadbot_nlu_llm_total", "What the LLM tier brought", ["outcome"])
+nlu_seconds = registry.histogram("leadbot_nlu_seconds", "Time spent per NLU tier", ["tier"])
+_rules_seconds = nlu_seconds.labels("rules")
+_llm_seconds = nlu_seconds.labels("llm")
+
+_QUESTION_START = frozenset(
+    "сколько какой какая какое какие можно где когда почему зачем нужен нужна нужно есть "
+    "what how is are can do does where when which why".split()
+)
+# substrings of listing topics: a question about these is outside the qualifying flow
+_LISTING_TOPICS = (
+    "цен", "стои", "price", "rent", "депозит", "deposit", "залог", "fee", "комисс", "брокер", "broker",
+    "pets", "живот", "собак", "кош", "dog", "cats", "дет", "kid", "child", "этаж", "floor", "метро", "subway",
+    "train", "стирал", "прачеч", "laundry", "utilit", "коммунал", "парков", "parking", "спальн", "bedroom",
+    "ванн", "bath", "свобод", "available", "адрес", "address", "мебел", "furnish", "лифт", "elevator",
+)
+_WORD_RE = re.compile(r"\w+")
+
+# LLM updates that have no LeadState field are kept in lead.extras (and shown on the card)
+EXTRA_UPDATES = ("lease_term", "budget_usd", "pets", "children")
+
+
+class NluResult(NamedTuple):
+    reply: str
+    next_q: Optional[str]
+    handoff: bool
+    tier: str  # "rules" | "llm"
+
+
+def is_question(text: str) -> bool:
+    if "?" in text:
+        return True
+    m = _WORD_RE.search(text.lower())
+    return bool(m) and m.group(0) in _QUESTION_START
+
+
+def is_listing_question(text: str) -> bool:
+    if not is_question(text):
+        return False
+    tl = text.lower()
+    return any(t in tl for t in _LISTING_TOPICS)
+
+
+def _state(lead: LeadState) -> Dict[str, Any]:
+    return {
+        "people_count": lead.people_count,
+        "move_in": lead.move_in,
+        "employment": lead.employment,
+        "showing_time": lead.showing_time,
+        "showing_text": lead.showing_text,
+        "last_question": lead.last_question,
+        **{k: v for k, v in (lead.extras or {}).items() if k in EXTRA_UPDATES},
+    }
+
+
+async def merge_updates(lead: LeadState, updates: Dict[str, Any]) -> bool:
+    """Fill empty lead fields from LLM updates; True if anything the flow asks for changed."""
+    progressed = False
+    pc = updates.get("people_count")
+    if isinstance(pc, int) and 0 < pc <= 20 and not lead.people_count:
+        lead.people_count = pc
+        progressed = True
+    for name, limit in (("move_in", 80), ("employment", 160)):
+        v = updates.get(name)
+        if isinstance(v, str) and v.strip() and not getattr(lead, name):
+            setattr(lead, name, v.strip()[:limit])
+            progressed = True
+    st = updates.get("showing_time")
+    if isinstance(st, str) and st.strip() and not lead.showing_text and not lead.showing_time:
+        lead.showing_text = st.strip()[:200]
+        progressed = True
+
+    ref = updates.get("listing_ref")
+    if isinstance(ref, str) and ref.strip() and lead.listing_id is None:
+        lead.listing_id = await listings.resolve(ref)
+    for name in EXTRA_UPDATES:
+        v = updates.get(name)
+        if v is not None and v != "" and not (lead.extras and name in lead.extras):
+            if lead.extras is None:
+                lead.extras = {}
+            lead.extras[name] = v
+    return progressed
+
+
+async def understand(
+    lead: LeadState, text: str, questions: Questions = DEFAULT_QUESTIONS, use_llm: Optional[bool] = None
+) -> NluResult:
+    """
+    decide_reply, escalated to the LLM when the rules are stuck or a listing question came in.
+    questions / use_llm: the chat's tenant texts and LLM mode (use_llm=None: LLM_MODE).
+    """
+    use_llm = llm.enabled if use_llm is None else (use_llm and llm.available)
+    listing_q = use_llm and bool(settings.NLU_ANSWER_QUESTIONS) and is_listing_question(text)
+    free_text = (lead.employment, lead.showing_text)
+    step = (lead.last_question, lead.stuck_count)
+    parsed = (lead.people_count, lead.move_in, lead.showing_time)
+    t0 = time.perf_counter()
+    reply, next_q, handoff, _pause = decide_reply(lead, text, questions)
+    if listing_q and (lead.employment, lead.showing_text) != free_text:
+        # the work / showing steps accept any answer and just took the question itself:
+        # undo that, and the step / stuck counter it moved, keeping what was really parsed
+        lead.employment, lead.showing_text = free_text
+        lead.last_question, stuck = step
+        lead.stuck_count = 0 if (lead.people_count, lead.move_in, lead.showing_time) != parsed else (stuck or 0) + 1
+        reply, next_q, handoff = next_question(lead, questions)
+        if next_q:
+            lead.last_question = next_q
+    _rules_seconds.observe(time.perf_counter() - t0)
+
+    reason = None
+    if use_llm and not handoff:
+        # a listing question first: it also counts as a step without progress, and only
+        # "question" puts the LLM's answer in the reply
+        if listing_q:
+            reason = "question"
+        elif settings.NLU_STUCK_THRESHOLD > 0 and lead.stuck_count >= settings.NLU_STUCK_THRESHOLD:
+            reason = "stuck"
+    if reason is None:
+        nlu_replies.labels("rules").inc()
+        return NluResult(reply, next_q, handoff, "rules")
+
+    nlu_escalations.labels(reason).inc()
+    t0 = time.perf_counter()
+    passages = await listings.context(lead.listing_id, text) if lead.listing_id is not None else None
+    result = await llm.extract(_state(lead), text, passages, chat_id=lead.chat_id)
+    _llm_seconds.observe(time.perf_counter() - t0)
+    if not isinstance(result, dict):
+        nlu_llm.labels("failed").inc()
+        nlu_replies.labels("rules").inc()
+        return NluResult(reply, next_q, handoff, "rules")
+
+    progressed = await merge_updates(lead, result.get("updates") or {})
+    answer = (result.get("reply") or "").strip() if reason == "question" else ""
+    if not progressed and not answer:
+        nlu_llm.labels("no_change").inc()
+        nlu_replies.labels("rules").inc()
+        return NluResult(reply, next_q, handoff, "rules")
+
+    nlu_llm.labels("progressed" if progressed else "answered").inc()
+    nlu_replies.labels("llm").inc()
+    if progressed:
+        lead.stuck_count = 0
+    # the flow's next step (without the rules' "Не совсем понял" when the LLM understood)
+    reply, next_q, handoff = next_question(lead, questions)
+    if next_q:
+        lead.last_question = next_q
+    if answer and answer != reply:
+        reply = f"{answer}\n\n{reply}"
+    return NluResult(reply, next_q, handoff, "llm")
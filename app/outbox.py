@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.db import (
+    count_handoffs,
+    due_handoffs,
+    enqueue_handoff,
+    log_event,
+    mark_handoffs_retry,
+    mark_handoffs_sent,
+    next_handoff_at,
+)
+from app.metrics import registry
+
+# (destination chat, text) -> message_id of the sent message (None if unknown)
+SendFn = Callable[[int, str], Awaitable[Optional[int]]]
+
+_MESSAGE_LIMIT = 3900  # Telegram allows 4096 characters; leave room for HTML entities
+
+handoffs = registry.counter("leadbot_handoffs_total", "Lead cards delivered to the manager chat", ["outcome"])
+_sent = handoffs.labels("sent")
+_retry = handoffs.labels("retry")
+_failed = handoffs.labels("failed")
+digests = registry.counter("leadbot_handoff_digests_total", "Messages that carried more than one lead card")
+
+
+def pack_cards(cards: List[Tuple[int, str]], limit: int = _MESSAGE_LIMIT) -> List[Tuple[str, List[int]]]:
+    """Merge cards into as few messages as fit in limit; returns (text, chat_ids) per message."""
+    out: List[Tuple[str, List[int]]] = []
+    parts: List[str] = []
+    ids: List[int] = []
+    size = 0
+    for chat_id, card in cards:
+        if parts and size + 2 + len(card) > limit:
+            out.append(("\n\n".join(parts), ids))
+            parts, ids, size = [], [], 0
+        parts.append(card)
+        ids.append(chat_id)
+        size += len(card) + (2 if len(parts) > 1 else 0)
+    if parts:
+        out.append(("\n\n".join(parts), ids))
+    return out
+
+
+class HandoffOutbox:
+    """
+    Background delivery of lead cards to LEADS_CHAT_ID (or the tenant's own leads chat).
+
+    enqueue() only writes the card to the `handoffs` table, so the client's reply never waits
+    for the manager chat. The worker sends due cards oldest first; a failed send is retried
+    with exponential backoff (HANDOFF_RETRY_BASE_SECONDS doubling up to ..._MAX_SECONDS) and
+    given up after HANDOFF_MAX_ATTEMPTS. When HANDOFF_DIGEST_MIN or more cards are due at once
+    (ad-campaign burst, or the group rate limit holding them back) they are merged into digest
+    messages instead of one message per card; a digest only merges cards for the same chat.
+    """
+
+    def __init__(self, batch: int, digest_min: int, retry_base: float, retry_max: float, max_attempts: int) -> None:
+        self.batch = max(1, batch)
+        self.digest_min = max(2, digest_min)
+        self.retry_base = max(0.1, retry_base)
+        self.retry_max = max(self.retry_base, retry_max)
+        self.max_attempts = max(1, max_attempts)
+        self._send: Optional[SendFn] = None
+        self._shard: Optional[Tuple[int, int]] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.pending = 0  # as of the last pass, for /readyz and metrics
+
+    async def enqueue(self, chat_id: int, card: str, dest: Optional[int] = None) -> None:
+        await enqueue_handoff(chat_id, card, dest)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.retry_max, self.retry_base * (2 ** min(attempts, 30)))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def _deliver(self, dest: int, text: str, chat_ids: List[int], attempts: Dict[int, int]) -> None:
+        try:
+            message_id = await self._send(dest, text)
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}"
+            print(f"[manager_send_error] {len(chat_ids)} card(s) {err}")
+            now = time.time()
+            rows = []
+            for c in chat_ids:
+                n = attempts[c] + 1
+                give_up = n >= self.max_attempts
+                rows.append((c, None if give_up else now + self._backoff(attempts[c]), err))
+                (_failed if give_up else _retry).inc()
+                await log_event(c, "handoff", ok=False, attempt=n, final=give_up, error=err)
+            await mark_handoffs_retry(rows)
+            return
+        await mark_handoffs_sent(chat_ids, message_id)
+        _sent.inc(len(chat_ids))
+        if len(chat_ids) > 1:
+            digests.inc()
+        for c in chat_ids:
+            await log_event(c, "handoff", ok=True, attempt=attempts[c] + 1, digest=len(chat_ids), to=dest)
+
+    async def run_once(self) -> Optional[float]:
+        """One delivery pass. Returns seconds until the next card is due (None: nothing pending)."""
+        now = time.time()
+        rows = await due_handoffs(now, self.batch, self._shard)
+        if rows:
+            attempts = {r["chat_id"]: r["attempts"] for r in rows}
+            by_dest: Dict[int, List[Tuple[int, str]]] = {}
+            for r in rows:
+                by_dest.setdefault(r["dest"] or settings.LEADS_CHAT_ID, []).append((r["chat_id"], r["card"]))
+            messages = []
+            for dest, cards in by_dest.items():
+                if len(cards) >= self.digest_min:
+                    messages += [(dest, text, ids) for text, ids in pack_cards(cards)]
+                else:
+                    messages += [(dest, card, [chat_id]) for chat_id, card in cards]
+            for dest, text, chat_ids in messages:
+                if self._closing:
+                    break  # the rest stays pending
+                await self._deliver(dest, text, chat_ids, attempts)
+            return 0.0
+        self.pending = await count_handoffs("pending", self._shard)
+        nxt = await next_handoff_at(self._shard)
+        return None if nxt is None else max(0.0, nxt - time.time())
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                timeout = await self.run_once()
+            except Exception as e:
+                print(f"[outbox_error] {type(e).__name__}: {e}")
+                timeout = self.retry_base
+            if timeout == 0.0 or self._closing:
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, send: SendFn, shard: Optional[Tuple[int, int]] = None) -> None:
+        """shard=(index, workers): only deliver cards of chats routed to this worker process."""
+        self._send = send
+        self._shard = shard
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        # finish the current pass (a card sent but not marked would go out twice), then exit;
+        # undelivered cards stay in the table and the next start picks them up
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._closing = False
+
+
+outbox = HandoffOutbox(
+    batch=settings.HANDOFF_BATCH,
+    digest_min=settings.HANDOFF_DIGEST_MIN,
+    retry_base=settings.HANDOFF_RETRY_BASE_SECONDS,
+    retry_max=settings.HANDOFF_RETRY_MAX_SECONDS,
+    max_attempts=settings.HANDOFF_MAX_ATTEMPTS,
+)
+
+registry.gauge("leadbot_handoffs_pending", "Lead cards waiting for delivery (as of the last outbox pass)", fn=lambda: outbox.pending)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.config import settings
+from app.mailbox import MailboxFull, mailboxes
+from app.metrics import registry
+
+# the work behind one reply (lead load/save, decide_reply or LLM, the send); pacing delay not included
+reply_seconds = registry.histogram("leadbot_reply_seconds", "Time to build and send one (merged) reply")
+reply_errors = registry.counter("leadbot_reply_errors_total", "Reply flushes that raised")
+
+# flush(texts, first_sent_at): the window's texts, and when the client sent the first of them (unix time)
+Flush = Callable[[List[str], float], Awaitable[None]]
+
+
+class _Window:
+    __slots__ = ("texts", "flush", "opened_at", "first_sent_at", "due", "handle")
+
+    def __init__(self, flush: Flush, opened_at: float, first_sent_at: float, due: float) -> None:
+        self.texts: List[str] = []
+        self.flush = flush
+        self.opened_at = opened_at
+        self.first_sent_at = first_sent_at
+        self.due = due
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class ReplyPacer:
+    """
+    Humanlike reply delay without parking a coroutine per inbound message.
+
+    The first message of a chat opens a window of HUMAN_DELAY_MIN..MAX seconds (a loop timer,
+    not a sleeping task). Messages that arrive inside the window are appended to it and push the
+    deadline to at least REPLY_DEBOUNCE_SECONDS after the last one (never beyond 2x HUMAN_DELAY_MAX
+    from the first). When the timer fires, flush(texts, first_sent_at) runs once for the whole
+    batch; the flush callback of the latest message wins, so replies go to the newest Message
+    object, while first_sent_at stays the first message's (reply latency is counted from it).
+    Flushes run in the chat's mailbox, after the updates and replies of that chat before them.
+    """
+
+    def __init__(self, delay_min: float, delay_max: float, debounce: float) -> None:
+        self.delay_min = max(0.0, delay_min)
+        self.delay_max = max(self.delay_min, delay_max)
+        self.debounce = max(0.0, debounce)
+        self._windows: Dict[int, _Window] = {}
+        self._running: Set[asyncio.Task] = set()
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def submit(self, chat_id: int, text: Optional[str], flush: Flush, sent_at: Optional[float] = None) -> bool:
+        """
+        Queue text for chat_id (sent_at: when the client sent it, unix time; default now).
+        Returns True if this message opened a new window.
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        w = self._windows.get(chat_id)
+        opened = w is None
+        if opened:
+            first_sent_at = time.time() if sent_at is None else sent_at
+            w = _Window(flush, now, first_sent_at, now + random.uniform(self.delay_min, self.delay_max))
+            self._windows[chat_id] = w
+        else:
+            self.merged += 1
+            w.flush = flush
+            w.due = min(max(w.due, now + self.debounce), w.opened_at + 2 * self.delay_max)
+            w.handle.cancel()
+        if text:
+            w.texts.append(text)
+        w.handle = loop.call_at(w.due, self._fire, chat_id)
+        return opened
+
+    def discard(self, chat_id: int) -> None:
+        w = self._windows.pop(chat_id, None)
+        if w is not None and w.handle is not None:
+            w.handle.cancel()
+
+    def _fire(self, chat_id: int) -> None:
+        w = self._windows.pop(chat_id, None)
+        if w is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(chat_id, w))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, chat_id: int, w: _Window) -> None:
+        try:
+            await mailboxes.call(chat_id, lambda: self._flush(chat_id, w))
+        except MailboxFull as e:
+            reply_errors.inc()
+            print(f"[reply_error] {e}")
+
+    async def _flush(self, chat_id: int, w: _Window) -> None:
+        t0 = time.perf_counter()
+        try:
+            await w.flush(w.texts, w.first_sent_at)
+        except Exception as e:
+            reply_errors.inc()
+            print(f"[reply_error] chat={chat_id} {type(e).__name__}: {e}")
+        finally:
+            reply_seconds.observe(time.perf_counter() - t0)
+
+    async def drain(self) -> None:
+        """Shutdown: flush every open window right now and wait for all replies."""
+        for chat_id in list(self._windows):
+            w = self._windows[chat_id]
+            w.handle.cancel()
+            self._fire(chat_id)
+        if self._running:
+            await asyncio.gather(*list(self._running), return_exceptions=True)
+
+
+pacer = ReplyPacer(settings.HUMAN_DELAY_MIN, settings.HUMAN_DELAY_MAX, settings.REPLY_DEBOUNCE_SECONDS)
+
+registry.gauge("leadbot_reply_windows", "Chats waiting for their paced reply", fn=lambda: len(pacer))
+registry.counter("leadbot_reply_merged_total", "Messages merged into an already open reply window", fn=lambda: pacer.merged)
@@ -0,0 +1,149 @@
+"""
+Re-run the field parsers over stored leads (after app.utils changes).
+
+    python -m app.reextract                     # fill fields the old parsers missed
+    python -m app.reextract --overwrite         # also replace showing_time parsed by the old parsers
+    python -m app.reextract --dry-run           # count what would change, write nothing
+    python -m app.reextract --restart           # ignore the checkpoint, start from the first lead
+
+Leads are read in chat_id order, CHUNK rows at a time, parsed in a process pool and written
+back with one transaction per chunk. After every written chunk the last chat_id goes to the
+checkpoint file, so an interrupted run continues where it stopped. Memory stays at
+roughly (workers * 2) chunks whatever the size of the table.
+
+The only raw client texts a lead keeps are showing_text and employment:
+- showing_time is parsed from showing_text (missing ones filled; replaced with --overwrite);
+- people_count / move_in are filled from those texts only when still empty.
+
+Run it with the bot stopped: a running bot keeps leads in memory and would write its copy back.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils import extract_many
+
+_READ_COLUMNS = ("chat_id", "people_count", "move_in", "showing_time", "showing_text", "employment")
+_WRITE_COLUMNS = ("people_count", "move_in", "showing_time", "updated_at")
+
+
+def process_chunk(rows: List[tuple], overwrite: bool) -> Tuple[int, List[tuple]]:
+    """
+    Runs in a pool worker. rows are _READ_COLUMNS tuples; returns (last chat_id, changed rows
+    as (*_WRITE_COLUMNS, chat_id)).
+    """
+    showing = extract_many(r[4] or "" for r in rows)
+    other = extract_many(" ".join(t for t in (r[4], r[5]) if t) for r in rows)
+    now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    changed = []
+    for r, st_ex, ex in zip(rows, showing, other):
+        chat_id, pc, mv, st = r[0], r[1], r[2], r[3]
+        new_pc = pc or ex.people_count
+        new_mv = mv or ex.move_in
+        new_st = st
+        if st_ex.showing_time and (overwrite or not st):
+            new_st = st_ex.showing_time
+        if (new_pc, new_mv, new_st) != (pc, mv, st):
+            changed.append((new_pc, new_mv, new_st, now, chat_id))
+    return rows[-1][0], changed
+
+
+def _default_checkpoint() -> str:
+    return os.path.join(os.path.dirname(settings.SQLITE_PATH) or ".", "reextract.checkpoint.json")
+
+
+def _load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)  # atomic: a crash leaves the previous checkpoint, never half of one
+
+
+async def run(chunk: int, workers: int, overwrite: bool, dry_run: bool, checkpoint: str, restart: bool) -> Dict[str, Any]:
+    from app.db import close_db, init_db, iter_lead_rows, update_lead_columns
+
+    state = {} if restart else _load_checkpoint(checkpoint)
+    after: Optional[int] = state.get("last_chat_id")
+    scanned = 0
+    updated = 0
+    if after is not None:
+        print(f"[reextract] resuming after chat_id {after}")
+
+    await init_db()
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    pending: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    async def finish_oldest() -> None:
+        # results are written in read order, so the checkpoint never skips an unwritten chunk
+        nonlocal scanned, updated
+        n, fut = pending.popleft()
+        last, changed = await fut
+        if not dry_run:
+            await update_lead_columns(_WRITE_COLUMNS, changed)
+            _save_checkpoint(checkpoint, {"last_chat_id": last})
+        scanned += n
+        updated += len(changed)
+        rate = scanned / max(time.perf_counter() - t0, 1e-9)
+        print(f"[reextract] {scanned} leads, {updated} changed, {rate:,.0f} leads/s (at chat_id {last})")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            async for rows in iter_lead_rows(_READ_COLUMNS, after=after, batch=chunk):
+                plain = [tuple(r) for r in rows]
+                pending.append((len(plain), loop.run_in_executor(pool, process_chunk, plain, overwrite)))
+                if len(pending) >= workers * 2:
+                    await finish_oldest()
+            while pending:
+                await finish_oldest()
+    finally:
+        for _, fut in pending:
+            fut.cancel()
+        await close_db()
+
+    if not dry_run and os.path.exists(checkpoint):
+        os.remove(checkpoint)  # finished: the next run starts from the beginning
+    return {"scanned": scanned, "changed": updated, "seconds": round(time.perf_counter() - t0, 2), "dry_run": dry_run}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Re-run field extraction over stored leads")
+    ap.add_argument("--chunk", type=int, default=2000, help="leads per chunk / transaction")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--overwrite", action="store_true", help="replace showing_time parsed by older parsers")
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--checkpoint", default=None, help="default: next to SQLITE_PATH")
+    ap.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = ap.parse_args()
+    result = asyncio.run(
+        run(
+            chunk=max(1, args.chunk),
+            workers=max(1, args.workers),
+            overwrite=args.overwrite,
+            dry_run=args.dry_run,
+            checkpoint=args.checkpoint or _default_checkpoint(),
+            restart=args.restart,
+        )
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.db import delete_reminder, iter_reminders, save_reminder
+from app.metrics import registry
+
+reminders_fired = registry.counter("leadbot_reminders_fired_total", "Reminders fired", ["outcome"])
+_fired_ok = reminders_fired.labels("ok")
+_fired_error = reminders_fired.labels("error")
+# how late a reminder went out compared to its due time (batching, concurrency limit)
+reminder_lag_seconds = registry.histogram("leadbot_reminder_lag_seconds", "Reminder send time minus due time")
+
+FireFn = Callable[[int, Optional[str]], Awaitable[None]]
+
+
+class ReminderScheduler:
+    """
+    One worker task for every pending reminder instead of one sleeping task per chat.
+
+    - min-heap of [due_at, seq, chat_id, business_connection_id, alive]
+    - rows in the `reminders` table, so load() restores everything after a restart
+    - cancel() marks the heap entry dead (lazy deletion); dead heads are dropped by the
+      worker and the heap is rebuilt when more than half of it is dead
+    - due reminders are fired in batches of REMINDER_BATCH_SIZE, at most
+      REMINDER_CONCURRENCY at a time
+    """
+
+    def __init__(self, batch_size: int, concurrency: int) -> None:
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self._heap: List[list] = []
+        self._entries: Dict[int, list] = {}
+        self._seq = itertools.count()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._fire: Optional[FireFn] = None
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _push(self, chat_id: int, due_at: float, business_connection_id: Optional[str]) -> list:
+        old = self._entries.pop(chat_id, None)
+        if old is not None:
+            old[4] = False
+        entry = [due_at, next(self._seq), chat_id, business_connection_id, True]
+        self._entries[chat_id] = entry
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def _maybe_compact(self) -> None:
+        if len(self._heap) > 1024 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [e for e in self._heap if e[4]]
+            heapq.heapify(self._heap)
+
+    async def load(self, shard: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Restore pending reminders from SQLite (call once on boot).
+        shard=(index, workers) keeps only the chats routed to this worker process.
+        """
+        self._heap = []
+        self._entries = {}
+        async for chat_id, due_at, bc in iter_reminders():
+            if shard is not None and chat_id % shard[1] != shard[0]:
+                continue
+            entry = [due_at, next(self._seq), chat_id, bc, True]
+            self._entries[chat_id] = entry
+            self._heap.append(entry)
+        # rows come ordered by due_at, so this is already a valid heap; heapify is O(n) anyway
+        heapq.heapify(self._heap)
+
+    async def schedule(self, chat_id: int, delay_seconds: float, business_connection_id: Optional[str] = None) -> None:
+        due_at = time.time() + delay_seconds
+        entry = self._push(chat_id, due_at, business_connection_id)
+        await save_reminder(chat_id, due_at, business_connection_id)
+        if self._wake is not None and self._heap[0] is entry:
+            self._wake.set()
+
+    async def cancel(self, chat_id: int) -> None:
+        entry = self._entries.pop(chat_id, None)
+        if entry is None:
+            return
+        entry[4] = False
+        self._maybe_compact()
+        await delete_reminder(chat_id)
+
+    def _pop_due(self, now: float) -> List[list]:
+        due = []
+        while self._heap and len(due) < self.batch_size:
+            head = self._heap[0]
+            if not head[4]:
+                heapq.heappop(self._heap)
+                continue
+            if head[0] > now:
+                break
+            heapq.heappop(self._heap)
+            self._entries.pop(head[2], None)
+            due.append(head)
+        return due
+
+    async def _fire_one(self, sem: asyncio.Semaphore, entry: list) -> None:
+        async with sem:
+            reminder_lag_seconds.observe(max(0.0, time.time() - entry[0]))
+            try:
+                await self._fire(entry[2], entry[3])
+                _fired_ok.inc()
+            except Exception as e:
+                _fired_error.inc()
+                print(f"[reminder_error] chat={entry[2]} {type(e).__name__}: {e}")
+            self.fired += 1
+        if entry[2] not in self._entries:  # not re-scheduled while we were sending
+            await delete_reminder(entry[2])
+
+    async def _run(self) -> None:
+        sem = asyncio.Semaphore(self.concurrency)
+        while True:
+            batch = self._pop_due(time.time())
+            if batch:
+                await asyncio.gather(*(self._fire_one(sem, e) for e in batch))
+                continue
+
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, self._heap[0][0] - time.time())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, fire: FireFn) -> None:
+        self._fire = fire
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reminders = ReminderScheduler(settings.REMINDER_BATCH_SIZE, settings.REMINDER_CONCURRENCY)
+
+registry.gauge("leadbot_reminders_pending", "Reminders scheduled in this process", fn=lambda: len(reminders))
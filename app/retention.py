@@ -0,0 +1,178 @@
+"""
+Daily maintenance of the SQLite file: archive old leads, give freed pages back, refresh stats.
+
+Once a day at MAINTENANCE_HOUR (UTC, off-peak), one background task:
+
+1. moves leads out of `leads` into gzip JSONL segments in ARCHIVE_DIR (app.archive):
+   handed off / paused leads untouched for RETENTION_FINISHED_DAYS, and any lead untouched
+   for RETENTION_STALE_DAYS, together with their events and handoff row. RETENTION_BATCH
+   leads per segment and per delete transaction, with RETENTION_PAUSE_MS between batches,
+   so the write lock is never held for long;
+2. runs PRAGMA incremental_vacuum in steps of VACUUM_STEP_PAGES, then ANALYZE. A file created
+   before auto_vacuum=INCREMENTAL is first converted with one full VACUUM (first pass only).
+
+Chats that are busy right now (app.mailbox) are skipped, and a lead updated after it was
+read is not deleted. When an archived client writes again, load_lead finds the chat in
+archived_leads and restores the lead, its events and its handoff row from the segment.
+
+    python -m app.retention            # one pass right now (e.g. from cron, with the bot stopped or running)
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from app.archive import segment_name, write_segment
+from app.config import settings
+from app.db import (
+    analyze,
+    archive_candidates,
+    chat_history,
+    close_db,
+    delete_archived,
+    enable_incremental_vacuum,
+    incremental_vacuum,
+    init_db,
+)
+from app.lead_logic import stage_of
+from app.mailbox import mailboxes
+
+
+def _cutoff(days: float, now: float) -> str:
+    """updated_at-style timestamp `days` ago ("" when the rule is off: nothing is older than "")."""
+    if days <= 0:
+        return ""
+    return datetime.fromtimestamp(now - days * 86400, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def seconds_until_hour(hour: int, now: float) -> float:
+    t = time.gmtime(now)
+    wait = ((hour - t.tm_hour) % 24) * 3600 - t.tm_min * 60 - t.tm_sec
+    return wait if wait > 0 else wait + 86400
+
+
+class Maintenance:
+    def __init__(self, batch: int, pause_ms: int, vacuum_pages: int) -> None:
+        self.batch = max(1, batch)
+        self.pause = max(0, pause_ms) / 1000.0
+        self.vacuum_pages = max(1, vacuum_pages)
+        self._shard: Optional[Tuple[int, int]] = None
+        self._compact = True
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._closing = False
+        self._seq = 0
+
+    async def archive_batch(self, now: float) -> Tuple[int, int]:
+        """Archive one batch; (leads read, leads archived)."""
+        candidates = await archive_candidates(
+            _cutoff(settings.RETENTION_FINISHED_DAYS, now),
+            _cutoff(settings.RETENTION_STALE_DAYS, now),
+            self.batch,
+            self._shard,
+        )
+        leads = [lead for lead in candidates if lead.chat_id not in mailboxes]
+        if not leads:
+            return len(candidates), 0
+        chat_ids = [lead.chat_id for lead in leads]
+        events, handoffs = await chat_history(chat_ids)
+        records = [
+            {
+                "chat_id": lead.chat_id,
+                "archived_at": now,
+                "lead": lead.to_dict(),
+                "events": events[lead.chat_id],
+                "handoff": handoffs.get(lead.chat_id),
+            }
+            for lead in leads
+        ]
+        self._seq += 1
+        tag = f"-s{self._shard[0]}" if self._shard else ""
+        name = segment_name(now, f"{tag}-{self._seq}")
+        await asyncio.to_thread(write_segment, settings.ARCHIVE_DIR, name, records)
+        items = [
+            (lead.chat_id, lead.updated_at, events[lead.chat_id][-1]["id"] if events[lead.chat_id] else 0, stage_of(lead))
+            for lead in leads
+        ]
+        done = await delete_archived(items, name)
+        return len(candidates), len(done)
+
+    async def run_once(self, now: Optional[float] = None) -> int:
+        """Archive everything due, then compact. Returns the number of leads archived."""
+        now = time.time() if now is None else now
+        archived = 0
+        while not self._closing:
+            read, done = await self.archive_batch(now)
+            archived += done
+            if read < self.batch or not done:  # the rest is busy or changed: next time
+                break
+            await asyncio.sleep(self.pause)
+        if self._compact and not self._closing:
+            if await enable_incremental_vacuum():
+                print("[maintenance] switched the file to auto_vacuum=INCREMENTAL (full VACUUM)")
+            while not self._closing:
+                free = await incremental_vacuum(self.vacuum_pages)
+                if not free:
+                    break
+                await asyncio.sleep(self.pause)
+            await analyze()
+        print(f"[maintenance] archived={archived}")
+        return archived
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=seconds_until_hour(settings.MAINTENANCE_HOUR, time.time()))
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                return
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"[maintenance_error] {type(e).__name__}: {e}")
+
+    def start(self, shard: Optional[Tuple[int, int]] = None) -> None:
+        """
+        shard=(index, workers): archive only this worker's chats; the file-wide vacuum/ANALYZE
+        runs in worker 0 only. MAINTENANCE_HOUR < 0 disables the task.
+        """
+        if settings.MAINTENANCE_HOUR < 0:
+            return
+        self._shard = shard
+        self._compact = shard is None or shard[0] == 0
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        # let the current batch finish (segment written + its delete committed), then exit
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        if not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._closing = False
+
+
+maintenance = Maintenance(settings.RETENTION_BATCH, settings.RETENTION_PAUSE_MS, settings.VACUUM_STEP_PAGES)
+
+
+async def _main() -> None:
+    await init_db()
+    try:
+        await maintenance.run_once()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.config import settings
+from app.metrics import registry
+
+# from call() to the Bot API answer: token waits, 429 back-offs and the request itself
+send_seconds = registry.histogram("leadbot_send_seconds", "Outbound send latency including rate-limit waits")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class SendScheduler:
+    """
+    Every outbound Telegram message goes through here.
+
+    Token buckets: one global (TG_GLOBAL_PER_SECOND), one per private chat (TG_CHAT_PER_SECOND)
+    and one per group/channel (TG_GROUP_PER_MINUTE; chat ids < 0). A send waits until all its
+    buckets have a token. TelegramRetryAfter blocks that chat for retry_after seconds and the
+    message is re-queued, up to TG_SEND_RETRIES times. With WORKERS > 1 every worker process
+    has its own scheduler; share() gives each one its part of the global and group limits.
+    """
+
+    def __init__(self, global_per_second: float, chat_per_second: float, group_per_minute: float, retries: int) -> None:
+        self.chat_per_second = chat_per_second
+        self.group_per_second = group_per_minute / 60.0
+        self.group_burst = 3.0
+        self.retries = max(0, retries)
+        self._global = TokenBucket(global_per_second, global_per_second)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._blocked_until: Dict[int, float] = {}
+
+        self.queued = 0  # sends waiting for a token / a retry right now
+        self.sent = 0
+        self.throttled = 0  # sends that had to wait at least once
+        self.retry_after = 0  # 429s received
+        self.failed = 0
+
+    def share(self, parts: int) -> None:
+        """
+        This process gets 1/parts of the global and per-group rates (a private chat lives in one
+        worker, but all workers send to the bot-wide limit and to the same lead groups).
+        """
+        parts = max(1, parts)
+        self._global = TokenBucket(self._global.rate / parts, self._global.capacity / parts)
+        self.group_per_second /= parts
+        self.group_burst /= parts
+        self._chats = {c: b for c, b in self._chats.items() if c > 0}
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        b = self._chats.get(chat_id)
+        if b is None:
+            if len(self._chats) > 10000:
+                self._prune()
+            if chat_id < 0:
+                # groups: allow a small burst, then ~20/min
+                b = TokenBucket(self.group_per_second, self.group_burst)
+            else:
+                b = TokenBucket(self.chat_per_second, 1)
+            self._chats[chat_id] = b
+        return b
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for chat_id in [c for c, b in self._chats.items() if b.idle(now)]:
+            del self._chats[chat_id]
+        for chat_id in [c for c, t in self._blocked_until.items() if t <= now]:
+            del self._blocked_until[chat_id]
+
+    async def _acquire(self, chat_id: int) -> None:
+        bucket = self._bucket(chat_id)
+        waited = False
+        while True:
+            now = time.monotonic()
+            wait = max(
+                self._global.wait_time(now),
+                bucket.wait_time(now),
+                self._blocked_until.get(chat_id, 0.0) - now,
+            )
+            if wait <= 0:
+                self._global.take()
+                bucket.take()
+                return
+            if not waited:
+                self.throttled += 1
+                waited = True
+            await asyncio.sleep(wait)
+
+    async def call(self, chat_id: int, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Rate-limit and run factory() (a send to chat_id), retrying on RetryAfter."""
+        self.queued += 1
+        t0 = time.perf_counter()
+        try:
+            attempt = 0
+            while True:
+                await self._acquire(chat_id)
+                try:
+                    result = await factory()
+                    self.sent += 1
+                    return result
+                except TelegramRetryAfter as e:
+                    self.retry_after += 1
+                    self._blocked_until[chat_id] = time.monotonic() + e.retry_after
+                    attempt += 1
+                    if attempt > self.retries:
+                        raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.queued -= 1
+            send_seconds.observe(time.perf_counter() - t0)
+
+    async def send_message(self, bot: Bot, chat_id: int, text: str, **kwargs: Any) -> Any:
+        return await self.call(chat_id, lambda: bot.send_message(chat_id, text, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "retry_after": self.retry_after,
+            "failed": self.failed,
+            "blocked_chats": sum(1 for t in self._blocked_until.values() if t > now),
+        }
+
+
+sender = SendScheduler(
+    settings.TG_GLOBAL_PER_SECOND,
+    settings.TG_CHAT_PER_SECOND,
+    settings.TG_GROUP_PER_MINUTE,
+    settings.TG_SEND_RETRIES,
+)
+
+registry.gauge("leadbot_send_queued", "Sends waiting for a token or a retry", fn=lambda: sender.queued)
+registry.counter("leadbot_send_sent_total", "Messages sent", fn=lambda: sender.sent)
+registry.counter("leadbot_send_failed_total", "Sends that raised (after retries)", fn=lambda: sender.failed)
+registry.counter("leadbot_send_throttled_total", "Sends that waited for a rate-limit token", fn=lambda: sender.throttled)
+registry.counter("leadbot_send_retry_after_total", "429 RetryAfter answers", fn=lambda: sender.retry_after)
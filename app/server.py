@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiohttp import web
+
+from app.config import settings
+from app.db import get_db, writer
+from app.mailbox import mailboxes
+from app.metrics import registry
+from app.outbox import outbox
+from app.pacing import pacer
+from app.reminders import reminders
+from app.sender import sender
+
+if TYPE_CHECKING:
+    from app.shards import ShardRouter
+
+
+class BotServer:
+    """
+    The bot's own HTTP server (replaces the separate web.py):
+    - POST WEBHOOK_PATH      Telegram updates (webhook mode only)
+    - GET  / and /healthz    liveness
+    - GET  /readyz           readiness: DB answers + queue depths; 503 while draining
+    - GET  /metrics          Prometheus text format (this process only)
+
+    With a ShardRouter (WORKERS > 1) this runs in the ingress process: webhook updates are
+    routed to worker processes instead of being fed to a local dispatcher.
+    """
+
+    def __init__(self, bot: Bot, dp: Optional[Dispatcher], webhook: bool, router: Optional["ShardRouter"] = None) -> None:
+        self.bot = bot
+        self.dp = dp
+        self.webhook = webhook
+        self.router = router
+        self.draining = False
+        self._runner: Optional[web.AppRunner] = None
+        # updates answered with 200 and still being handled: readiness reports them, drain waits for them
+        self._feeding: Set[asyncio.Task] = set()
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        if self.webhook and self.router is not None:
+            app.router.add_post(settings.WEBHOOK_PATH, self._route_update)
+        elif self.webhook:
+            app.router.add_post(settings.WEBHOOK_PATH, self._handle_update)
+        app.router.add_get("/", self._health)
+        app.router.add_get("/healthz", self._health)
+        app.router.add_get("/readyz", self._ready)
+        app.router.add_get("/metrics", self._metrics)
+        return app
+
+    async def _handle_update(self, request: web.Request) -> web.StreamResponse:
+        if self.draining:
+            # Telegram re-delivers non-2xx updates, so the next instance will get this one
+            return web.json_response({"ok": False, "draining": True}, status=503)
+        secret = settings.WEBHOOK_SECRET
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401, text="Unauthorized")
+        # answered right away, handled in the background (Telegram waits for the reply)
+        task = asyncio.get_running_loop().create_task(self._feed(await request.json()))
+        self._feeding.add(task)
+        task.add_done_callback(self._feeding.discard)
+        return web.json_response({})
+
+    async def _feed(self, update: Dict[str, Any]) -> None:
+        result = await self.dp.feed_raw_update(self.bot, update)
+        if isinstance(result, TelegramMethod):
+            await self.dp.silent_call_request(self.bot, result)
+
+    async def _route_update(self, request: web.Request) -> web.StreamResponse:
+        if self.draining:
+            return web.json_response({"ok": False, "draining": True}, status=503)
+        secret = settings.WEBHOOK_SECRET
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401, text="Unauthorized")
+        self.router.route(await request.json())
+        return web.json_response({})
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.Response(text="OK")
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {
+            "db_pending_writes": len(writer),
+            "reminders": len(reminders),
+            "reply_windows": len(pacer),
+            "chat_mailboxes": len(mailboxes),
+            "outbound_queued": sender.queued,
+            "handoffs_pending": outbox.pending,
+            "updates_in_flight": len(self._feeding),
+        }
+
+    async def _ready(self, request: web.Request) -> web.Response:
+        body: Dict[str, Any] = {"mode": "webhook" if self.webhook else "polling", "draining": self.draining}
+        ok = not self.draining
+        try:
+            db = await get_db()
+            cur = await asyncio.wait_for(db.execute("SELECT 1"), timeout=2)
+            await cur.close()
+            body["db"] = "ok"
+        except Exception as e:
+            ok = False
+            body["db"] = f"{type(e).__name__}: {e}"
+        body["queues"] = self.queue_depths()
+        if self.router is not None:
+            body["workers"] = self.router.stats()
+            ok = ok and all(body["workers"]["alive"])
+        return web.json_response(body, status=200 if ok else 503)
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, settings.HTTP_HOST, settings.PORT).start()
+
+    async def drain(self) -> None:
+        """Stop taking updates and wait for the ones already accepted."""
+        self.draining = True
+        if self._feeding:
+            await asyncio.wait(list(self._feeding), timeout=settings.SHUTDOWN_TIMEOUT_SECONDS)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import signal
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Updates that don't belong to a chat (e.g. business_connection) go to worker 0.
+_CHAT_KEYS = (
+    "message",
+    "edited_message",
+    "business_message",
+    "edited_business_message",
+    "channel_post",
+    "edited_channel_post",
+)
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    for key in _CHAT_KEYS:
+        obj = update.get(key)
+        if obj:
+            return int(obj.get("chat", {}).get("id", 0))
+    cq = update.get("callback_query")
+    if cq and cq.get("message"):
+        return int(cq["message"].get("chat", {}).get("id", 0))
+    for key in ("deleted_business_messages", "message_reaction", "chat_member", "my_chat_member"):
+        obj = update.get(key)
+        if obj and obj.get("chat"):
+            return int(obj["chat"].get("id", 0))
+    return 0
+
+
+def shard_for(chat_id: int, workers: int) -> int:
+    # python's % is non-negative for negative chat ids (groups), so this is stable
+    return chat_id % workers
+
+
+def worker_main(index: int, workers: int, inbox: "mp.Queue") -> None:
+    """Entry point of a worker process: a full bot (DB, reminders, pacer) for its shard of chats."""
+    # Ctrl+C hits the whole process group; the ingress decides when workers stop (inbox sentinel)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker(index, workers, inbox))
+
+
+async def _worker(index: int, workers: int, inbox: "mp.Queue") -> None:
+    from app.bot import build_bot, build_dispatcher, start_outbox, start_reminders
+    from app.config import settings
+    from app.db import close_db, init_db
+    from app.mailbox import mailboxes
+    from app.outbox import outbox
+    from app.pacing import pacer
+    from app.reminders import reminders
+    from app.retention import maintenance
+    from app.sender import sender
+    from app.tenants import tenants
+
+    sender.share(workers)  # the Telegram limits are per bot, not per process
+    await init_db()
+    await tenants.start()
+    bot = build_bot()
+    dp = build_dispatcher(bot)
+    await start_reminders(bot, shard=(index, workers))
+    start_outbox(bot, shard=(index, workers))
+    maintenance.start(shard=(index, workers))
+    loop = asyncio.get_running_loop()
+    running: set = set()
+    print(f"[worker {index}/{workers}] started")
+    try:
+        while True:
+            update = await loop.run_in_executor(None, inbox.get)
+            if update is None:
+                break
+            t = loop.create_task(dp.feed_raw_update(bot, update))
+            running.add(t)
+            t.add_done_callback(running.discard)
+    finally:
+        if running:
+            await asyncio.wait(list(running), timeout=settings.SHUTDOWN_TIMEOUT_SECONDS)
+        await pacer.drain()
+        await mailboxes.drain()
+        await reminders.stop()
+        await outbox.stop()
+        await maintenance.stop()
+        await tenants.stop()
+        await close_db()
+        await bot.session.close()
+        print(f"[worker {index}/{workers}] stopped")
+
+
+class ShardRouter:
+    """
+    Ingress side of WORKERS > 1: every update goes to worker shard_for(chat_id), so all
+    state of one chat (lead cache, reminders, write-behind queue) lives in one process.
+    Each worker has its own inbox; a dead worker is restarted on its own inbox, so
+    nothing routed to it while it was down is lost.
+    """
+
+    def __init__(self, workers: int, target: Callable[..., None] = worker_main, extra_args: tuple = ()) -> None:
+        self.workers = max(1, workers)
+        self.target = target
+        self.extra_args = extra_args
+        self._ctx = mp.get_context("spawn")  # no fork: aiosqlite/aiohttp threads don't survive it
+        self.inboxes: List["mp.Queue"] = [self._ctx.Queue() for _ in range(self.workers)]
+        self.procs: List[Optional[mp.Process]] = [None] * self.workers
+        self.routed = [0] * self.workers
+        self.restarts = [0] * self.workers
+        self._supervisor: Optional[asyncio.Task] = None
+
+    def _spawn(self, i: int) -> None:
+        p = self._ctx.Process(
+            target=self.target,
+            args=(i, self.workers, self.inboxes[i]) + self.extra_args,
+            name=f"leadbot-worker-{i}",
+            daemon=False,
+        )
+        p.start()
+        self.procs[i] = p
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            self._spawn(i)
+        self._supervisor = asyncio.get_running_loop().create_task(self._supervise())
+
+    def route(self, update: Dict[str, Any]) -> int:
+        i = shard_for(update_chat_id(update), self.workers)
+        self.inboxes[i].put(update)
+        self.routed[i] += 1
+        return i
+
+    async def _supervise(self) -> None:
+        while True:
+            await asyncio.sleep(1.0)
+            for i, p in enumerate(self.procs):
+                if p is not None and not p.is_alive():
+                    print(f"[ingress] worker {i} exited with {p.exitcode}, restarting")
+                    self.restarts[i] += 1
+                    self._spawn(i)
+
+    async def restart(self, i: int, timeout: float = 30.0) -> None:
+        """Graceful restart of one worker; its queued updates wait for the new process."""
+        p = self.procs[i]
+        self.procs[i] = None  # keep the supervisor away
+        if p is not None and p.is_alive():
+            self.inboxes[i].put(None)
+            await asyncio.get_running_loop().run_in_executor(None, p.join, timeout)
+            if p.is_alive():
+                p.terminate()
+        self.restarts[i] += 1
+        self._spawn(i)
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
+        for q in self.inboxes:
+            q.put(None)
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        for p in self.procs:
+            if p is None:
+                continue
+            await loop.run_in_executor(None, p.join, max(0.1, deadline - time.monotonic()))
+            if p.is_alive():
+                p.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        depths = []
+        for q in self.inboxes:
+            try:
+                depths.append(q.qsize())
+            except NotImplementedError:  # macOS
+                depths.append(-1)
+        return {
+            "workers": self.workers,
+            "alive": [bool(p and p.is_alive()) for p in self.procs],
+            "routed": list(self.routed),
+            "inbox_depth": depths,
+            "restarts": list(self.restarts),
+        }
+
+
+async def poll_into(bot: Any, router: ShardRouter, stop: asyncio.Event, allowed_updates: List[str]) -> None:
+    """Long-polling ingress: getUpdates -> router, until stop is set."""
+    offset: Optional[int] = None
+    backoff = 1.0
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=25, allowed_updates=allowed_updates)
+            backoff = 1.0
+        except Exception as e:
+            print(f"[ingress] getUpdates failed: {type(e).__name__}: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+            continue
+        for u in updates:
+            router.route(u.model_dump(mode="json", by_alias=True, exclude_none=True))
+            offset = u.update_id + 1
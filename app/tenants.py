@@ -0,0 +1,190 @@
+"""
+Tenants: per Telegram Business connection settings, for many connections in one process.
+
+Every business_message carries its business_connection_id; the connection's row in the
+`tenants` table decides where its lead cards go (leads_chat_id), the reminder interval,
+whether the LLM tier is used (llm_mode) and the question texts the client sees. Empty
+columns, unknown connections and plain bot chats fall back to the process settings
+(LEADS_CHAT_ID, REMINDER_MINUTES, LLM_MODE, lead_logic's texts).
+
+The table is read into memory at start and re-read when it changes (checked every
+TENANTS_RELOAD_SECONDS with one aggregate query), so handlers resolve a tenant with a
+dict lookup and edits apply without a restart. The event loop, the DB writer, the send
+scheduler and the outbox stay shared by all tenants.
+
+    python -m app.tenants set <business_connection_id> --name "Agency" --leads-chat-id -100123 --q1 "..."
+    python -m app.tenants set <business_connection_id> --reset q1     # back to the default text
+    python -m app.tenants list
+    python -m app.tenants remove <business_connection_id>
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.db import TENANT_COLUMNS, close_db, delete_tenant, init_db, load_tenants, tenants_version, upsert_tenant
+from app.lead_logic import DEFAULT_QUESTIONS, Questions
+from app.metrics import registry
+
+LLM_MODES = ("off", "on")
+
+
+class Tenant(NamedTuple):
+    business_connection_id: Optional[str]  # None: the default tenant
+    name: str
+    leads_chat_id: int
+    reminder_minutes: int  # 0 = no reminders
+    llm_mode: str  # off | on (the LLM also needs OPENAI_API_KEY)
+    questions: Questions
+
+    @property
+    def llm_on(self) -> bool:
+        return self.llm_mode == "on"
+
+
+def default_tenant() -> Tenant:
+    mode = settings.LLM_MODE.lower()
+    return Tenant(
+        None,
+        "",
+        settings.LEADS_CHAT_ID,
+        settings.REMINDER_MINUTES,
+        mode if mode in LLM_MODES else "off",
+        DEFAULT_QUESTIONS,
+    )
+
+
+def tenant_from_row(row: Dict[str, Any], default: Tenant) -> Tenant:
+    """A tenants row over the defaults: NULL / empty columns keep the default value."""
+    mode = (row.get("llm_mode") or "").lower()
+    texts = {k: (row.get(k) or "").strip() for k in Questions._fields}
+    return Tenant(
+        row["business_connection_id"],
+        row.get("name") or "",
+        row["leads_chat_id"] if row.get("leads_chat_id") is not None else default.leads_chat_id,
+        max(0, row["reminder_minutes"]) if row.get("reminder_minutes") is not None else default.reminder_minutes,
+        mode if mode in LLM_MODES else default.llm_mode,
+        default.questions._replace(**{k: v for k, v in texts.items() if v}),
+    )
+
+
+class TenantRegistry:
+    def __init__(self, reload_seconds: float) -> None:
+        self.reload_seconds = reload_seconds
+        self.default = default_tenant()
+        self._by_bc: Dict[str, Tenant] = {}
+        self._version: Optional[Tuple[int, Optional[float]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._closing = False
+        self.reloads = 0
+
+    def __len__(self) -> int:
+        return len(self._by_bc)
+
+    def get(self, business_connection_id: Optional[str]) -> Tenant:
+        """The connection's tenant; the default one for plain chats and unknown connections."""
+        if not business_connection_id:
+            return self.default
+        return self._by_bc.get(business_connection_id, self.default)
+
+    async def reload(self, force: bool = False) -> bool:
+        """Re-read the table if it changed since the last load; True if it was re-read."""
+        version = await tenants_version()
+        if not force and version == self._version:
+            return False
+        rows = await load_tenants()
+        # swapped in one assignment: a handler never sees a half-loaded table
+        self._by_bc = {r["business_connection_id"]: tenant_from_row(r, self.default) for r in rows}
+        self._version = version
+        self.reloads += 1
+        return True
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.reload_seconds)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                return
+            try:
+                if await self.reload():
+                    print(f"[tenants] reloaded: {len(self._by_bc)} tenants")
+            except Exception as e:
+                print(f"[tenants_error] {type(e).__name__}: {e}")
+
+    async def start(self) -> None:
+        """Load the table now (before updates are handled), then watch it for changes."""
+        await self.reload(force=True)
+        if self.reload_seconds > 0:
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._closing = False
+
+
+tenants = TenantRegistry(settings.TENANTS_RELOAD_SECONDS)
+
+registry.gauge("leadbot_tenants", "Business connections with their own settings", fn=lambda: len(tenants))
+registry.counter("leadbot_tenants_reloads_total", "Times the tenants table was (re)loaded", fn=lambda: tenants.reloads)
+
+
+def _describe(t: Tenant) -> str:
+    custom = [k for k in Questions._fields if getattr(t.questions, k) != getattr(DEFAULT_QUESTIONS, k)]
+    return (
+        f"{t.business_connection_id or '(default)'}  name={t.name or '-'}  leads_chat_id={t.leads_chat_id}  "
+        f"reminder_minutes={t.reminder_minutes}  llm_mode={t.llm_mode}  texts={','.join(custom) or 'default'}"
+    )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await init_db()
+    try:
+        if args.cmd == "set":
+            fields = {k: getattr(args, k) for k in TENANT_COLUMNS if getattr(args, k) is not None}
+            for k in args.reset or ():
+                fields[k] = None
+            await upsert_tenant(args.business_connection_id, **fields)
+            await tenants.reload(force=True)
+            print(_describe(tenants.get(args.business_connection_id)))
+        elif args.cmd == "remove":
+            print("removed" if await delete_tenant(args.business_connection_id) else "no such tenant")
+        else:
+            await tenants.reload(force=True)
+            for bc in sorted(tenants._by_bc):
+                print(_describe(tenants._by_bc[bc]))
+            print(f"{len(tenants)} tenants; others use the defaults: {_describe(tenants.default)}")
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per business connection settings")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    st = sub.add_parser("set", help="create or change a tenant (the running bot picks it up on its next check)")
+    st.add_argument("business_connection_id")
+    st.add_argument("--name")
+    st.add_argument("--leads-chat-id", dest="leads_chat_id", type=int)
+    st.add_argument("--reminder-minutes", dest="reminder_minutes", type=int)
+    st.add_argument("--llm-mode", dest="llm_mode", choices=LLM_MODES)
+    for q in Questions._fields:
+        st.add_argument(f"--{q}", help=f"text of {q.upper()} for this connection's clients")
+    st.add_argument("--reset", action="append", choices=TENANT_COLUMNS, help="back to the default (repeatable)")
+    sub.add_parser("list", help="tenants and the defaults")
+    rm = sub.add_parser("remove", help="the connection goes back to the defaults")
+    rm.add_argument("business_connection_id")
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import re
-from typing import Optional
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional
 
 
 MONTHS_RU = {
@@ -22,55 +22,101 @@ MONTHS_RU = {
 
 _WORD_TO_NUM = {"двое": 2, "трое": 3, "четверо": 4, "пятеро": 5, "шестеро": 6}
 
+# Every keyword list the parsers look for; each text is checked once per group (`in` is a
+# C-level substring search, much cheaper than one big alternation regex over long listings).
+_KEYWORDS = {
+    "soon": ("на днях", "в ближайшие дни", "в ближайшее время", "скоро", "soon", "next few days"),
+    "asap": ("asap", "срочно", "как можно скорее", "сразу"),
+    "today": ("сегодня", "today"),
+    "tomorrow": ("завтра", "tomorrow"),
+    "after": ("после", "after"),
+    "pm": ("вечера", "pm", "p.m"),
+    "pair": ("вдвоем", "вдвоём"),
+    "alone": ("я одна", "только я", "just me", "only me"),
+}
+_PC_UNITS = ("чел", "people", "persons")
+
+_DIGIT_RE = re.compile(r"\d")
+# literal-prefixed patterns have no leading \b (so the engine can skip to the prefix): search them with _search_word
+_PC_WORD_RE = re.compile(r"нас\s+(двое|трое|четверо|пятеро|шестеро)\b")
+_PC_NAS_RE = re.compile(r"нас\s*[:\-]?\s*(\d{1,2})\b")
+_PC_UNIT_RE = re.compile(r"\b(\d{1,2})\s*(чел|человек|people|persons)\b")
+_PC_PEOPLE_RE = re.compile(r"(people|persons)\s*[:\-]?\s*(\d{1,2})")
+_MV_RU_REL_RE = re.compile(r"через\s*(\d{1,2})\s*(дн|дня|дней|нед|недел|мес|месяц|месяца|месяцев)")
+_MV_EN_REL_RE = re.compile(r"in\s*(\d{1,2})\s*(day|days|week|weeks|month|months)\b")
+_MV_DATE_RE = re.compile(
+    r"\b(\d{1,2})\s*(январ\w*|феврал\w*|март\w*|апрел\w*|ма\w*|июн\w*|июл\w*|август\w*|сентябр\w*|октябр\w*|ноябр\w*|декабр\w*)"
+)
+_ST_CLOCK_RE = re.compile(r"\b(\d{1,2})[:\.](\d{2})\b")
+_ST_HOUR_RE = re.compile(r"\b(\d{1,2})\b")
+
+
+class Extraction(NamedTuple):
+    people_count: Optional[int]
+    move_in: Optional[str]
+    showing_time: Optional[str]
+
+
+_EMPTY = Extraction(None, None, None)
+
+
+def _search_word(rx: "re.Pattern[str]", tl: str) -> Optional["re.Match[str]"]:
+    """rx.search() as if rx started with \\b (a word boundary before its first character)."""
+    m = rx.search(tl)
+    while m is not None:
+        s = m.start()
+        if s == 0 or not (tl[s - 1].isalnum() or tl[s - 1] == "_"):
+            return m
+        m = rx.search(tl, s + 1)
+    return None
 
-def extract_people_count(text: str) -> Optional[int]:
-    if not text:
-        return None
-    tl = text.lower().strip()
 
-    m = re.search(r"\bнас\s+(двое|трое|четверо|пятеро|шестеро)\b", tl)
-    if m:
-        return _WORD_TO_NUM[m.group(1)]
+def _people_count(tl: str, kw: FrozenSet[str], digits: bool) -> Optional[int]:
+    nas = "нас" in tl
+    if nas:
+        m = _search_word(_PC_WORD_RE, tl)
+        if m:
+            return _WORD_TO_NUM[m.group(1)]
 
-    m = re.search(r"\bнас\s*[:\-]?\s*(\d{1,2})\b", tl)
-    if m:
-        return int(m.group(1))
+    if digits:
+        if nas:
+            m = _search_word(_PC_NAS_RE, tl)
+            if m:
+                return int(m.group(1))
 
-    m = re.search(r"\b(\d{1,2})\s*(чел|человек|people|persons)\b", tl)
-    if m:
-        return int(m.group(1))
+        if any(u in tl for u in _PC_UNITS):
+            m = _PC_UNIT_RE.search(tl)
+            if m:
+                return int(m.group(1))
 
-    m = re.search(r"(people|persons)\s*[:\-]?\s*(\d{1,2})", tl)
-    if m:
-        return int(m.group(2))
+            m = _PC_PEOPLE_RE.search(tl)
+            if m:
+                return int(m.group(2))
 
-    if "вдвоем" in tl or "вдвоём" in tl:
+    if "pair" in kw:
         return 2
 
-    if any(x in tl for x in ["я одна", "только я", "just me", "only me"]):
+    if "alone" in kw:
         return 1
 
     return None
 
 
-def extract_move_in(text: str) -> Optional[str]:
-    if not text:
-        return None
-    tl = text.lower().strip()
-    if not tl:
-        return None
-
-    if any(x in tl for x in ["на днях", "в ближайшие дни", "в ближайшее время", "скоро", "soon", "next few days"]):
+def _move_in(tl: str, kw: FrozenSet[str], digits: bool) -> Optional[str]:
+    if "soon" in kw:
         return "в ближайшие дни"
 
-    if any(x in tl for x in ["asap", "срочно", "как можно скорее", "сразу"]):
+    if "asap" in kw:
         return "ASAP"
-    if "сегодня" in tl or "today" in tl:
+    if "today" in kw:
         return "today"
-    if "завтра" in tl or "tomorrow" in tl:
+    if "tomorrow" in kw:
         return "tomorrow"
 
-    m = re.search(r"через\s*(\d{1,2})\s*(дн|дня|дней|нед|недел|мес|месяц|месяца|месяцев)", tl)
+    if not digits:
+        return None
+
+    m = _MV_RU_REL_RE.search(tl)
     if m:
         n = int(m.group(1))
         unit = m.group(2)
@@ -80,14 +126,11 @@ def extract_move_in(text: str) -> Optional[str]:
             return f"через {n} недель"
         return f"через {n} месяцев"
 
-    m = re.search(r"\bin\s*(\d{1,2})\s*(day|days|week|weeks|month|months)\b", tl)
+    m = _search_word(_MV_EN_REL_RE, tl)
     if m:
         return f"in {int(m.group(1))} {m.group(2)}"
 
-    m = re.search(
-        r"\b(\d{1,2})\s*(январ\w*|феврал\w*|март\w*|апрел\w*|ма\w*|июн\w*|июл\w*|август\w*|сентябр\w*|октябр\w*|ноябр\w*|декабр\w*)",
-        tl,
-    )
+    m = _MV_DATE_RE.search(tl)
     if m:
         day = m.group(1)
         mon_key = m.group(2)[:3]
@@ -97,52 +140,84 @@ def extract_move_in(text: str) -> Optional[str]:
     return None
 
 
-def extract_showing_time(text: str) -> Optional[str]:
-    """
-    Return a compact normalized string for manager:
-    - "today 7pm"
-    - "today after 8pm"
-    - "tomorrow 19:00"
-    Also supports RU "в 7 вечера", "после 8", "после 20:00"
-    """
-    if not text:
-        return None
-    tl = text.lower().strip()
-    if not tl:
-        return None
-
+def _showing_time(tl: str, kw: FrozenSet[str], digits: bool) -> Optional[str]:
     day = None
-    if "сегодня" in tl or "today" in tl:
+    if "today" in kw:
         day = "today"
-    elif "завтра" in tl or "tomorrow" in tl:
+    elif "tomorrow" in kw:
         day = "tomorrow"
 
-    # capture time like 19:00 / 7:30
-    m = re.search(r"\b(\d{1,2})[:\.](\d{2})\b", tl)
-    if m:
-        hh = int(m.group(1))
-        mm = m.group(2)
-        prefix = "after " if any(w in tl for w in ["после", "after"]) else ""
-        if day:
-            return f"{day} {prefix}{hh:02d}:{mm}"
-        return f"{prefix}{hh:02d}:{mm}".strip()
-
-    # capture "в 7", "в 7 вечера", "at 7", "7 pm"
-    m = re.search(r"\b(\d{1,2})\b", tl)
-    if m:
-        hh = int(m.group(1))
-        is_after = any(w in tl for w in ["после", "after"])
-        is_pm = any(w in tl for w in ["вечера", "pm", "p.m"])
-        # If "вечера" and hour is 1..11 -> convert to 13..23
-        if is_pm and 1 <= hh <= 11:
-            hh += 12
-        prefix = "after " if is_after else ""
-        if day:
-            return f"{day} {prefix}{hh:02d}:00".strip()
-        return f"{prefix}{hh:02d}:00".strip()
+    if digits:
+        # capture time like 19:00 / 7:30
+        m = _ST_CLOCK_RE.search(tl)
+        if m:
+            hh = int(m.group(1))
+            mm = m.group(2)
+            prefix = "after " if "after" in kw else ""
+            if day:
+                return f"{day} {prefix}{hh:02d}:{mm}"
+            return f"{prefix}{hh:02d}:{mm}".strip()
+
+        # capture "в 7", "в 7 вечера", "at 7", "7 pm"
+        m = _ST_HOUR_RE.search(tl)
+        if m:
+            hh = int(m.group(1))
+            # If "вечера" and hour is 1..11 -> convert to 13..23
+            if "pm" in kw and 1 <= hh <= 11:
+                hh += 12
+            prefix = "after " if "after" in kw else ""
+            if day:
+                return f"{day} {prefix}{hh:02d}:00".strip()
+            return f"{prefix}{hh:02d}:00".strip()
 
     # just day
     if day:
         return day
 
     return None
+
+
+def extract_all(text: str) -> Extraction:
+    """
+    People count, move-in and showing time in one pass: lowercase once, one keyword scan,
+    and the numeric regexes only when the text has a digit at all.
+    """
+    if not text:
+        return _EMPTY
+    tl = text.lower().strip()
+    if not tl:
+        return _EMPTY
+    kw = frozenset(name for name, words in _KEYWORDS.items() if any(w in tl for w in words))
+    digits = _DIGIT_RE.search(tl) is not None
+    return Extraction(_people_count(tl, kw, digits), _move_in(tl, kw, digits), _showing_time(tl, kw, digits))
+
+
+def extract_people_count(text: str) -> Optional[int]:
+    return extract_all(text).people_count
+
+
+def extract_move_in(text: str) -> Optional[str]:
+    return extract_all(text).move_in
+
+
+def extract_showing_time(text: str) -> Optional[str]:
+    """
+    Return a compact normalized string for manager:
+    - "today 7pm"
+    - "today after 8pm"
+    - "tomorrow 19:00"
+    Also supports RU "в 7 вечера", "после 8", "после 20:00"
+    """
+    return extract_all(text).showing_time
+
+
+def extract_many(texts: Iterable[str]) -> List[Extraction]:
+    """extract_all over a batch; repeated texts (pasted listings, "ок") are parsed once."""
+    seen: Dict[str, Extraction] = {}
+    out = []
+    for t in texts:
+        ex = seen.get(t)
+        if ex is None:
+            ex = seen[t] = extract_all(t)
+        out.append(ex)
+    return out
@@ -0,0 +1,81 @@
+"""
+Extraction: golden check + throughput.
+
+    python -m bench.bench_extraction            # check golden file, then benchmark
+    python -m bench.bench_extraction --check    # golden check only (exit 1 on mismatch)
+
+The golden file (bench/golden_extraction.json) holds the outputs of the original
+extract_people_count / extract_move_in / extract_showing_time for every corpus text;
+app.utils.extract_all must reproduce it exactly.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from app.utils import extract_all
+from bench import legacy_utils
+from bench.corpus import LISTINGS, message_stream
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_extraction.json")
+
+
+def check_golden() -> int:
+    with open(GOLDEN, encoding="utf-8") as f:
+        rows = json.load(f)
+    bad = 0
+    for r in rows:
+        got = extract_all(r["text"])
+        want = (r["people_count"], r["move_in"], r["showing_time"])
+        if tuple(got) != want:
+            bad += 1
+            print(f"MISMATCH {r['text']!r}: got {tuple(got)} want {want}")
+    print(f"golden: {len(rows) - bad}/{len(rows)} match")
+    return bad
+
+
+def _legacy(text: str):
+    return (
+        legacy_utils.extract_people_count(text),
+        legacy_utils.extract_move_in(text),
+        legacy_utils.extract_showing_time(text),
+    )
+
+
+def _rate(fn, texts, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            fn(t)
+    return len(texts) * repeat / (time.perf_counter() - t0)
+
+
+def bench(n: int, repeat: int) -> None:
+    cases = {
+        "mixed stream": message_stream(n),
+        "long listings": LISTINGS * max(1, n // 100),
+    }
+    for name, texts in cases.items():
+        old = _rate(_legacy, texts, repeat)
+        new = _rate(extract_all, texts, repeat)
+        chars = sum(len(t) for t in texts) / len(texts)
+        print(f"{name:>14} (avg {chars:.0f} chars): legacy {old:,.0f}/s  engine {new:,.0f}/s  x{new / old:.2f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--check", action="store_true")
+    ap.add_argument("-n", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    if check_golden():
+        sys.exit(1)
+    if not args.check:
+        bench(args.n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
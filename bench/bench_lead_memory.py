@@ -0,0 +1,64 @@
+"""
+Memory per lead held in the LeadCache LRU (the object plus its clean snapshot).
+
+    python -m bench.bench_lead_memory --leads 20000
+
+Fills a LeadCache with leads from the suite's sample generator and reports the bytes
+tracemalloc attributes to it, per lead. Values shared between leads (interned strings,
+small ints) are counted once, as they are in the running bot.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import tracemalloc
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+os.environ.setdefault("LEADS_CHAT_ID", "-1")
+
+
+def measure(n: int) -> dict:
+    from app.db import LeadCache
+    from bench.suite import _sample_leads
+
+    leads = _sample_leads(n)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    cache = LeadCache(n)
+    for lead in leads:
+        cache.put(lead)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    cache_bytes = sum(s.size_diff for s in after.compare_to(before, "filename"))
+
+    tracemalloc.start()
+    from bench.suite import _sample_leads as again
+
+    t0 = tracemalloc.get_traced_memory()[0]
+    more = again(n)
+    lead_bytes = tracemalloc.get_traced_memory()[0] - t0
+    tracemalloc.stop()
+    del more
+    return {
+        "leads": n,
+        "lead_object_bytes": round(lead_bytes / n, 1),
+        "cache_overhead_bytes": round(cache_bytes / n, 1),
+        "total_bytes": round((lead_bytes + cache_bytes) / n, 1),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Bytes per cached LeadState")
+    ap.add_argument("--leads", type=int, default=20000)
+    args = ap.parse_args()
+    r = measure(args.leads)
+    print(f"leads:              {r['leads']}")
+    print(f"LeadState + values: {r['lead_object_bytes']:>8.1f} B/lead")
+    print(f"LRU entry/snapshot: {r['cache_overhead_bytes']:>8.1f} B/lead")
+    print(f"total:              {r['total_bytes']:>8.1f} B/lead")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Lost updates under concurrent messages of one chat: unserialized vs per-chat mailbox.
+
+    python -m bench.bench_mailbox --chats 200 --messages 20
+
+Every chat gets --messages updates, fired as interleaved bursts across all chats (like
+aiogram running updates as tasks). Each update does what a reply does to the lead: load,
+await something slow (LLM / send, --work-ms random), change it, save. The lead cache is off
+by default (--cache), so every load returns its own copy, as after an LRU eviction.
+
+Checked per chat at the end, against the DB:
+- stuck_count == --messages (no increment lost),
+- extras["seen"] lists every update in arrival order.
+Exits 1 if the mailbox mode loses or reorders anything, or leaves a mailbox behind.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+os.environ.setdefault("LEADS_CHAT_ID", "-1")
+
+
+async def _run(serialized: bool, chats: int, messages: int, work_ms: float, path: str) -> dict:
+    from app import db
+    from app.config import settings
+    from app.mailbox import mailboxes
+    from app.models import LeadState
+
+    settings.SQLITE_PATH = path
+    await db.init_db()
+    rnd = random.Random(7)
+
+    async def update(chat_id: int, seq: int) -> None:
+        lead = await db.load_lead(chat_id) or LeadState(chat_id=chat_id, user_id=chat_id)
+        await asyncio.sleep(rnd.uniform(0, work_ms) / 1000)
+        lead.stuck_count += 1
+        lead.extras = {"seen": list((lead.extras or {}).get("seen", ())) + [seq]}
+        await db.save_lead(lead)
+
+    # round-robin over chats with random burst sizes: one chat's updates overlap each other
+    order = [(c, s) for s in range(messages) for c in range(1, chats + 1)]
+    tasks = []
+    t0 = time.perf_counter()
+    i = 0
+    while i < len(order):
+        burst = order[i : i + rnd.randint(1, 2 * chats)]
+        i += len(burst)
+        for chat_id, seq in burst:
+            if serialized:
+                job = lambda chat_id=chat_id, seq=seq: update(chat_id, seq)  # noqa: E731
+                tasks.append(asyncio.ensure_future(mailboxes.call(chat_id, job)))
+            else:
+                tasks.append(asyncio.ensure_future(update(chat_id, seq)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    dt = time.perf_counter() - t0
+    left = len(mailboxes)
+
+    lost = reordered = 0
+    for chat_id in range(1, chats + 1):
+        lead = await db.load_lead(chat_id)
+        lost += messages - lead.stuck_count
+        seen = (lead.extras or {}).get("seen", [])
+        reordered += seen != sorted(seen)
+    await db.close_db()
+    return {
+        "mode": "mailbox" if serialized else "unserialized",
+        "updates": len(order),
+        "lost": lost,
+        "reordered_chats": reordered,
+        "mailboxes_left": left,
+        "seconds": dt,
+        "updates_per_sec": len(order) / dt,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-chat mailbox stress test")
+    ap.add_argument("--chats", type=int, default=200)
+    ap.add_argument("--messages", type=int, default=20, help="updates per chat")
+    ap.add_argument("--work-ms", type=float, default=5.0, help="max simulated await between load and save")
+    ap.add_argument("--cache", type=int, default=0, help="LEAD_CACHE_SIZE (0: every load is a fresh copy)")
+    args = ap.parse_args()
+
+    os.environ["LEAD_CACHE_SIZE"] = str(args.cache)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    failed = False
+    for serialized in (False, True):
+        with tempfile.TemporaryDirectory() as td:
+            r = asyncio.run(_run(serialized, args.chats, args.messages, args.work_ms, os.path.join(td, "bench.sqlite3")))
+        print(
+            f"{r['mode']:>12}: updates={r['updates']} lost={r['lost']} reordered_chats={r['reordered_chats']} "
+            f"mailboxes_left={r['mailboxes_left']} {r['seconds']:.2f}s updates/sec={r['updates_per_sec']:.0f}"
+        )
+        if serialized and (r["lost"] or r["reordered_chats"] or r["mailboxes_left"]):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
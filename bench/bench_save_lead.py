@@ -0,0 +1,83 @@
+"""
+Commits per inbound message: commit-per-save vs write-behind.
+
+    python -m bench.bench_save_lead --messages 5000 --chats 200
+
+Simulates the _handle_text_like pattern (load -> save, auto-start path saves twice)
+against a temp SQLite file and prints commits/message and msgs/sec for both modes.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+os.environ.setdefault("LEADS_CHAT_ID", "-1")
+
+
+async def _run(mode: int, messages: int, chats: int, path: str) -> dict:
+    from app import db
+    from app.config import settings
+    from app.models import LeadState
+
+    settings.SQLITE_PATH = path
+    settings.DB_WRITE_BEHIND = mode
+    for k in db.stats:
+        db.stats[k] = 0
+    await db.init_db()
+
+    rnd = random.Random(42)
+    t0 = time.perf_counter()
+
+    async def one(chat_id: int) -> None:
+        lead = await db.load_lead(chat_id)
+        if lead is None:
+            lead = LeadState(chat_id=chat_id, user_id=chat_id)
+            lead.last_question = "Q1"
+            await db.save_lead(lead)  # auto-start save
+        lead.stuck_count += 1
+        await db.save_lead(lead)
+
+    # bursts of concurrent messages, like aiogram handling many chats at once
+    sent = 0
+    while sent < messages:
+        burst = min(50, messages - sent)
+        await asyncio.gather(*(one(rnd.randrange(chats)) for _ in range(burst)))
+        sent += burst
+    await db.close_db()
+    dt = time.perf_counter() - t0
+    return {
+        "mode": "write-behind" if mode else "commit-per-save",
+        "saves": db.stats["saves"],
+        "commits": db.stats["commits"],
+        "cache_hits": db.stats["cache_hits"],
+        "clean_saves": db.stats["clean_saves"],
+        "commits_per_msg": db.stats["commits"] / messages,
+        "msgs_per_sec": messages / dt,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--chats", type=int, default=200)
+    args = ap.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for mode in (0, 1):
+        with tempfile.TemporaryDirectory() as td:
+            r = asyncio.run(_run(mode, args.messages, args.chats, os.path.join(td, "bench.sqlite3")))
+        print(
+            f"{r['mode']:>16}: saves={r['saves']} commits={r['commits']} "
+            f"cache_hits={r['cache_hits']} clean_saves={r['clean_saves']} "
+            f"commits/msg={r['commits_per_msg']:.3f} msgs/sec={r['msgs_per_sec']:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Messages/sec vs number of worker processes (chat-affinity sharding).
+
+    python -m bench.bench_sharding --messages 20000 --chats 500 --workers 1 2 4
+
+Uses the real ShardRouter (spawned processes, per-worker inbox, routing by chat_id).
+The worker does the CPU part of handling a message without network or SQLite:
+Update validation, decide_reply on the chat's LeadState and serializing the lead.
+Scaling is capped by the number of cores (`nproc`).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+os.environ.setdefault("LEADS_CHAT_ID", "-1")
+
+TEXTS = [
+    "Здравствуйте, квартира ещё свободна?",
+    "нас двое, заселение 1 мая",
+    "Я работаю в IT, жена учитель",
+    "завтра после 7 вечера",
+    "2 people, move in asap",
+    "Hi, is it still available? we are 3 persons",
+    "через 2 недели",
+]
+
+
+def bench_worker(index: int, workers: int, inbox, results) -> None:
+    from aiogram.types import Update
+
+    from app.lead_logic import Q1, decide_reply
+    from app.models import LeadState
+
+    leads = {}
+    handled = 0
+    results.put((index, -1))  # imports done
+    while True:
+        raw = inbox.get()
+        if raw is None:
+            break
+        upd = Update.model_validate(raw)
+        m = upd.message
+        lead = leads.get(m.chat.id)
+        if lead is None:
+            lead = leads[m.chat.id] = LeadState(chat_id=m.chat.id, user_id=m.from_user.id, last_question=Q1)
+        decide_reply(lead, m.text or "")
+        lead.touch()
+        json.dumps(lead.to_dict(), ensure_ascii=False)
+        handled += 1
+    results.put((index, handled))
+
+
+def make_update(i: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "date": 1760000000 + i,
+            "chat": {"id": chat_id, "type": "private", "first_name": "U"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "U"},
+            "text": text,
+        },
+    }
+
+
+async def run(workers: int, messages: int, chats: int) -> float:
+    from app.shards import ShardRouter
+
+    rnd = random.Random(1)
+    updates = [make_update(i, 1000 + rnd.randrange(chats), rnd.choice(TEXTS)) for i in range(messages)]
+    router = ShardRouter(workers, target=bench_worker)
+    results = router._ctx.Queue()
+    router.extra_args = (results,)
+    router.start()
+    # wait until every worker finished importing before the clock starts
+    loop = asyncio.get_running_loop()
+    for _ in range(workers):
+        await loop.run_in_executor(None, results.get)
+
+    t0 = time.perf_counter()
+    for u in updates:
+        router.route(u)
+    await router.stop(600)  # sentinel per inbox, joins the workers once they drained
+    dt = time.perf_counter() - t0
+    total = sum(results.get()[1] for _ in range(workers))
+    assert total == messages, (total, messages)
+    return messages / dt
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=20000)
+    ap.add_argument("--chats", type=int, default=500)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = ap.parse_args()
+    print(f"cores: {os.cpu_count()}")
+    base = None
+    for n in args.workers:
+        rate = asyncio.run(run(n, args.messages, args.chats))
+        base = base or rate
+        print(f"workers={n}: {rate:,.0f} msgs/sec  (x{rate / base:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Realistic inbound texts for benchmarks and the extraction golden file.
+
+MESSAGES: short client replies (RU/EN), including the edge cases the parsers care about.
+LISTINGS: long forwarded listing posts (what clients paste as the listing context).
+"""
+from __future__ import annotations
+
+import random
+from typing import List
+
+MESSAGES: List[str] = [
+    "Здравствуйте! Квартира ещё свободна?",
+    "Добрый день, интересует квартира на Brighton Beach",
+    "нас двое, заселение 1 мая",
+    "Нас двое. Заселиться хотим 15 июня",
+    "нас трое, хотим въехать через 2 недели",
+    "Нас четверо, с 1 сентября",
+    "нас пятеро",
+    "Нас шестеро, въезд в октябре",
+    "нас 2",
+    "Нас: 3, заселение asap",
+    "нас-4 человека",
+    "2 человека, заселение 20 мая",
+    "3 чел, через месяц",
+    "1 человек, сразу",
+    "2 people, move in asap",
+    "We are 3 persons, moving in 2 weeks",
+    "people: 2, move in tomorrow",
+    "persons - 4",
+    "Мы вдвоем с мужем, заселение на днях",
+    "вдвоём, в ближайшее время",
+    "я одна, хочу заселиться завтра",
+    "Только я, с 1 декабря",
+    "just me, asap please",
+    "only me, moving in 3 months",
+    "Я одна, въезд 5 январ",
+    "заселение 10 февраля",
+    "с 1 марта",
+    "с 12 апреля",
+    "1 мая",
+    "с 3 июля",
+    "с 30 августа",
+    "в ноябре 15 ноября",
+    "23 декабря",
+    "срочно нужна квартира",
+    "как можно скорее",
+    "скоро",
+    "soon",
+    "next few days",
+    "в ближайшие дни",
+    "сегодня",
+    "today",
+    "завтра",
+    "tomorrow",
+    "через 3 дня",
+    "через 1 день",
+    "через 2 недели",
+    "через 1 неделю",
+    "через 2 месяца",
+    "через 6 месяцев",
+    "in 2 days",
+    "in 1 week",
+    "in 3 weeks",
+    "in 1 month",
+    "in 2 months",
+    "Работаю программистом",
+    "Я медсестра, муж водитель",
+    "Студентка, учусь в NYU",
+    "software engineer at a bank",
+    "Сегодня в 7 вечера",
+    "сегодня после 8",
+    "сегодня после 20:00",
+    "завтра в 19:00",
+    "завтра 18.30",
+    "tomorrow at 7 pm",
+    "today after 6pm",
+    "today 5 p.m",
+    "в 10",
+    "после 9 вечера",
+    "в 12:15",
+    "завтра утром",
+    "сегодня вечером",
+    "tomorrow",
+    "завтра после обеда",
+    "в любое время",
+    "после 11 вечера",
+    "в 12 вечера",
+    "в 0 вечера",
+    "в 99 утра",
+    "",
+    "   ",
+    "?",
+    "ок",
+    "спасибо",
+    "Hi",
+    "Is it still available?",
+    "Сколько стоит?",
+    "Можно с собакой?",
+    "Есть ли брокер фи?",
+    "Какой депозит?",
+    "afternoon works",
+    "послезавтра",
+    "после завтра в 5",
+    "нас двое, заселение сегодня, показ завтра в 7 вечера",
+    "нас 2, 1 мая, работаем оба, показ сегодня после 18:00",
+    "3 people, in 2 weeks, tomorrow 6 pm",
+    "Здравствуйте! Нас трое (я, муж и ребенок 5 лет), хотим заселиться 1 июня, работаем в IT",
+    "нас 12 человек",
+    "нас 123",
+    "1234 people",
+    "people 99",
+    "100 чел",
+    "в 2025 году",
+    "через 12 мес",
+    "через 10 дн",
+    "in 10 days",
+    "in10days",
+    "через2недели",
+    "5мая",
+    "05 мая",
+    "5 МАЯ",
+    "НАС ДВОЕ",
+    "Only Me",
+    "ASAP",
+    "Сразу после 15 числа",
+    "к 1 числу",
+    "с первого мая",
+    "в мае",
+    "май",
+    "1 март",
+    "1 марта 2025",
+    "tel 917-555-1234",
+    "cost $2500/month",
+    "2br 1ba, $3,100",
+    "Показ сегодня в 19.45",
+    "today 7:30pm",
+    "after 8",
+    "7pm",
+    "в 7 p.m",
+    "нас двое вдвоем",
+    "я одна только я",
+    "скорее всего в сентябре 10 сентября",
+    "на днях или через 2 дня",
+    "today or tomorrow",
+    "завтра или сегодня",
+    "ем в 19:00 и в 20:30",
+    "сегодня 25:99",
+    "Мы с женой и двумя детьми, нас четверо",
+    "Тел: +1 (718) 555-01-23",
+    "квартира 3B, 5 этаж",
+    "📅 1 мая 🙂",
+    "нас   двое",
+    "нас:5",
+    "нас - 6",
+    "6 persons",
+    "persons: 7",
+]
+
+_LISTING_BASE = """🏠 Сдается 2-bedroom apartment в Brooklyn, Sheepshead Bay
+📍 Адрес: 2710 Ocean Ave, Brooklyn, NY 11229
+💵 Цена: $2,650/месяц, депозит 1 месяц, broker fee 1 месяц
+🛏 2 спальни, 1 ванная, гостиная, кухня с посудомойкой
+🚇 Рядом метро B/Q (Sheepshead Bay), 5 минут пешком
+🐶 Pets: cats ok, small dogs case by case
+👶 С детьми можно
+📦 Заселение с 1 мая, минимальный срок аренды 12 месяцев
+🧺 Прачечная в здании, heat & hot water included
+Requirements: credit score 650+, income 40x rent, employment letter, 2 recent paystubs.
+Guarantors accepted (income 80x rent). Showing today after 6pm or tomorrow 10:00-14:00.
+Контакт: пишите в Telegram, ответим сегодня. Не звоните после 21:00.
+"""
+
+LISTINGS: List[str] = [
+    _LISTING_BASE,
+    _LISTING_BASE * 4,
+    (_LISTING_BASE.replace("Brooklyn", "Queens").replace("2,650", "3,100") + "\n") * 10,
+]
+
+
+def message_stream(n: int, seed: int = 7) -> List[str]:
+    """n messages: mostly short replies, ~5% long forwarded listings."""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if rnd.random() < 0.05:
+            out.append(rnd.choice(LISTINGS))
+        else:
+            out.append(rnd.choice(MESSAGES))
+    return out
+
+
+# Whole conversations as a client types them (for decide_reply / lead flow benchmarks).
+DIALOGS: List[List[str]] = [
+    ["Здравствуйте! Квартира ещё свободна?", "нас двое, заселение 1 мая", "Работаю программистом", "завтра в 19:00"],
+    ["Hi, is it still available?", "2 people, move in asap", "software engineer at a bank", "today after 6pm"],
+    ["Добрый день", "Нас трое", "через 2 недели", "Я медсестра, муж водитель", "сегодня после 8"],
+    ["Сколько стоит?", "Какой депозит?", "нас 2, 1 мая", "Студентка, учусь в NYU", "в любое время", "после 9 вечера"],
+    ["нас двое, заселение сегодня, показ завтра в 7 вечера", "работаем оба", "завтра в 7 вечера"],
+    ["just me, asap please", "nurse", "tomorrow at 7 pm"],
+    ["Можно с собакой?", "?", "ок", "я одна, хочу заселиться завтра", "Работаю в IT", "Показ сегодня в 19.45"],
+]
@@ -0,0 +1,362 @@
+"""
+Microbenchmarks of the hot paths, with JSON baselines and a regression gate.
+
+    python -m bench.suite                                   # run everything, print a table
+    python -m bench.suite --only extract decide             # cases whose name contains any of these
+    python -m bench.suite --save bench/baseline.json        # store results as the baseline
+    python -m bench.suite --compare bench/baseline.json     # exit 1 if a case got slower than --threshold
+
+Every case times single operations (perf_counter_ns around each call) over the corpus in
+bench/corpus.py with fixed seeds, and reports ops/sec plus p50/p99 latency. Each case runs
+--rounds times and the fastest round counts, which keeps one noisy round from failing the gate.
+Baselines are machine-specific: regenerate them on the machine that runs --compare.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+os.environ.setdefault("LEADS_CHAT_ID", "-1")
+
+from bench.corpus import DIALOGS, LISTINGS, message_stream  # noqa: E402
+
+# name -> fn(n) -> per-op nanoseconds
+Case = Callable[[int], List[int]]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def deco(fn: Case) -> Case:
+        CASES[name] = fn
+        return fn
+
+    return deco
+
+
+def _time_each(fn: Callable[[Any], Any], args: List[Any]) -> List[int]:
+    clock = time.perf_counter_ns
+    out = []
+    for a in args:
+        t = clock()
+        fn(a)
+        out.append(clock() - t)
+    return out
+
+
+async def _time_each_async(fn: Callable[[Any], Awaitable[Any]], args: List[Any]) -> List[int]:
+    clock = time.perf_counter_ns
+    out = []
+    for a in args:
+        t = clock()
+        await fn(a)
+        out.append(clock() - t)
+    return out
+
+
+# ---------- app.utils ----------
+
+@case("utils.extract_people_count")
+def _(n: int) -> List[int]:
+    from app.utils import extract_people_count
+
+    return _time_each(extract_people_count, message_stream(n, seed=1))
+
+
+@case("utils.extract_move_in")
+def _(n: int) -> List[int]:
+    from app.utils import extract_move_in
+
+    return _time_each(extract_move_in, message_stream(n, seed=2))
+
+
+@case("utils.extract_showing_time")
+def _(n: int) -> List[int]:
+    from app.utils import extract_showing_time
+
+    return _time_each(extract_showing_time, message_stream(n, seed=3))
+
+
+@case("utils.extract_all[listing]")
+def _(n: int) -> List[int]:
+    from app.utils import extract_all
+
+    rnd = random.Random(4)
+    return _time_each(extract_all, [rnd.choice(LISTINGS) for _ in range(max(1, n // 20))])
+
+
+# ---------- app.lead_logic ----------
+
+def _dialog_steps(n: int) -> List[Tuple[bool, str]]:
+    """n messages as (starts a new lead, text), whole dialogs one after another."""
+    rnd = random.Random(5)
+    steps: List[Tuple[bool, str]] = []
+    while len(steps) < n:
+        for i, text in enumerate(rnd.choice(DIALOGS)):
+            steps.append((i == 0, text))
+    return steps[:n]
+
+
+@case("lead_logic.decide_reply")
+def _(n: int) -> List[int]:
+    from app.lead_logic import Q1, decide_reply
+    from app.models import LeadState
+
+    # leads are created outside the timed call; only decide_reply is measured
+    pairs = []
+    lead = None
+    for new, text in _dialog_steps(n):
+        if new or lead is None:
+            lead = LeadState(chat_id=1, user_id=1, last_question=Q1)
+        pairs.append((lead, text))
+    return _time_each(lambda p: decide_reply(p[0], p[1]), pairs)
+
+
+@case("lead_logic.next_question")
+def _(n: int) -> List[int]:
+    from app.lead_logic import decide_reply, next_question, Q1
+    from app.models import LeadState
+
+    leads = []
+    lead = None
+    for new, text in _dialog_steps(n):
+        if new or lead is None:
+            lead = LeadState(chat_id=1, user_id=1, last_question=Q1)
+        decide_reply(lead, text)
+        leads.append(LeadState.from_dict(lead.to_dict()))  # a frozen copy of every stage
+    return _time_each(next_question, leads)
+
+
+# ---------- app.models ----------
+
+def _sample_leads(n: int) -> List[Any]:
+    from app.models import LeadState
+
+    rnd = random.Random(6)
+    out = []
+    for i in range(n):
+        lead = LeadState(chat_id=i, user_id=i, username=f"user{i}", first_name="Имя")
+        if rnd.random() < 0.7:
+            lead.people_count = rnd.randint(1, 5)
+            lead.move_in = rnd.choice(["1 May", "ASAP", "через 2 недель"])
+        if rnd.random() < 0.5:
+            lead.employment = "Работаю программистом"
+            lead.showing_text = "завтра в 19:00"
+            lead.showing_time = "tomorrow 19:00"
+        lead.touch()
+        out.append(lead)
+    return out
+
+
+@case("models.to_dict")
+def _(n: int) -> List[int]:
+    return _time_each(lambda lead: lead.to_dict(), _sample_leads(n))
+
+
+@case("models.from_dict")
+def _(n: int) -> List[int]:
+    from app.models import LeadState
+
+    return _time_each(LeadState.from_dict, [lead.to_dict() for lead in _sample_leads(n)])
+
+
+def _codec_case(name: str) -> Case:
+    def run(n: int) -> List[int]:
+        from app.codec import get_codec
+
+        c = get_codec(name)
+        return _time_each(lambda lead: c.loads(c.dumps(lead)), _sample_leads(n))
+
+    return run
+
+
+# a full round trip: what save_lead (dumps) plus a load of an unflushed lead (loads) cost
+CASES["models.codec[marshal]"] = _codec_case("marshal")
+CASES["models.codec[json]"] = _codec_case("json")
+
+
+# ---------- app.db (temp SQLite file) ----------
+
+def _db_case(body: Callable[[Any, int], Awaitable[List[int]]], write_behind: int = 1) -> Callable[[int], List[int]]:
+    def run(n: int) -> List[int]:
+        async def go() -> List[int]:
+            from app import db
+            from app.config import settings
+
+            with tempfile.TemporaryDirectory() as td:
+                settings.SQLITE_PATH = os.path.join(td, "bench.sqlite3")
+                settings.DB_WRITE_BEHIND = write_behind
+                await db.init_db()
+                try:
+                    return await body(db, n)
+                finally:
+                    await db.close_db()
+
+        return asyncio.run(go())
+
+    return run
+
+
+_DB_CHATS = 1000
+
+
+async def _seed(db: Any) -> List[Any]:
+    leads = _sample_leads(_DB_CHATS)
+    for lead in leads:
+        await db.save_lead(lead)
+    await db.writer.flush()
+    return leads
+
+
+async def _save_body(db: Any, n: int) -> List[int]:
+    leads = await _seed(db)
+    rnd = random.Random(7)
+    picked = [rnd.choice(leads) for _ in range(n)]
+
+    async def save(lead: Any) -> None:
+        lead.stuck_count += 1  # dirty, so the save is not skipped
+        await db.save_lead(lead)
+
+    return await _time_each_async(save, picked)
+
+
+async def _load_body(db: Any, n: int, cached: bool) -> List[int]:
+    from app.config import settings
+
+    await _seed(db)
+    if not cached:
+        db.lead_cache.clear()
+        db.lead_cache.max_items = 0  # every load is a SELECT
+    rnd = random.Random(8)
+    try:
+        return await _time_each_async(db.load_lead, [rnd.randrange(_DB_CHATS) for _ in range(n)])
+    finally:
+        db.lead_cache.max_items = settings.LEAD_CACHE_SIZE
+
+
+CASES["db.save_lead[write-behind]"] = _db_case(_save_body)
+CASES["db.save_lead[commit]"] = _db_case(_save_body, write_behind=0)
+CASES["db.load_lead[cached]"] = _db_case(lambda db, n: _load_body(db, n, cached=True))
+CASES["db.load_lead[select]"] = _db_case(lambda db, n: _load_body(db, n, cached=False))
+
+async def _listing_body(db: Any, n: int) -> List[int]:
+    from app import listings
+    from bench.corpus import MESSAGES
+
+    ids = [await listings.ingest(text, "forward") for text in LISTINGS]
+    for i in range(200):  # other listings in the index
+        await listings.ingest(f"Studio #{i}, {1000 + i} Grand Concourse Ave, Bronx. ${1500 + i}/month, no pets.", "forward")
+    rnd = random.Random(9)
+    pairs = [(rnd.choice(ids), rnd.choice(MESSAGES)) for _ in range(n)]
+    return await _time_each_async(lambda p: listings.context(p[0], p[1]), pairs)
+
+
+CASES["listings.context"] = _db_case(_listing_body)
+
+# fsync-bound / SQLite round-trip cases run fewer ops to keep the suite short
+_OPS_SCALE = {"db.save_lead[commit]": 0.05, "listings.context": 0.1}
+
+
+# ---------- runner ----------
+
+def _pct(sorted_ns: List[int], p: float) -> float:
+    i = min(len(sorted_ns) - 1, max(0, int(round(p / 100 * (len(sorted_ns) - 1)))))
+    return sorted_ns[i] / 1000.0
+
+
+def measure(name: str, n: int, rounds: int) -> Dict[str, Any]:
+    best: Optional[Dict[str, Any]] = None
+    ops = max(20, int(n * _OPS_SCALE.get(name, 1.0)))
+    for _ in range(rounds):
+        gc.collect()
+        samples = CASES[name](ops)
+        total = sum(samples)
+        s = sorted(samples)
+        r = {
+            "n": len(samples),
+            "ops_per_sec": round(len(samples) / (total / 1e9), 1) if total else 0.0,
+            "p50_us": round(_pct(s, 50), 2),
+            "p99_us": round(_pct(s, 99), 2),
+        }
+        if best is None or r["ops_per_sec"] > best["ops_per_sec"]:
+            best = r
+    return best
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    """Names of cases whose ops/sec fell more than threshold below the baseline."""
+    failed = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("ops_per_sec"):
+            continue
+        ratio = r["ops_per_sec"] / base["ops_per_sec"]
+        r["vs_baseline"] = round(ratio, 3)
+        if ratio < 1.0 - threshold:
+            failed.append(name)
+    return failed
+
+
+def _print(results: Dict[str, Dict[str, Any]], failed: List[str]) -> None:
+    print(f"{'case':<34} {'ops/sec':>12} {'p50 us':>9} {'p99 us':>9} {'vs base':>8}")
+    for name, r in results.items():
+        vs = f"x{r['vs_baseline']:.2f}" if "vs_baseline" in r else ""
+        mark = "  REGRESSION" if name in failed else ""
+        print(f"{name:<34} {r['ops_per_sec']:>12,.0f} {r['p50_us']:>9.2f} {r['p99_us']:>9.2f} {vs:>8}{mark}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Hot-path microbenchmarks")
+    ap.add_argument("--ops", type=int, default=20000, help="operations per case and round")
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--only", nargs="*", default=None, help="substrings of case names")
+    ap.add_argument("--save", help="write results to this baseline file")
+    ap.add_argument("--compare", help="baseline file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed ops/sec drop, 0.25 = 25%%")
+    args = ap.parse_args()
+
+    names = [n for n in CASES if not args.only or any(s in n for s in args.only)]
+    results = {}
+    for name in names:
+        results[name] = measure(name, args.ops, args.rounds)
+        print(f"  {name}: {results[name]['ops_per_sec']:,.0f} ops/sec", file=sys.stderr)
+
+    failed: List[str] = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            failed = compare(results, json.load(f)["results"], args.threshold)
+    _print(results, failed)
+
+    if args.save:
+        doc = {
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": f"{platform.system()} {platform.machine()}",
+                "ops": args.ops,
+                "rounds": args.rounds,
+            },
+            "results": {k: {f: v for f, v in r.items() if f != "vs_baseline"} for k, r in results.items()},
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.save}")
+
+    if failed:
+        print(f"FAILED: {len(failed)} case(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,140 @@
 import asyncio
-from app.bot import build_dispatcher, build_bot
-from app.db import init_db
+import signal
+from app.bot import build_dispatcher, build_bot, start_outbox, start_reminders
+from app.cache import llm_cache
+from app.config import settings
+from app.db import close_db, init_db
+from app.mailbox import mailboxes
+from app.outbox import outbox
+from app.pacing import pacer
+from app.reminders import reminders
+from app.retention import maintenance
+from app.server import BotServer
+from app.shards import ShardRouter, poll_into
+from app.tenants import tenants
 
 
-async def main() -> None:
-    await init_db()
+def _install_signal_handlers(stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+
+async def _set_webhook(bot, allowed_updates) -> None:
+    try:
+        await bot.set_webhook(
+            settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET or None,
+            allowed_updates=allowed_updates,
+        )
+    except Exception as e:
+        # keep serving: a webhook registered by the previous deploy still delivers here
+        print(f"[startup] set_webhook failed: {type(e).__name__}: {e}")
+
+
+def _webhook_mode() -> bool:
+    webhook = settings.RUN_MODE.lower() == "webhook"
+    if webhook and not settings.WEBHOOK_BASE_URL:
+        print("[startup] RUN_MODE=webhook but WEBHOOK_BASE_URL is empty -> falling back to polling")
+        webhook = False
+    return webhook
+
+
+async def run_sharded() -> None:
+    """WORKERS > 1: this process only receives updates and routes them to worker processes by chat_id."""
+    await init_db()  # migrations run once, here, before workers connect
+    await llm_cache.purge_expired()
+    await close_db()
     bot = build_bot()
+    webhook = _webhook_mode()
+    stop = asyncio.Event()
+    _install_signal_handlers(stop)
+
+    router = ShardRouter(settings.WORKERS)
+    router.start()
+    server = BotServer(bot, None, webhook=webhook, router=router)
+    await server.start()
+    allowed = build_dispatcher(bot).resolve_used_update_types()
 
-    # На всякий случай убираем webhook, чтобы polling точно получал апдейты
+    polling = None
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-    except Exception:
-        pass
+        if webhook:
+            await _set_webhook(bot, allowed)
+        else:
+            try:
+                await bot.delete_webhook(drop_pending_updates=True)
+            except Exception:
+                pass
+            polling = asyncio.create_task(poll_into(bot, router, stop, allowed))
+        await stop.wait()
+    finally:
+        print("[shutdown] draining workers")
+        server.draining = True
+        if polling is not None:
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+        await router.stop(settings.SHUTDOWN_TIMEOUT_SECONDS)
+        await server.stop()
+        await close_db()
+        await bot.session.close()
 
+
+async def main() -> None:
+    if settings.WORKERS > 1:
+        await run_sharded()
+        return
+
+    await init_db()
+    await llm_cache.purge_expired()
+    await tenants.start()
+    bot = build_bot()
     dp = build_dispatcher(bot)
-    await dp.start_polling(bot)
+
+    webhook = _webhook_mode()
+    stop = asyncio.Event()
+    _install_signal_handlers(stop)
+
+    server = BotServer(bot, dp, webhook=webhook)
+    await server.start()
+    await start_reminders(bot)
+    start_outbox(bot)
+    maintenance.start()
+
+    polling = None
+    try:
+        if webhook:
+            await _set_webhook(bot, dp.resolve_used_update_types())
+        else:
+            # На всякий случай убираем webhook, чтобы polling точно получал апдейты
+            try:
+                await bot.delete_webhook(drop_pending_updates=True)
+            except Exception:
+                pass
+            polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+            polling.add_done_callback(lambda _t: stop.set())
+        await stop.wait()
+    finally:
+        # graceful drain: stop intake, answer what we already accepted, flush the DB
+        print("[shutdown] draining")
+        if polling is not None:
+            try:
+                await dp.stop_polling()
+            except RuntimeError:
+                pass  # polling already stopped
+            await asyncio.gather(polling, return_exceptions=True)
+        await server.drain()
+        await pacer.drain()
+        await mailboxes.drain()
+        await reminders.stop()
+        await outbox.stop()
+        await maintenance.stop()
+        await tenants.stop()
+        await server.stop()
+        await close_db()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,5 @@
 #!/usr/bin/env bash
 set -e
 
-# стартуем веб-порт для Render
-python web.py &
-
-# стартуем бота
-python main.py
+# один процесс: бот + health/webhook HTTP на $PORT (см. RUN_MODE)
+exec python main.py
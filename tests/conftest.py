@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# app.config reads the environment at import: a throwaway DB and no real Telegram chat
+_tmp = tempfile.mkdtemp(prefix="leadbot-tests-")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("LEADS_CHAT_ID", "-100500")
+os.environ["SQLITE_PATH"] = os.path.join(_tmp, "test.sqlite3")
+os.environ["ARCHIVE_DIR"] = os.path.join(_tmp, "archive")
+os.environ["REMINDER_MINUTES"] = "0"
+os.environ["LLM_MODE"] = "off"
+os.environ["OPENAI_API_KEY"] = ""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools")]
@@ -0,0 +1,61 @@
+import asyncio
+
+from aiohttp import web
+
+from app.bot import build_bot, build_dispatcher
+from app.config import settings
+from app.db import close_db, init_db, iter_events
+from app.lead_logic import Q1, Q2
+from app.pacing import pacer
+from fake_telegram import FakeTelegram
+
+
+async def _conversation(monkeypatch, *texts: str, chat_id: int = 4242, sent_ago: tuple = (), out: list = None) -> list:
+    """
+    Feed texts from one private chat inside one reply window; the bot's messages to that chat.
+    sent_ago: per text, how many seconds ago the client sent it; out: receives the chat's "out" events.
+    """
+    fake = FakeTelegram()
+    sent = []
+    fake.on_send = lambda method, to, text, bc: sent.append(text) if method == "sendMessage" and to == chat_id else None
+    runner = web.AppRunner(fake.build_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(settings, "TELEGRAM_API_BASE", f"http://127.0.0.1:{port}")
+
+    await init_db()
+    bot = build_bot()
+    dp = build_dispatcher(bot)
+    try:
+        for n, text in enumerate(texts, start=1):
+            update = {"update_id": n, **FakeTelegram.message_update(chat_id, n, text)}
+            if n <= len(sent_ago):
+                update["message"]["date"] -= sent_ago[n - 1]
+            await dp.feed_raw_update(bot, update)
+        await pacer.drain()  # fire the open window now instead of after the humanlike delay
+        if out is not None:
+            out += [e["data"] async for e in iter_events() if e["chat_id"] == chat_id and e["kind"] == "out"]
+    finally:
+        await close_db()
+        await bot.session.close()
+        await runner.cleanup()
+    return sent
+
+
+def test_start_then_immediate_answer(monkeypatch):
+    # the answer lands in /start's reply window: it answers Q1, it is not dropped
+    assert asyncio.run(_conversation(monkeypatch, "/start", "нас двое, заселение 1 мая")) == [Q2]
+
+
+def test_start_alone_asks_q1(monkeypatch):
+    assert asyncio.run(_conversation(monkeypatch, "/start")) == [Q1]
+
+
+def test_reply_latency_counts_from_the_first_message(monkeypatch):
+    out = []
+    sent = asyncio.run(_conversation(monkeypatch, "привет", "нас двое, заселение 1 мая", chat_id=4343, sent_ago=(30, 1), out=out))
+    assert sent == [Q2]
+    # the burst started 30 s ago: measured from the first message, not the last one merged
+    assert len(out) == 1 and out[0]["latency"] >= 30
@@ -0,0 +1,230 @@
+import asyncio
+
+import pytest
+
+from app.db import close_db, get_db, init_db, save_lead, writer
+from app.models import LeadState
+
+
+async def _count(sql: str, *params) -> int:
+    db = await get_db()
+    cur = await db.execute(sql, params)
+    n = (await cur.fetchone())[0]
+    await cur.close()
+    return n
+
+
+def test_transaction_rollback_keeps_queued_saves():
+    async def run():
+        await init_db()
+        try:
+            await save_lead(LeadState(chat_id=9001, user_id=9001))
+            with pytest.raises(RuntimeError):
+                async with writer.transaction() as db:
+                    await db.execute("INSERT INTO archived_leads(chat_id, segment, archived_at) VALUES(9001, 'x', 0)")
+                    raise RuntimeError("boom")
+            # the save queued before the transaction was flushed first, the failed write is gone
+            assert await _count("SELECT COUNT(*) FROM leads WHERE chat_id = 9001") == 1
+            assert await _count("SELECT COUNT(*) FROM archived_leads WHERE chat_id = 9001") == 0
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_flush_and_transactions_interleave_cleanly():
+    async def run():
+        await init_db()
+        try:
+            async def direct(i: int) -> None:
+                async with writer.transaction() as db:
+                    await db.execute(
+                        "INSERT OR REPLACE INTO archived_leads(chat_id, segment, archived_at) VALUES(?, 'x', 0)", (i,)
+                    )
+                    await asyncio.sleep(0)  # give a flush the chance to run in between
+
+            async def saves() -> None:
+                for i in range(500):
+                    await save_lead(LeadState(chat_id=10_000 + i, user_id=i))
+                    if i % 50 == 0:
+                        await asyncio.sleep(0)
+
+            await asyncio.gather(saves(), *(direct(20_000 + i) for i in range(50)), writer.flush())
+            await writer.flush()
+            assert await _count("SELECT COUNT(*) FROM leads WHERE chat_id BETWEEN 10000 AND 10499") == 500
+            assert await _count("SELECT COUNT(*) FROM archived_leads WHERE chat_id BETWEEN 20000 AND 20049") == 50
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_restore_keeps_events_when_their_ids_were_reused(tmp_path, monkeypatch):
+    from app.archive import write_segment
+    from app.config import settings
+    from app.db import chat_history, delete_archived, lead_cache, load_lead, log_event
+
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+
+    async def run():
+        await init_db()
+        try:
+            db = await get_db()
+            await db.execute("DELETE FROM events")
+            await db.commit()
+            lead = LeadState(chat_id=777, user_id=777)
+            await save_lead(lead)
+            for i in range(3):
+                await log_event(777, "in", text=f"old {i}")
+            await writer.flush()
+            events, handoffs = await chat_history([777])
+            write_segment(str(tmp_path), "seg.jsonl.gz", [
+                {"chat_id": 777, "archived_at": 0, "lead": lead.to_dict(), "events": events[777], "handoff": None}
+            ])
+            assert await delete_archived([(777, lead.updated_at, events[777][-1]["id"], None)], "seg.jsonl.gz") == [777]
+            for i in range(3):  # SQLite hands the freed rowids to these
+                await log_event(778, "in", text=f"new {i}")
+            await writer.flush()
+            lead_cache.clear()
+
+            assert (await load_lead(777)) is not None
+            assert await _count("SELECT COUNT(*) FROM events WHERE chat_id = 777") == 3
+            assert await _count("SELECT COUNT(*) FROM events WHERE chat_id = 778") == 3
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_failed_flush_keeps_counter_increments(monkeypatch):
+    import sqlite3
+
+    from app.db import bump_stats, read_stats
+
+    async def run():
+        await init_db()
+        try:
+            db = await get_db()
+            commit = db.commit
+
+            async def failing_commit():
+                monkeypatch.setattr(db, "commit", commit)
+                await bump_stats("test", {"bumps": 2})  # arrives while the flush is in flight
+                raise sqlite3.OperationalError("disk I/O error")
+
+            await bump_stats("test", {"bumps": 3})
+            monkeypatch.setattr(db, "commit", failing_commit)
+            with pytest.raises(sqlite3.OperationalError):
+                await writer.flush()
+            await bump_stats("test", {"bumps": 4})
+            assert (await read_stats(["test"]))["test"] == {"bumps": 9}
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_concurrent_loads_restore_an_archived_lead_once(tmp_path, monkeypatch):
+    from app.archive import write_segment
+    from app.config import settings
+    from app.db import chat_history, delete_archived, lead_cache, load_lead, log_event, read_stats
+    from app.lead_logic import Q1
+
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+
+    async def run():
+        await init_db()
+        try:
+            lead = LeadState(chat_id=779, user_id=779, last_question=Q1)
+            await save_lead(lead)
+            for i in range(3):
+                await log_event(779, "in", text=f"msg {i}")
+            await writer.flush()
+            before = (await read_stats(["*"]))["*"].get("leads:q1", 0)
+            events, _ = await chat_history([779])
+            write_segment(str(tmp_path), "seg.jsonl.gz", [
+                {"chat_id": 779, "archived_at": 0, "lead": lead.to_dict(), "events": events[779], "handoff": None}
+            ])
+            assert await delete_archived([(779, lead.updated_at, events[779][-1]["id"], "q1")], "seg.jsonl.gz") == [779]
+            lead_cache.clear()
+
+            # two updates of the returning client load the lead at the same time
+            a, b = await asyncio.gather(load_lead(779), load_lead(779))
+            assert a is not None and b is not None and a.chat_id == b.chat_id == 779
+            assert await _count("SELECT COUNT(*) FROM events WHERE chat_id = 779") == 3
+            assert await _count("SELECT COUNT(*) FROM archived_leads WHERE chat_id = 779") == 0
+            assert (await read_stats(["*"]))["*"].get("leads:q1", 0) == before
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+async def _columns(table: str) -> list:
+    db = await get_db()
+    cur = await db.execute(f"PRAGMA table_info({table})")
+    cols = [r["name"] for r in await cur.fetchall()]
+    await cur.close()
+    return cols
+
+
+async def _user_version(value: int = None) -> int:
+    db = await get_db()
+    if value is not None:
+        await db.execute(f"PRAGMA user_version={value}")
+        await db.commit()
+    cur = await db.execute("PRAGMA user_version")
+    version = (await cur.fetchone())[0]
+    await cur.close()
+    return version
+
+
+def test_migrations_from_an_older_version(tmp_path, monkeypatch):
+    from app.config import settings
+    from app.db import _MIGRATIONS, load_lead
+
+    monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "old.sqlite3"))
+
+    async def run():
+        try:
+            # a file from before the listing store: migrations 1..5 only
+            db = await get_db()
+            for migrate in _MIGRATIONS[:5]:
+                await migrate(db)
+            await db.commit()
+            await _user_version(5)
+            await db.execute("INSERT INTO leads(chat_id, user_id, people_count) VALUES(31, 31, 2)")
+            await db.commit()
+            assert "listing_id" not in await _columns("leads") and "dest" not in await _columns("handoffs")
+
+            await init_db()
+            assert await _user_version() == len(_MIGRATIONS)
+            assert "listing_id" in await _columns("leads") and "dest" in await _columns("handoffs")
+            assert (await load_lead(31)).people_count == 2
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_migrations_rerun_over_added_columns(tmp_path, monkeypatch):
+    from app.config import settings
+    from app.db import _MIGRATIONS
+
+    monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "rerun.sqlite3"))
+
+    async def run():
+        try:
+            await init_db()
+            # ALTER TABLE commits before user_version is bumped: a start interrupted right after
+            # migration 6's or 9's ADD COLUMN runs that migration again over the added column
+            for version in (5, 8):
+                await _user_version(version)
+                await init_db()
+                assert await _user_version() == len(_MIGRATIONS)
+                assert (await _columns("leads")).count("listing_id") == 1
+                assert (await _columns("handoffs")).count("dest") == 1
+        finally:
+            await close_db()
+
+    asyncio.run(run())
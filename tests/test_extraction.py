@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from app.utils import extract_all
+from bench import legacy_utils
+from bench.bench_extraction import GOLDEN
+
+with open(GOLDEN, encoding="utf-8") as f:
+    _GOLDEN = json.load(f)
+
+# word boundaries around the literal-prefixed patterns (searched without a leading \b)
+_EDGE = [
+    "нас двое",
+    "ананас двое",
+    "ананас нас трое",
+    "нас:3",
+    "ананас 3, нас 4",
+    "_нас 2",
+    "НАС ЧЕТВЕРО, заселение 5 мая",
+    "2 people, move in asap",
+    "people: 3 tomorrow at 6pm",
+    "через 2 недели, показ в 18.30",
+]
+
+
+def _legacy(text):
+    return (
+        legacy_utils.extract_people_count(text),
+        legacy_utils.extract_move_in(text),
+        legacy_utils.extract_showing_time(text),
+    )
+
+
+@pytest.mark.parametrize("row", _GOLDEN, ids=lambda r: r["text"][:40])
+def test_golden(row):
+    assert tuple(extract_all(row["text"])) == (row["people_count"], row["move_in"], row["showing_time"])
+
+
+@pytest.mark.parametrize("text", _EDGE)
+def test_same_as_legacy(text):
+    assert tuple(extract_all(text)) == _legacy(text)
@@ -0,0 +1,49 @@
+import asyncio
+
+from app import listings
+from app.db import close_db, init_db
+
+POST = "2-bedroom apartment, Sheepshead Bay\n245 Main Street, Brooklyn, NY 11229\n$2,650/month, deposit 1 month, cats ok"
+OTHER = "Studio in Astoria, 31-15 Ditmars Blvd, Queens. $1,900/month, no pets, laundry in the building."
+# bm25 weighs words by how rare they are across the store: a realistic store has more than two listings
+FILLER = [f"1-bedroom, {100 + i} Grand Concourse, Bronx. ${1500 + i}/month, pets ok, near the train." for i in range(8)]
+
+
+async def _with_listings(check) -> None:
+    await init_db()
+    try:
+        ids = [await listings.ingest(text, "forward") for text in (POST, OTHER, *FILLER)]
+        await check(*ids[:2])
+    finally:
+        await close_db()
+
+
+def test_address_resolves_to_its_listing():
+    async def check(main_st: int, ditmars: int) -> None:
+        assert await listings.resolve("245 Main St") == main_st  # suffix spelled either way
+        assert await listings.resolve("the one at 31-15 Ditmars Boulevard?") == ditmars
+        assert await listings.resolve("the studio in Astoria") == ditmars
+
+    asyncio.run(_with_listings(check))
+
+
+def test_near_miss_address_resolves_to_nothing():
+    async def check(main_st: int, ditmars: int) -> None:
+        assert await listings.resolve("123 Main St") is None  # same street, other house
+        assert await listings.resolve("245 Main Ave") is None  # same number, other street
+        assert await listings.resolve("123 main street") is None
+        assert await listings.resolve("pets?") is None  # a word every listing has
+
+    asyncio.run(_with_listings(check))
+
+
+def test_sentence_with_a_number_is_not_an_address():
+    assert listings.find_address("We are 2 people from the same place") is None
+    assert listings.find_address("нас 2, заселение 1 мая, работаем в Brooklyn") is None
+    assert listings.find_address("It's 2710 Ocean Ave, Brooklyn") == "2710 Ocean Ave"
+    assert listings.find_address("what about 123 main st.?") == "123 main st."
+
+    async def check(main_st: int, ditmars: int) -> None:
+        assert await listings.ingest_message("We are 2 people from the same place", forwarded=False) is None
+
+    asyncio.run(_with_listings(check))
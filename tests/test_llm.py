@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from aiohttp.test_utils import TestServer
+
+from app.cache import llm_cache
+from app.config import settings
+from app.llm import LLMClient
+from stub_openai import build_app
+
+STATE = {"people_count": None, "move_in": None, "last_question": None}
+
+
+async def _with_stub(monkeypatch, delay: float, check) -> dict:
+    """Run check(client) against tools/stub_openai.py on a free port; the stub's stats."""
+    server = TestServer(build_app(delay))
+    await server.start_server()
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", f"http://127.0.0.1:{server.port}/v1")
+    client = LLMClient()
+    try:
+        await check(client)
+    finally:
+        await client._get_client().close()
+        await server.close()
+    return server.app["stats"]
+
+
+def _no_cache(monkeypatch) -> None:
+    # every call reaches the stub
+    monkeypatch.setattr(llm_cache, "ttl", 0)
+    monkeypatch.setattr(llm_cache, "persist", False)
+
+
+def test_concurrency_is_capped(monkeypatch):
+    _no_cache(monkeypatch)
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 2)
+
+    async def check(client: LLMClient) -> None:
+        results = await asyncio.gather(*(client.extract(STATE, f"cap {i}", None, chat_id=i) for i in range(6)))
+        assert all(isinstance(r, dict) for r in results)
+
+    stats = asyncio.run(_with_stub(monkeypatch, 0.1, check))
+    assert stats["responses"] == 6
+    assert stats["max_inflight"] == 2
+
+
+def test_timeout_falls_back(monkeypatch):
+    _no_cache(monkeypatch)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_SECONDS", 0.2)
+
+    async def check(client: LLMClient) -> None:
+        t0 = time.perf_counter()
+        assert await client.extract(STATE, "timeout", None, chat_id=1) is None  # the rules' reply goes out
+        assert time.perf_counter() - t0 < 1.0
+
+    asyncio.run(_with_stub(monkeypatch, 2.0, check))
+
+
+def test_newer_message_abandons_the_chats_call(monkeypatch):
+    _no_cache(monkeypatch)
+
+    async def check(client: LLMClient) -> None:
+        async def timed(text: str, chat_id: int):
+            t0 = time.perf_counter()
+            return await client.extract(STATE, text, None, chat_id=chat_id), time.perf_counter() - t0
+
+        stale = asyncio.ensure_future(timed("old", 1))
+        other = asyncio.ensure_future(timed("other chat", 2))
+        await asyncio.sleep(0.05)
+        newer = asyncio.ensure_future(timed("new", 1))
+        (r_stale, t_stale), (r_other, _), (r_newer, _) = await asyncio.gather(stale, other, newer)
+        assert r_stale is None and t_stale < 0.3  # dropped when the newer call started, not after the stub answered
+        assert isinstance(r_other, dict)
+        assert isinstance(r_newer, dict)
+        assert not client._inflight
+
+    asyncio.run(_with_stub(monkeypatch, 0.5, check))
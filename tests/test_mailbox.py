@@ -0,0 +1,101 @@
+import asyncio
+import random
+
+from aiogram import Bot, Dispatcher
+
+from app.bot import _per_chat
+from app.config import settings
+from app.mailbox import mailboxes
+from fake_telegram import FakeTelegram
+
+
+def _dispatcher(handler) -> Dispatcher:
+    # the bot's per-chat middleware in front of a handler that records what it saw
+    dp = Dispatcher()
+    dp.update.outer_middleware(_per_chat)
+    dp.message()(handler)
+    return dp
+
+
+async def _feed(dp: Dispatcher, bot: Bot, updates) -> list:
+    return await asyncio.gather(*(dp.feed_raw_update(bot, u) for u in updates), return_exceptions=True)
+
+
+def _update(n: int, chat_id: int, text: str) -> dict:
+    return {"update_id": n, **FakeTelegram.message_update(chat_id, n, text)}
+
+
+def test_interleaved_chats_keep_order_and_lose_nothing():
+    async def run():
+        rnd = random.Random(5)
+        seen = {}
+
+        async def handler(message) -> None:
+            await asyncio.sleep(rnd.uniform(0, 0.003))  # load / LLM / send
+            seen.setdefault(message.chat.id, []).append(int(message.text))
+
+        bot = Bot(settings.TELEGRAM_BOT_TOKEN)
+        try:
+            updates = [_update(n, 700 + n % 8, str(n // 8)) for n in range(8 * 12)]  # round-robin over 8 chats
+            await _feed(_dispatcher(handler), bot, updates)
+        finally:
+            await bot.session.close()
+        assert seen == {700 + c: list(range(12)) for c in range(8)}
+        assert len(mailboxes) == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_job_keeps_the_rest_of_the_chat():
+    async def run():
+        seen = []
+
+        async def handler(message) -> None:
+            if message.text == "stale":
+                # what a superseded LLM call does to the reply in progress
+                asyncio.current_task().cancel()
+                await asyncio.sleep(0)
+            seen.append(message.text)
+
+        bot = Bot(settings.TELEGRAM_BOT_TOKEN)
+        try:
+            texts = ("a", "stale", "b", "c")
+            results = await _feed(_dispatcher(handler), bot, [_update(n, 800, t) for n, t in enumerate(texts)])
+        finally:
+            await bot.session.close()
+        assert seen == ["a", "b", "c"]
+        assert isinstance(results[1], asyncio.CancelledError)
+
+    asyncio.run(run())
+
+
+def test_full_mailbox_drops_the_newest_updates(monkeypatch):
+    monkeypatch.setattr(mailboxes, "max_pending", 3)
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+        seen = []
+
+        async def handler(message) -> None:
+            if message.chat.id == 900:
+                started.set()
+                await release.wait()
+            seen.append(int(message.text))
+
+        dp = _dispatcher(handler)
+        bot = Bot(settings.TELEGRAM_BOT_TOKEN)
+        dropped = mailboxes.dropped
+        try:
+            first = asyncio.ensure_future(dp.feed_raw_update(bot, _update(0, 900, "0")))
+            await started.wait()
+            rest = asyncio.ensure_future(_feed(dp, bot, [_update(n, 900, str(n)) for n in range(1, 10)]))
+            await _feed(dp, bot, [_update(10, 901, "10")])
+            assert seen == [10]  # another chat is not held up
+            release.set()
+            await asyncio.gather(first, rest)
+        finally:
+            await bot.session.close()
+        assert sorted(seen) == [0, 1, 2, 3, 10]  # the running one, 3 queued, the other chat
+        assert mailboxes.dropped - dropped == 6
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+import asyncio
+
+from app import nlu
+from app.lead_logic import Q1, Q2, Q3
+from app.llm import llm
+from app.models import LeadState
+
+
+def _llm(monkeypatch, answer=None) -> list:
+    """LLM tier on, extract() answering with answer; the list of texts it was asked about."""
+    asked = []
+
+    async def extract(state, text, passages, chat_id=None):
+        asked.append(text)
+        return answer
+
+    monkeypatch.setattr(llm, "available", True)
+    monkeypatch.setattr(llm, "extract", extract)
+    return asked
+
+
+def _lead(**fields) -> LeadState:
+    return LeadState(chat_id=1, user_id=1, **fields)
+
+
+def test_rules_progress_skips_the_llm(monkeypatch):
+    asked = _llm(monkeypatch)
+    lead = _lead(last_question=Q1)
+    r = asyncio.run(nlu.understand(lead, "нас двое, заселение 1 мая", use_llm=True))
+    assert r.tier == "rules" and r.next_q == Q2 and asked == []
+
+
+def test_stuck_rules_escalate_and_merge_updates(monkeypatch):
+    asked = _llm(monkeypatch, {"reply": "", "updates": {"people_count": 3, "move_in": "июнь", "pets": "кошка"}})
+    lead = _lead(last_question=Q1)
+    r = asyncio.run(nlu.understand(lead, "ну мы с женой и тёщей, летом где-то", use_llm=True))
+    assert asked and r.tier == "llm" and r.next_q == Q2
+    assert (lead.people_count, lead.move_in, lead.stuck_count) == (3, "июнь", 0)
+    assert lead.extras == {"pets": "кошка"}
+
+
+def test_listing_question_is_answered_without_moving_the_step(monkeypatch):
+    _llm(monkeypatch, {"reply": "Депозит — один месяц.", "updates": {}})
+    lead = _lead(people_count=2, move_in="1 мая", last_question=Q2)
+    r = asyncio.run(nlu.understand(lead, "Какой депозит?", use_llm=True))
+    assert r.tier == "llm" and r.reply.startswith("Депозит — один месяц.") and r.reply.endswith(Q2)
+    # the question was not taken as the answer to "where do you work"
+    assert lead.employment is None and lead.last_question == Q2
+    r = asyncio.run(nlu.understand(lead, "Я программист", use_llm=True))
+    assert lead.employment == "Я программист" and r.next_q == Q3
+
+
+def test_llm_failure_keeps_the_rules_reply(monkeypatch):
+    _llm(monkeypatch, None)
+    lead = _lead(last_question=Q1)
+    r = asyncio.run(nlu.understand(lead, "ммм", use_llm=True))
+    assert r.tier == "rules" and lead.stuck_count == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+from app.db import close_db, handoff_status, init_db
+from app.outbox import HandoffOutbox, pack_cards
+
+
+def _outbox(send) -> HandoffOutbox:
+    ob = HandoffOutbox(batch=50, digest_min=3, retry_base=0.1, retry_max=1.0, max_attempts=3)
+    ob._send = send  # run_once() by hand instead of the worker task
+    return ob
+
+
+def test_failed_card_is_retried_with_backoff():
+    async def run():
+        await init_db()
+        try:
+            calls = []
+
+            async def send(dest: int, text: str):
+                calls.append(text)
+                if len(calls) == 1:
+                    raise RuntimeError("group unavailable")
+                return 77
+
+            ob = _outbox(send)
+            await ob.enqueue(5101, "card 5101", dest=-100500)
+            assert await ob.run_once() == 0.0
+            st = await handoff_status(5101)
+            assert st["status"] == "pending" and st["attempts"] == 1 and "group unavailable" in st["last_error"]
+
+            wait = await ob.run_once()  # not due yet: the worker would sleep until next_at
+            assert 0.0 < wait <= 0.25 and len(calls) == 1
+            await asyncio.sleep(wait)
+            await ob.run_once()
+            st = await handoff_status(5101)
+            assert st["status"] == "sent" and st["attempts"] == 2 and st["message_id"] == 77
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_card_fails_after_max_attempts():
+    async def run():
+        await init_db()
+        try:
+            async def send(dest: int, text: str):
+                raise RuntimeError("chat not found")
+
+            ob = _outbox(send)
+            await ob.enqueue(5201, "card 5201", dest=-100500)
+            for _ in range(3):
+                await ob.run_once()
+                wait = await ob.run_once()
+                if wait:
+                    await asyncio.sleep(wait)
+            assert (await handoff_status(5201))["status"] == "failed"
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_burst_goes_out_as_digest():
+    async def run():
+        await init_db()
+        try:
+            sent = []
+
+            async def send(dest: int, text: str):
+                sent.append((dest, text))
+                return 90 + len(sent)
+
+            ob = _outbox(send)
+            for c in range(5301, 5306):
+                await ob.enqueue(c, f"card {c}", dest=-100600)
+            await ob.run_once()
+            assert len(sent) == 1 and all(f"card {c}" in sent[0][1] for c in range(5301, 5306))
+            for c in range(5301, 5306):
+                st = await handoff_status(c)
+                assert st["status"] == "sent" and st["message_id"] == 91
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+def test_pack_cards_splits_at_the_message_limit():
+    cards = [(i, "x" * 40) for i in range(5)]
+    packed = pack_cards(cards, limit=100)
+    assert [ids for _, ids in packed] == [[0, 1], [2, 3], [4]]
+    assert all(len(text) <= 100 for text, _ in packed)
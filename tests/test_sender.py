@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from app.sender import SendScheduler
+
+
+def _retry_after(seconds: int) -> TelegramRetryAfter:
+    return TelegramRetryAfter(SendMessage(chat_id=1, text="x"), "Too Many Requests", seconds)
+
+
+def test_per_chat_bucket_spaces_one_chat_only():
+    sched = SendScheduler(global_per_second=100, chat_per_second=10, group_per_minute=60, retries=0)
+    sent = []
+
+    async def run():
+        async def send(chat_id: int) -> None:
+            async def deliver() -> None:
+                sent.append((chat_id, time.monotonic()))
+
+            await sched.call(chat_id, deliver)
+
+        await asyncio.gather(*(send(1) for _ in range(3)), *(send(c) for c in range(2, 5)))
+
+    t0 = time.monotonic()
+    asyncio.run(run())
+    one = [t - t0 for c, t in sent if c == 1]
+    others = [t - t0 for c, t in sent if c != 1]
+    assert len(one) == 3 and one[2] >= 0.18  # 10/s: the third send waits two refills
+    assert max(others) < 0.05  # other chats have buckets of their own
+    assert sched.throttled == 2 and sched.sent == 6 and sched.queued == 0
+
+
+def test_retry_after_blocks_the_chat_and_requeues():
+    sched = SendScheduler(global_per_second=100, chat_per_second=100, group_per_minute=600, retries=2)
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise _retry_after(1)
+        return "ok"
+
+    assert asyncio.run(sched.call(5, flaky)) == "ok"
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= 0.95  # waited out retry_after
+    assert sched.retry_after == 1 and sched.failed == 0
+
+
+def test_retry_after_gives_up_after_the_retries():
+    sched = SendScheduler(global_per_second=100, chat_per_second=100, group_per_minute=600, retries=0)
+
+    async def always_429():
+        raise _retry_after(1)
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(sched.call(6, always_429))
+    assert sched.failed == 1 and sched.stats()["blocked_chats"] == 1
@@ -0,0 +1,48 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.config import settings
+from app.server import BotServer
+from fake_telegram import FakeTelegram
+
+
+async def _drain_waits_for_accepted_update() -> None:
+    release = asyncio.Event()
+    handled = []
+    dp = Dispatcher()
+
+    @dp.message()
+    async def slow(message) -> None:
+        await release.wait()
+        handled.append(message.text)
+
+    bot = Bot(settings.TELEGRAM_BOT_TOKEN)
+    server = BotServer(bot, dp, webhook=True)
+    client = TestClient(TestServer(server.build_app()))
+    await client.start_server()
+    try:
+        update = {"update_id": 1, **FakeTelegram.message_update(4242, 1, "привет")}
+        r = await client.post(settings.WEBHOOK_PATH, json=update)
+        assert r.status == 200  # answered before the handler finished
+        await asyncio.sleep(0.05)
+        assert server.queue_depths()["updates_in_flight"] == 1
+
+        drain = asyncio.create_task(server.drain())
+        await asyncio.sleep(0.05)
+        assert not drain.done()
+        r = await client.post(settings.WEBHOOK_PATH, json={**update, "update_id": 2})
+        assert r.status == 503  # Telegram re-delivers it to the next instance
+
+        release.set()
+        await asyncio.wait_for(drain, 5)
+        assert handled == ["привет"]
+        assert server.queue_depths()["updates_in_flight"] == 0
+    finally:
+        await client.close()
+        await bot.session.close()
+
+
+def test_drain_waits_for_accepted_update():
+    asyncio.run(_drain_waits_for_accepted_update())
@@ -0,0 +1,254 @@
+"""
+Local fake of the Telegram Bot API methods the bot uses, for end-to-end load tests.
+
+- getMe, getUpdates (long polling, offset confirms), deleteWebhook / setWebhook
+- sendMessage, sendChatAction (also with business_connection_id)
+- getFile and GET /file/bot<token>/<path> (--file-size bytes of noise)
+
+Every method answers after --latency seconds (± --jitter); send methods answer
+429 Too Many Requests with retry_after=--retry-after for a --rate-429 share of calls.
+Unknown methods get Telegram's 404 and are counted in /_fake/stats.
+
+Run:
+    python tools/fake_telegram.py --port 8081 --latency 0.03 --rate-429 0.01
+and point the bot at it:
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 RUN_MODE=polling python main.py
+
+Clients are simulated by pushing updates: POST /_fake/updates with one update (or a list;
+update_id is filled in when missing). GET /_fake/stats shows calls per method and the 429s.
+tools/load_telegram.py embeds this server (FakeTelegram) and drives thousands of clients.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 100500, "is_bot": True, "first_name": "Fake Bot", "username": "fake_lead_bot"}
+SEND_METHODS = frozenset({"sendmessage", "sendchataction"})
+
+# (method, chat_id, text or action, business_connection_id)
+SendHook = Callable[[str, int, Optional[str], Optional[str]], None]
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: int = 1,
+        file_size: int = 16 * 1024,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = max(0.0, latency)
+        self.jitter = max(0.0, jitter)
+        self.rate_429 = max(0.0, rate_429)
+        self.retry_after = max(1, retry_after)
+        self.file_size = max(0, file_size)
+        self.on_send: Optional[SendHook] = None
+        self._rnd = random.Random(seed)
+        self._updates: Deque[Dict[str, Any]] = deque()
+        self._next_update_id = 1
+        self._arrived: Optional[asyncio.Condition] = None
+        self._message_ids: Dict[int, int] = {}
+        self.polled = asyncio.Event()  # set on the first getUpdates: the bot is up
+        self.stats: Dict[str, Any] = {"calls": {}, "429": 0, "unknown": {}, "updates_pushed": 0, "updates_delivered": 0}
+
+    # ---------- simulated clients ----------
+
+    def push(self, update: Dict[str, Any]) -> int:
+        """Queue an update for getUpdates; returns its update_id."""
+        if "update_id" not in update:
+            update = {"update_id": self._next_update_id, **update}
+        self._next_update_id = max(self._next_update_id, update["update_id"]) + 1
+        self._updates.append(update)
+        self.stats["updates_pushed"] += 1
+        if self._arrived is not None:
+            asyncio.get_running_loop().create_task(self._notify())
+        return update["update_id"]
+
+    async def _notify(self) -> None:
+        async with self._arrived:
+            self._arrived.notify_all()
+
+    @staticmethod
+    def message_update(
+        chat_id: int,
+        message_id: int,
+        text: Optional[str] = None,
+        business_connection_id: Optional[str] = None,
+        voice_file_id: Optional[str] = None,
+        first_name: str = "Client",
+    ) -> Dict[str, Any]:
+        """A private-chat message (or business_message when business_connection_id is set) from chat_id."""
+        msg: Dict[str, Any] = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": first_name},
+            "from": {"id": chat_id, "is_bot": False, "first_name": first_name, "language_code": "ru"},
+        }
+        if text is not None:
+            msg["text"] = text
+        if voice_file_id is not None:
+            msg["voice"] = {"file_id": voice_file_id, "file_unique_id": voice_file_id, "duration": 3, "mime_type": "audio/ogg"}
+        if business_connection_id:
+            msg["business_connection_id"] = business_connection_id
+            return {"business_message": msg}
+        return {"message": msg}
+
+    # ---------- Bot API ----------
+
+    def _count(self, method: str) -> None:
+        calls = self.stats["calls"]
+        calls[method] = calls.get(method, 0) + 1
+
+    async def _delay(self) -> None:
+        d = self.latency + (self._rnd.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if d > 0:
+            await asyncio.sleep(d)
+
+    def _message(self, chat_id: int, text: str, business_connection_id: Optional[str]) -> Dict[str, Any]:
+        mid = self._message_ids.get(chat_id, 0) + 1
+        self._message_ids[chat_id] = mid
+        msg = {
+            "message_id": mid,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            "text": text,
+        }
+        if business_connection_id:
+            msg["business_connection_id"] = business_connection_id
+        return msg
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.polled.set()
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()  # confirmed by the offset
+        if not self._updates and timeout > 0:
+            async with self._arrived:
+                try:
+                    await asyncio.wait_for(self._arrived.wait_for(lambda: bool(self._updates)), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        batch = [u for _, u in zip(range(limit), self._updates)]
+        self.stats["updates_delivered"] += len(batch)
+        return batch
+
+    async def _call(self, method: str, params: Dict[str, Any]) -> web.Response:
+        m = method.lower()
+        self._count(method)
+        if m == "getupdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+
+        await self._delay()
+        if m in SEND_METHODS and self.rate_429 and self._rnd.random() < self.rate_429:
+            self.stats["429"] += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+
+        bc = params.get("business_connection_id") or None
+        if m == "getme":
+            result: Any = BOT_USER
+        elif m in ("deletewebhook", "setwebhook", "close", "logout"):
+            result = True
+        elif m == "sendmessage":
+            chat_id = int(params["chat_id"])
+            text = params.get("text") or ""
+            result = self._message(chat_id, text, bc)
+            if self.on_send is not None:
+                self.on_send("sendMessage", chat_id, text, bc)
+        elif m == "sendchataction":
+            if self.on_send is not None:
+                self.on_send("sendChatAction", int(params["chat_id"]), params.get("action"), bc)
+            result = True
+        elif m == "getfile":
+            file_id = params.get("file_id") or "file"
+            result = {"file_id": file_id, "file_unique_id": file_id, "file_size": self.file_size, "file_path": f"voice/{file_id}.ogg"}
+        elif m == "getbusinessconnection":
+            result = {
+                "id": bc or "bc-fake",
+                "user": {"id": 1, "is_bot": False, "first_name": "Owner"},
+                "user_chat_id": 1,
+                "date": int(time.time()),
+                "can_reply": True,
+                "is_enabled": True,
+            }
+        else:
+            unknown = self.stats["unknown"]
+            unknown[method] = unknown.get(method, 0) + 1
+            return web.json_response({"ok": False, "error_code": 404, "description": "Not Found: method not found"}, status=404)
+        return web.json_response({"ok": True, "result": result})
+
+    # ---------- HTTP ----------
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+
+        async def on_startup(_app: web.Application) -> None:
+            self._arrived = asyncio.Condition()
+
+        async def method(request: web.Request) -> web.Response:
+            if request.content_type == "application/json":
+                params = await request.json()
+            else:
+                params = dict(await request.post())
+            params.update(request.query)
+            return await self._call(request.match_info["method"], params)
+
+        async def download(request: web.Request) -> web.Response:
+            self._count("file")
+            await self._delay()
+            return web.Response(body=os.urandom(self.file_size), content_type="application/octet-stream")
+
+        async def push_updates(request: web.Request) -> web.Response:
+            body = await request.json()
+            ids = [self.push(u) for u in (body if isinstance(body, list) else [body])]
+            return web.json_response({"ok": True, "update_ids": ids})
+
+        async def stats(request: web.Request) -> web.Response:
+            return web.json_response({**self.stats, "queued_updates": len(self._updates)})
+
+        app.on_startup.append(on_startup)
+        app.router.add_route("*", "/bot{token}/{method}", method)
+        app.router.add_get("/file/bot{token}/{path:.+}", download)
+        app.router.add_post("/_fake/updates", push_updates)
+        app.router.add_get("/_fake/stats", stats)
+        return app
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds before every answer")
+    ap.add_argument("--jitter", type=float, default=0.0, help="± random seconds added to --latency")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="share of sends answered with 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--file-size", type=int, default=16 * 1024, help="bytes served for every file download")
+    args = ap.parse_args()
+    fake = FakeTelegram(args.latency, args.jitter, args.rate_429, args.retry_after, args.file_size)
+    fake.on_send = lambda method, chat_id, text, bc: print(f"[{method}] chat={chat_id} bc={bc} {json.dumps(text, ensure_ascii=False)[:120]}")
+    web.run_app(fake.build_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
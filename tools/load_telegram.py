@@ -0,0 +1,220 @@
+"""
+End-to-end load test: the real bot (main.py: build_bot, build_dispatcher, handlers, SQLite,
+SendScheduler, outbox) against tools/fake_telegram.py, driven by thousands of simulated clients.
+
+    python tools/load_telegram.py --clients 2000 --ramp 20 --latency 0.03 --rate-429 0.005
+
+Starts the fake Bot API in this process and the bot as a subprocess in polling mode, with
+a temporary SQLite file and the humanlike delay compressed to --human-delay. Every client
+walks the whole flow: greeting -> Q1, people + move-in -> Q2, work -> Q3, showing time ->
+handoff (--business share of them through a business connection). A client sends its next
+message --think seconds (random up to) after the bot's reply.
+
+Reported: reply latency percentiles per step (client message pushed -> sendMessage seen,
+pacing delay included), replies per second, finished flows, lead cards in LEADS_CHAT_ID,
+and what the fake saw (calls per method, 429s). The bot's log goes to --log.
+Extra bot settings come from the environment (e.g. TG_GLOBAL_PER_SECOND=1000, WORKERS=4).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from fake_telegram import FakeTelegram
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:LOADTEST"
+LEADS_CHAT_ID = -100500
+CHAT_BASE = 10_000_000
+
+# (step name, client message, start of the expected reply)
+FLOW = (
+    ("q1", "Здравствуйте, квартира ещё сдаётся?", "Здравствуйте! Подскажите"),
+    ("q2", "нас двое, заселение 1 мая", "Спасибо! Кем вы работаете"),
+    ("q3", "работаю водителем", "В какое время удобно"),
+    ("handoff", "завтра в 18:00", "Понял. Менеджер"),
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class Driver:
+    def __init__(self, fake: FakeTelegram, args: argparse.Namespace) -> None:
+        self.fake = fake
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        self._inbox: Dict[int, asyncio.Queue] = {}
+        self.latency: Dict[str, List[float]] = {name: [] for name, _, _ in FLOW}
+        self.unexpected = 0
+        self.timeouts = 0
+        self.finished = 0
+        self.cards = 0
+        self.replies = 0
+        self.first_push: Optional[float] = None
+        self.last_reply: Optional[float] = None
+        fake.on_send = self._on_send
+
+    def _on_send(self, method: str, chat_id: int, text: Optional[str], bc: Optional[str]) -> None:
+        if method != "sendMessage":
+            return
+        if chat_id == LEADS_CHAT_ID:
+            self.cards += (text or "").count("НОВЫЙ ЛИД") or 1
+            return
+        q = self._inbox.get(chat_id)
+        if q is not None:
+            self.replies += 1
+            self.last_reply = time.perf_counter()
+            q.put_nowait((time.perf_counter(), text or ""))
+
+    async def client(self, i: int) -> None:
+        chat_id = CHAT_BASE + i
+        bc = "bc-load" if self.rnd.random() < self.args.business else None
+        inbox = self._inbox[chat_id] = asyncio.Queue()
+        try:
+            for n, (step, text, expected) in enumerate(FLOW, start=1):
+                sent = time.perf_counter()
+                if self.first_push is None:
+                    self.first_push = sent
+                self.fake.push(FakeTelegram.message_update(chat_id, n, text, business_connection_id=bc))
+                try:
+                    got, reply = await asyncio.wait_for(inbox.get(), self.args.reply_timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    return
+                self.latency[step].append(got - sent)
+                if not reply.startswith(expected):
+                    self.unexpected += 1
+                    return
+                if self.args.think:
+                    await asyncio.sleep(self.rnd.uniform(0, self.args.think))
+            self.finished += 1
+        finally:
+            self._inbox.pop(chat_id, None)
+
+    async def run(self) -> None:
+        tasks = []
+        spacing = self.args.ramp / max(1, self.args.clients)
+        for i in range(self.args.clients):
+            tasks.append(asyncio.create_task(self.client(i)))
+            if spacing:
+                await asyncio.sleep(spacing)
+        await asyncio.gather(*tasks)
+
+
+def _bot_env(args: argparse.Namespace, api_port: int, tmp: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": TOKEN,
+            "TELEGRAM_API_BASE": f"http://127.0.0.1:{api_port}",
+            "LEADS_CHAT_ID": str(LEADS_CHAT_ID),
+            "RUN_MODE": "polling",
+            "SQLITE_PATH": os.path.join(tmp, "load.sqlite3"),
+            "ARCHIVE_DIR": os.path.join(tmp, "archive"),
+            "PORT": str(_free_port()),
+            "HUMAN_DELAY_MIN": str(args.human_delay),
+            "HUMAN_DELAY_MAX": str(args.human_delay),
+            "REPLY_DEBOUNCE_SECONDS": str(min(args.human_delay, 0.05)),
+            "REMINDER_MINUTES": "0",
+            "MAINTENANCE_HOUR": "-1",
+        }
+    )
+    return env
+
+
+def _report(d: Driver, fake: FakeTelegram, elapsed: float) -> None:
+    print(f"clients={d.args.clients} finished={d.finished} timeouts={d.timeouts} unexpected_replies={d.unexpected}")
+    print(f"replies={d.replies} in {elapsed:.1f}s -> {d.replies / elapsed if elapsed else 0:.0f} replies/s; lead cards={d.cards}")
+    print(f"{'step':>8} {'n':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}   (seconds, pacing delay {d.args.human_delay}s included)")
+    everything: List[float] = []
+    for step, _, _ in FLOW:
+        v = d.latency[step]
+        everything += v
+        print(f"{step:>8} {len(v):>7} {percentile(v, .5):>8.3f} {percentile(v, .9):>8.3f} {percentile(v, .99):>8.3f} {max(v, default=0):>8.3f}")
+    v = everything
+    print(f"{'all':>8} {len(v):>7} {percentile(v, .5):>8.3f} {percentile(v, .9):>8.3f} {percentile(v, .99):>8.3f} {max(v, default=0):>8.3f}")
+    calls = ", ".join(f"{k}={n}" for k, n in sorted(fake.stats["calls"].items()))
+    print(f"fake api: {calls}; 429 injected={fake.stats['429']}; unknown={fake.stats['unknown'] or '-'}")
+
+
+async def amain(args: argparse.Namespace) -> int:
+    fake = FakeTelegram(args.latency, args.jitter, args.rate_429, args.retry_after, seed=args.seed)
+    runner = web.AppRunner(fake.build_app())
+    await runner.setup()
+    api_port = _free_port()
+    await web.TCPSite(runner, "127.0.0.1", api_port).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = open(args.log, "w")
+        bot = await asyncio.create_subprocess_exec(
+            sys.executable, "main.py", cwd=ROOT, env=_bot_env(args, api_port, tmp), stdout=log, stderr=log
+        )
+        try:
+            await asyncio.wait_for(fake.polled.wait(), args.startup_timeout)
+        except asyncio.TimeoutError:
+            print(f"bot did not start polling within {args.startup_timeout}s, see {args.log}")
+            bot.kill()
+            await bot.wait()
+            await runner.cleanup()
+            return 1
+
+        driver = Driver(fake, args)
+        await driver.run()
+        elapsed = (driver.last_reply or time.perf_counter()) - (driver.first_push or time.perf_counter())
+        await asyncio.sleep(args.settle)  # lead cards still in the outbox / behind the group rate limit
+
+        bot.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(bot.wait(), 60)
+        except asyncio.TimeoutError:
+            bot.kill()
+            await bot.wait()
+        log.close()
+        await runner.cleanup()
+        _report(driver, fake, elapsed)
+        return 0 if driver.finished == args.clients else 1
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="End-to-end load test against a fake Bot API")
+    ap.add_argument("--clients", type=int, default=1000)
+    ap.add_argument("--ramp", type=float, default=10.0, help="seconds over which clients start")
+    ap.add_argument("--think", type=float, default=1.0, help="max seconds a client waits before answering")
+    ap.add_argument("--business", type=float, default=0.2, help="share of clients writing through a business connection")
+    ap.add_argument("--human-delay", type=float, default=0.2, help="HUMAN_DELAY_MIN/MAX for the bot")
+    ap.add_argument("--latency", type=float, default=0.02, help="fake API latency, seconds")
+    ap.add_argument("--jitter", type=float, default=0.01)
+    ap.add_argument("--rate-429", type=float, default=0.0, help="share of sends answered with 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--reply-timeout", type=float, default=60.0)
+    ap.add_argument("--settle", type=float, default=3.0, help="seconds to wait for lead cards at the end")
+    ap.add_argument("--startup-timeout", type=float, default=30.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--log", default=os.path.join(tempfile.gettempdir(), "load_telegram_bot.log"))
+    args = ap.parse_args()
+    sys.exit(asyncio.run(amain(args)))
+
+
+if __name__ == "__main__":
+    main()
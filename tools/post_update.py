@@ -0,0 +1,46 @@
+"""
+Post recorded Telegram updates to a running bot in webhook mode.
+
+    RUN_MODE=webhook WEBHOOK_BASE_URL=http://127.0.0.1:10000 python main.py
+    python tools/post_update.py tools/updates/private_text.json --url http://127.0.0.1:10000/tg/webhook
+
+A file holds one update object or a list of them. Prints the HTTP status per update,
+then /readyz.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+
+import aiohttp
+
+
+async def run(url: str, paths: list[str], secret: str | None, pause: float) -> None:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    async with aiohttp.ClientSession() as s:
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            for update in data if isinstance(data, list) else [data]:
+                async with s.post(url, json=update, headers=headers) as r:
+                    print(f"{path} update_id={update.get('update_id')} -> {r.status}")
+                if pause:
+                    await asyncio.sleep(pause)
+        base = url.split("/", 3)
+        async with s.get("/".join(base[:3]) + "/readyz") as r:
+            print("readyz", r.status, await r.text())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("--url", default="http://127.0.0.1:10000/tg/webhook")
+    ap.add_argument("--secret", default=None)
+    ap.add_argument("--pause", type=float, default=0.0, help="seconds between updates")
+    args = ap.parse_args()
+    asyncio.run(run(args.url, args.files, args.secret, args.pause))
+
+
+if __name__ == "__main__":
+    main()
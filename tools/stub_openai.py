@@ -0,0 +1,111 @@
+"""
+Local stub of the two OpenAI endpoints the bot uses:
+- POST /v1/responses              (LLMClient.extract)
+- POST /v1/audio/transcriptions   (LLMClient.transcribe)
+
+Run:
+    python tools/stub_openai.py --port 8089 --delay 0.5
+and point the bot at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+    OPENAI_API_KEY=stub
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+
+DEFAULT_REPLY = {
+    "reply": "Спасибо! Кем вы работаете ?",
+    "updates": {
+        "listing_ref": None,
+        "people_count": 2,
+        "move_in": None,
+        "employment": None,
+        "lease_term": None,
+        "budget_usd": None,
+        "pets": None,
+        "children": None,
+        "showing_time": None,
+    },
+    "handoff": False,
+    "pause": False,
+    "next_question": "Спасибо! Кем вы работаете ?",
+}
+
+
+def build_app(delay: float = 0.0, reply: dict | None = None, transcript: str = "нас двое, заселение 1 мая") -> web.Application:
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app["stats"] = {"responses": 0, "transcriptions": 0, "inflight": 0, "max_inflight": 0}
+    payload = json.dumps(reply or DEFAULT_REPLY, ensure_ascii=False)
+
+    async def _slow(stats):
+        stats["inflight"] += 1
+        stats["max_inflight"] = max(stats["max_inflight"], stats["inflight"])
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            stats["inflight"] -= 1
+
+    async def responses(request: web.Request) -> web.Response:
+        body = await request.json()
+        stats = request.app["stats"]
+        stats["responses"] += 1
+        await _slow(stats)
+        rid = "resp_" + uuid.uuid4().hex
+        return web.json_response(
+            {
+                "id": rid,
+                "object": "response",
+                "created_at": int(time.time()),
+                "status": "completed",
+                "model": body.get("model", "stub"),
+                "output": [
+                    {
+                        "id": "msg_" + uuid.uuid4().hex,
+                        "type": "message",
+                        "role": "assistant",
+                        "status": "completed",
+                        "content": [{"type": "output_text", "text": payload, "annotations": []}],
+                    }
+                ],
+                "parallel_tool_calls": False,
+                "tool_choice": "auto",
+                "tools": [],
+            }
+        )
+
+    async def transcriptions(request: web.Request) -> web.Response:
+        await request.post()  # drain multipart body
+        stats = request.app["stats"]
+        stats["transcriptions"] += 1
+        await _slow(stats)
+        return web.json_response({"text": transcript})
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(request.app["stats"])
+
+    app.router.add_post("/v1/responses", responses)
+    app.router.add_post("/v1/audio/transcriptions", transcriptions)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds to wait before every answer")
+    ap.add_argument("--transcript", default="нас двое, заселение 1 мая")
+    args = ap.parse_args()
+    web.run_app(build_app(args.delay, transcript=args.transcript), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()